@@ -0,0 +1,234 @@
+import numpy as np
+
+from . import wide_int
+from .vespa_engine import MAX_TIME
+
+# Any dt >= MAX_TIME fully decays a user point (bias is at most
+# slope * MAX_TIME), so dt is capped there to keep it below 2**32.
+MAX_DT = MAX_TIME
+
+
+class UserPoints:
+    """
+    User point histories of many holders in array form.
+
+    `holder[i]` is the index in `holders` of the owner of point i, `ts` /
+    `blk` its timestamp and block and `bias` / `slope` / `residue` the
+    exact point values as wide_int limbs. Points of a holder keep their
+    userPointEpoch order.
+    """
+
+    def __init__(self, holders, holder, ts, bias, slope, residue, blk=None):
+        self.holders = list(holders)
+        self.holder = np.asarray(holder, dtype=np.int64)
+        self.ts = np.asarray(ts, dtype=np.int64)
+        self.blk = None
+        if blk is not None:
+            self.blk = np.asarray(blk, dtype=np.int64)
+        n_limbs = wide_int.n_limbs_for(
+            [max(bias, default=0), max(slope, default=0),
+             max(residue, default=0)]
+        )
+        self.bias = wide_int.from_ints(bias, n_limbs)
+        self.slope = wide_int.from_ints(slope, n_limbs)
+        self.residue = wide_int.from_ints(residue, n_limbs)
+
+    @classmethod
+    def from_engine(cls, engine, holders=None):
+        """Builds the arrays from a VeSPAEngine's userPointHistory"""
+        if holders is None:
+            holders = list(engine.userPointHistory.keys())
+        holder, ts, bias, slope, residue, blk = [], [], [], [], [], []
+        for i, addr in enumerate(holders):
+            # epoch 0 is the empty point, which balanceOf never uses
+            for point in engine.userPointHistory[addr][1:]:
+                holder.append(i)
+                ts.append(point.ts)
+                bias.append(point.bias)
+                slope.append(point.slope)
+                residue.append(point.residue)
+                blk.append(point.blk)
+        return cls(holders, holder, ts, bias, slope, residue, blk)
+
+    def take(self, index):
+        """UserPoints of the holders at `index` only, in that order"""
+        index = np.asarray(index, dtype=np.int64)
+        position = np.full(len(self.holders), -1, dtype=np.int64)
+        position[index] = np.arange(len(index))
+        keep = np.flatnonzero(position[self.holder] >= 0)
+        points = object.__new__(UserPoints)
+        points.holders = [self.holders[i] for i in index]
+        points.holder = position[self.holder[keep]]
+        points.ts = self.ts[keep]
+        points.blk = None if self.blk is None else self.blk[keep]
+        points.bias = [limb[keep] for limb in self.bias]
+        points.slope = [limb[keep] for limb in self.slope]
+        points.residue = [limb[keep] for limb in self.residue]
+        return points
+
+    @classmethod
+    def from_chain(cls, reader, vespa, holders):
+        """
+        Reads the userPointHistory of `holders` from veSPA_v1 with batched
+        calls. `reader` is a BatchReader and `vespa` a BoundContract.
+        """
+        holders = list(holders)
+        epochs = reader.call(
+            [(vespa, 'userPointEpoch', (addr,)) for addr in holders]
+        )
+        calls = []
+        holder = []
+        for i, (addr, epoch) in enumerate(zip(holders, epochs)):
+            for user_epoch in range(1, epoch + 1):
+                calls.append((vespa, 'userPointHistory', (addr, user_epoch)))
+                holder.append(i)
+        points = reader.call(
+            calls, lambda call, point: reader.is_settled(point[3])
+        )
+        return cls(
+            holders,
+            holder,
+            [p[3] for p in points],
+            [p[0] for p in points],
+            [p[1] for p in points],
+            [p[2] for p in points],
+            [p[4] for p in points],
+        )
+
+
+def balance_matrix(points, weeks):
+    """
+    veSPA_v1.balanceOf(holder, week) for every holder x week, computed
+    with the contract's integer rules: the latest user point with
+    ts <= week, bias - slope * dt clamped at zero, plus the residue.
+    Returns wide_int limbs of shape (len(points.holders), len(weeks)).
+    """
+    weeks = np.asarray(weeks, dtype=np.int64)
+    n_holders = len(points.holders)
+    n_weeks = len(weeks)
+    week_order = np.argsort(weeks, kind='stable')
+    sorted_weeks = weeks[week_order]
+
+    # Index of the first week at which each point is in effect. Points
+    # are grouped by that week, keeping holder then userPointEpoch order
+    # inside a group, so the last point of a holder in a group is the one
+    # still in effect at the end of it.
+    order = np.argsort(points.holder, kind='stable')
+    first = np.searchsorted(sorted_weeks, points.ts[order], 'left')
+    by_week = np.argsort(first, kind='stable')
+    order = order[by_week]
+    first = first[by_week]
+    holder = points.holder[order]
+    last = np.ones(len(order), dtype=bool)
+    last[:-1] = (holder[:-1] != holder[1:]) | (first[:-1] != first[1:])
+    order = order[last]
+    week_bounds = np.searchsorted(first[last], np.arange(n_weeks + 1))
+
+    # Point in effect for every holder; holders without one yet keep an
+    # all-zero point, which evaluates to a zero balance
+    if _fits_split(points):
+        src = [_split(points.bias), _split(points.slope),
+               _split(points.residue)]
+        evaluate = _evaluate_split
+        n_out = 2
+    else:
+        src = [points.bias, points.slope, points.residue]
+        evaluate = _evaluate_limbs
+        n_out = len(points.bias) + 2
+    cur_ts = np.zeros(n_holders, dtype=np.int64)
+    cur = [wide_int.zeros(n_holders, len(limbs)) for limbs in src]
+
+    out = wide_int.zeros((n_weeks, n_holders), n_out)
+    for j in range(n_weeks):
+        new_points = order[week_bounds[j]:week_bounds[j + 1]]
+        if len(new_points):
+            index = points.holder[new_points]
+            cur_ts[index] = points.ts[new_points]
+            for cur_limbs, src_limbs in zip(cur, src):
+                for cur_limb, src_limb in zip(cur_limbs, src_limbs):
+                    cur_limb[index] = src_limb[new_points]
+        dt = np.minimum(sorted_weeks[j] - cur_ts, MAX_DT)
+        row = week_order[j]
+        for limb, part in zip(out, evaluate(*cur, dt)):
+            limb[row] = part
+    if n_out == 2:
+        out = [out[0]] + _unsplit(out[1])
+    return [limb.T for limb in out]
+
+
+def _evaluate_limbs(bias, slope, residue, dt):
+    return wide_int.add(
+        wide_int.sub_clamp(bias, wide_int.mul_small(slope, dt)), residue
+    )
+
+
+# Fast path for realistic amounts (< 10**27): values are held as (lo, hi)
+# with lo their low 32 bits and hi the rest in a single int64, which
+# halves the number of array passes. hi stays below 2**63 as long as
+# bias and residue are below 2**93 and slope * dt below 2**95.
+SPLIT_VALUE_BITS = 93
+SPLIT_SLOPE_BITS = 67
+
+
+def _bits(limbs):
+    top = [i for i, limb in enumerate(limbs) if limb.any()]
+    if not top:
+        return 0
+    i = top[-1]
+    return wide_int.LIMB_BITS * i + int(limbs[i].max()).bit_length()
+
+
+def _fits_split(points):
+    return (
+        MAX_DT < 1 << (95 - SPLIT_SLOPE_BITS) and
+        _bits(points.bias) <= SPLIT_VALUE_BITS and
+        _bits(points.residue) <= SPLIT_VALUE_BITS and
+        _bits(points.slope) <= SPLIT_SLOPE_BITS
+    )
+
+
+def _split(limbs):
+    hi = np.zeros_like(limbs[0])
+    for i, limb in enumerate(limbs[1:]):
+        if limb.any():
+            hi |= limb << (wide_int.LIMB_BITS * i)
+    return [limbs[0], hi]
+
+
+def _unsplit(hi):
+    limbs = []
+    while True:
+        limbs.append(hi & wide_int.LIMB_MASK)
+        hi = hi >> wide_int.LIMB_BITS
+        if not hi.any():
+            return limbs
+
+
+def _evaluate_split(bias, slope, residue, dt):
+    bits = wide_int.LIMB_BITS
+    mask = wide_int.LIMB_MASK
+    # slope * dt
+    lo = slope[0] * dt
+    hi = slope[1] * dt
+    hi += lo >> bits
+    lo &= mask
+    # bias - slope * dt, the borrow is -1 or 0 (arithmetic shift)
+    np.subtract(bias[0], lo, out=lo)
+    np.subtract(bias[1], hi, out=hi)
+    hi += lo >> 63
+    lo &= mask
+    # zero fully decayed points, keep = 0 if negative else -1
+    keep = ~(hi >> 63)
+    lo &= keep
+    hi &= keep
+    # + residue
+    lo += residue[0]
+    hi += residue[1]
+    hi += lo >> bits
+    lo &= mask
+    return lo, hi
+
+
+def supply_matrix(balances):
+    """Sum of the holders' balances for every week, as Python ints"""
+    return wide_int.to_ints(wide_int.sum_axis(balances, axis=0))
@@ -0,0 +1,186 @@
+from eth_abi import decode, encode
+from eth_utils import function_abi_to_4byte_selector, to_checksum_address
+
+
+# Max number of calls packed into a single `aggregate` eth_call.
+# Large batches can hit the node's eth_call gas cap, so they are split.
+MAX_BATCH = 250
+
+# Number of pointHistory entries sampled per round-trip while searching
+# for an epoch. The search needs ~log_WINDOW(epoch) round-trips.
+SEARCH_WINDOW = 128
+
+# Age after which history (points, weekly supplies, rewards) is treated
+# as final and safe to cache forever.
+FINALITY = 7 * 86400
+
+MULTICALL2_ABI = [
+    {
+        'inputs': [
+            {
+                'components': [
+                    {'name': 'target', 'type': 'address'},
+                    {'name': 'callData', 'type': 'bytes'},
+                ],
+                'name': 'calls',
+                'type': 'tuple[]',
+            }
+        ],
+        'name': 'aggregate',
+        'outputs': [
+            {'name': 'blockNumber', 'type': 'uint256'},
+            {'name': 'returnData', 'type': 'bytes[]'},
+        ],
+        'stateMutability': 'nonpayable',
+        'type': 'function',
+    },
+]
+
+
+def _abi_types(params):
+    types = []
+    for param in params:
+        if param['type'].startswith('tuple'):
+            inner = ','.join(_abi_types(param['components']))
+            types.append(f'({inner}){param["type"][5:]}')
+        else:
+            types.append(param['type'])
+    return types
+
+
+class BoundContract:
+    """
+    Minimal ABI binding used to encode calls and decode return data
+    without going through a brownie / web3 contract object.
+    Overloaded functions are resolved by the number of arguments.
+    """
+
+    def __init__(self, address, abi):
+        self.address = to_checksum_address(address)
+        self.functions = {}
+        for item in abi:
+            if item.get('type') != 'function':
+                continue
+            key = (item['name'], len(item['inputs']))
+            self.functions[key] = (
+                function_abi_to_4byte_selector(item),
+                _abi_types(item['inputs']),
+                _abi_types(item['outputs']),
+            )
+
+    def encode(self, fn_name, args=()):
+        selector, input_types, _ = self.functions[(fn_name, len(args))]
+        return selector + encode(input_types, list(args))
+
+    def decode(self, fn_name, nargs, data):
+        _, _, output_types = self.functions[(fn_name, nargs)]
+        result = decode(output_types, data)
+        if len(result) == 1:
+            return result[0]
+        return result
+
+
+class BatchReader:
+    """
+    Groups contract reads into Multicall2 `aggregate` calls.
+    Every call of a batch is executed against the same block, so results
+    of a BatchReader pinned to a block number form a consistent snapshot.
+    """
+
+    def __init__(self, w3, multicall_address, block_identifier=None):
+        self.w3 = w3
+        self.multicall = BoundContract(multicall_address, MULTICALL2_ABI)
+        self.block_identifier = block_identifier
+        self.block_timestamp = None
+        self.round_trips = 0
+
+    def pin(self):
+        """Pin all following reads to the current head block"""
+        block = self.w3.eth.get_block('latest')
+        self.block_identifier = block['number']
+        self.block_timestamp = block['timestamp']
+        return self.block_identifier
+
+    def is_settled(self, ts):
+        """True if `ts` is at least FINALITY older than the pinned block"""
+        return (
+            self.block_timestamp is not None and
+            ts + FINALITY <= self.block_timestamp
+        )
+
+    def call(self, calls, immutable=False):
+        """
+        Executes `calls`, a list of (BoundContract, fn_name, args) tuples,
+        and returns the decoded results in the same order.
+        `immutable` is a hint for caching readers, see CachedReader.
+        """
+        results = []
+        for i in range(0, len(calls), MAX_BATCH):
+            chunk = calls[i:i + MAX_BATCH]
+            payload = [
+                (contract.address, contract.encode(fn_name, args))
+                for contract, fn_name, args in chunk
+            ]
+            tx = {
+                'to': self.multicall.address,
+                'data': '0x' + self.multicall.encode(
+                    'aggregate', (payload,)
+                ).hex(),
+            }
+            raw = self.w3.eth.call(tx, self.block_identifier or 'latest')
+            self.round_trips += 1
+            _, return_data = self.multicall.decode('aggregate', 1, raw)
+            for (contract, fn_name, args), data in zip(chunk, return_data):
+                results.append(contract.decode(fn_name, len(args), data))
+        return results
+
+
+def get_multicall_address():
+    """Returns the Multicall2 address configured for the active network"""
+    from brownie._config import CONFIG
+    address = CONFIG.active_network.get('multicall2')
+    if address is None:
+        raise ValueError(
+            'No multicall2 address configured for '
+            f'{CONFIG.active_network["id"]}'
+        )
+    return address
+
+
+def find_epoch(
+    reader, contract, getter, ts_index, time, max_epoch, immutable=False
+):
+    """
+    Batched version of the on-chain `_find*Epoch` binary searches.
+    Returns the last epoch in [0, max_epoch] whose timestamp
+    (`getter(epoch)[ts_index]`) is <= time, or 0 if there is none.
+    Each round-trip samples SEARCH_WINDOW epochs and narrows the
+    search interval to the gap between two samples.
+    """
+    low = 0
+    high = max_epoch
+    while low < high:
+        span = high - low
+        if span <= SEARCH_WINDOW:
+            candidates = list(range(low + 1, high + 1))
+        else:
+            candidates = [
+                low + (span * (i + 1)) // SEARCH_WINDOW
+                for i in range(SEARCH_WINDOW)
+            ]
+        points = reader.call(
+            [(contract, getter, (epoch,)) for epoch in candidates],
+            immutable
+        )
+        new_high = high
+        new_low = low
+        for epoch, point in zip(candidates, points):
+            if point[ts_index] <= time:
+                new_low = epoch
+            else:
+                new_high = epoch - 1
+                break
+        if span <= SEARCH_WINDOW:
+            return new_low
+        low, high = new_low, new_high
+    return low
@@ -0,0 +1,217 @@
+import numpy as np
+
+from . import wide_int
+from .vespa_engine import WEEK, require
+
+# Iterations of the supplyAt loop, past which the contract stops walking
+# the weekly slope changes
+MAX_WEEKS = 255
+
+# Holder index / block number packing of balances_at, blocks < 2**40
+BLOCK_BITS = 40
+
+
+def _objects(values):
+    return np.array([int(v) for v in values], dtype=object)
+
+
+class BlockIndex:
+    """
+    Local copy of the veSPA_v1 global point history answering the
+    block-based views (balanceOfAt, totalSupplyAt) for many blocks at
+    once, with the contract's integer arithmetic.
+
+    `ts` / `blk` are pointHistory(0..epoch) timestamps and blocks and
+    `bias` / `slope` / `residue` their values. `slope_changes` has to
+    cover the weeks after the last point, and `now_ts` / `now_blk` stand
+    for block.timestamp / block.number of the calls being mirrored.
+    """
+
+    def __init__(self, points, slope_changes, now_ts, now_blk):
+        self.points = [tuple(point) for point in points]
+        self.slope_changes = dict(slope_changes)
+        self.now_ts = now_ts
+        self.now_blk = now_blk
+        self._build()
+
+    def _build(self):
+        bias, slope, residue, ts, blk = zip(*self.points)
+        self.epoch = len(self.points) - 1
+        self.ts = np.array(ts, dtype=np.int64)
+        self.blk = np.array(blk, dtype=np.int64)
+        self.bias = _objects(bias)
+        self.slope = _objects(slope)
+        self.residue = _objects(residue)
+
+    @classmethod
+    def from_engine(cls, engine, now_ts=None, now_blk=None):
+        if now_ts is None:
+            now_ts, now_blk = engine.head_ts, engine.head_blk
+        points = [
+            (p.bias, p.slope, p.residue, p.ts, p.blk)
+            for p in engine.pointHistory
+        ]
+        return cls(points, engine.slopeChanges, now_ts, now_blk)
+
+    @classmethod
+    def from_chain(cls, reader, vespa):
+        """
+        Reads the whole point history of `vespa` (a BoundContract) in
+        batches pinned to the current block.
+        """
+        reader.pin()
+        point = reader.call([(vespa, 'pointHistory', (0,))], True)[0]
+        index = cls([point], {}, reader.block_timestamp,
+                    reader.block_identifier)
+        index.update(reader, vespa)
+        return index
+
+    def update(self, reader, vespa):
+        """
+        Appends the points written since the last update and reads the
+        slope changes of the weeks since the last point. Points and past
+        slope changes never change, so only that much is read. Returns
+        the number of new points.
+        """
+        reader.pin()
+        epoch = reader.call([(vespa, 'epoch', ())])[0]
+        new = reader.call(
+            [(vespa, 'pointHistory', (e,))
+             for e in range(self.epoch + 1, epoch + 1)],
+            lambda call, point: reader.is_settled(point[3])
+        )
+        self.points.extend(tuple(point) for point in new)
+        self.now_ts = reader.block_timestamp
+        self.now_blk = reader.block_identifier
+        weeks = list(range(
+            (self.points[-1][3] // WEEK + 1) * WEEK, self.now_ts + 1, WEEK
+        ))
+        slope_changes = reader.call(
+            [(vespa, 'slopeChanges', (week,)) for week in weeks], True
+        )
+        self.slope_changes.update(zip(weeks, slope_changes))
+        self._build()
+        return len(new)
+
+    def epochs(self, blocks):
+        """_findBlockEpoch(block, epoch) of every block"""
+        # the contract's binary search never compares epoch 0
+        return np.searchsorted(
+            self.blk[1:], np.asarray(blocks, dtype=np.int64), 'right'
+        )
+
+    def _checked_epochs(self, blocks):
+        epochs = self.epochs(blocks)
+        # blockNumber - point0.blk underflows before the first point
+        require(
+            not np.any(blocks < self.blk[epochs]),
+            'Integer overflow'
+        )
+        return epochs
+
+    def block_times(self, blocks):
+        """Timestamps balanceOfAt estimates for `blocks`"""
+        blocks = np.asarray(blocks, dtype=np.int64)
+        epochs = self._checked_epochs(blocks)
+        last = epochs == self.epoch
+        next_epochs = np.minimum(epochs + 1, self.epoch)
+        d_block = np.where(
+            last, blocks - self.blk[epochs],
+            self.blk[next_epochs] - self.blk[epochs]
+        )
+        dt = np.where(
+            last, self.now_ts - self.ts[epochs],
+            self.ts[next_epochs] - self.ts[epochs]
+        )
+        offset = dt * (blocks - self.blk[epochs])
+        return self.ts[epochs] + np.where(
+            d_block != 0, offset // np.maximum(d_block, 1), 0
+        )
+
+    def _supply_times(self, blocks, epochs):
+        # Timestamps totalSupplyAt passes to supplyAt
+        last = epochs == self.epoch
+        next_epochs = np.minimum(epochs + 1, self.epoch)
+        d_block = np.where(
+            last, self.now_blk - self.blk[epochs],
+            self.blk[next_epochs] - self.blk[epochs]
+        )
+        dt = np.where(
+            last, self.now_ts - self.ts[epochs],
+            self.ts[next_epochs] - self.ts[epochs]
+        )
+        offset = (blocks - self.blk[epochs]) * dt
+        return self.ts[epochs] + np.where(
+            d_block != 0, offset // np.maximum(d_block, 1), 0
+        )
+
+    def _walk(self, epoch, n_weeks):
+        # supplyAt state after each of the first `n_weeks` week boundaries
+        # following point `epoch`: (boundary, bias, slope) arrays, the
+        # point itself first
+        ts = [int(self.ts[epoch])]
+        bias = [self.bias[epoch]]
+        slope = [self.slope[epoch]]
+        week = (ts[0] // WEEK) * WEEK
+        for _ in range(n_weeks):
+            week += WEEK
+            bias.append(bias[-1] - slope[-1] * (week - ts[-1]))
+            slope.append(slope[-1] + self.slope_changes.get(week, 0))
+            ts.append(week)
+        return np.array(ts, dtype=np.int64), _objects(bias), _objects(slope)
+
+    def supply_at(self, epochs, times):
+        """
+        supplyAt(pointHistory[epoch], time) for every pair. Pairs that do
+        not cross a week boundary, all of them except after the last
+        point in practice, are evaluated in one pass; the others walk the
+        weekly slope changes once per epoch.
+        """
+        epochs = np.asarray(epochs, dtype=np.int64)
+        times = np.asarray(times, dtype=np.int64)
+        base_ts = self.ts[epochs]
+        bias = self.bias[epochs] - self.slope[epochs] * (times - base_ts)
+        # boundaries strictly before `time`; one landing on `time` does
+        # not apply its slope change
+        crossed = (times - 1) // WEEK - base_ts // WEEK
+        for epoch in np.unique(epochs[crossed > 0]):
+            rows = np.nonzero((epochs == epoch) & (crossed > 0))[0]
+            n_weeks = min(int(crossed[rows].max()), MAX_WEEKS)
+            week_ts, week_bias, week_slope = self._walk(epoch, n_weeks)
+            k = np.minimum(crossed[rows], MAX_WEEKS)
+            walked = week_bias[k] - week_slope[k] * (times[rows] - week_ts[k])
+            # the loop gives up MAX_WEEKS boundaries after the point
+            bias[rows] = np.where(
+                crossed[rows] >= MAX_WEEKS, week_bias[k], walked
+            )
+        bias = np.where(bias < 0, 0, bias)
+        return bias + self.residue[epochs]
+
+    def total_supply_at(self, blocks):
+        """totalSupplyAt(block) of every block, as Python ints"""
+        blocks = np.asarray(blocks, dtype=np.int64)
+        require(not np.any(blocks > self.now_blk))
+        epochs = self._checked_epochs(blocks)
+        return self.supply_at(epochs, self._supply_times(blocks, epochs))
+
+    def balances_at(self, points, blocks):
+        """
+        balanceOfAt(holder, block) for every holder of `points` (a
+        UserPoints with blocks) x block, as Python ints.
+        """
+        blocks = np.asarray(blocks, dtype=np.int64)
+        times = self.block_times(blocks)
+        keys = (points.holder << BLOCK_BITS) + points.blk
+        order = np.argsort(keys, kind='stable')
+        holders = np.arange(len(points.holders))
+        queries = (holders[:, None] << BLOCK_BITS) + blocks[None, :]
+        found = np.searchsorted(keys[order], queries, 'right') - 1
+        index = order[np.maximum(found, 0)]
+        found = (found >= 0) & (points.holder[index] == holders[:, None])
+
+        bias = wide_int.to_ints(points.bias)[index]
+        slope = wide_int.to_ints(points.slope)[index]
+        residue = wide_int.to_ints(points.residue)[index]
+        bias = bias - slope * (times[None, :] - points.ts[index])
+        balances = np.where(bias < 0, 0, bias) + residue
+        return np.where(found, balances, 0)
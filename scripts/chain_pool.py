@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+from web3 import Web3
+import yaml
+
+from .rpc_provider import PooledHTTPProvider
+
+# Read directly rather than through brownie._config, which loads brownie
+NETWORK_CONFIG_PATH = os.path.join(
+    os.path.expanduser('~'), '.brownie', 'network-config.yaml'
+)
+
+
+def _network_entries(path):
+    with open(path) as f:
+        config = yaml.safe_load(f)
+    networks = list(config.get('development', []))
+    for group in config.get('live', []):
+        networks.extend(group['networks'])
+    return networks
+
+
+def get_network_config(network_name, path=NETWORK_CONFIG_PATH):
+    """Returns the brownie network-config entry for `network_name`"""
+    for entry in _network_entries(path):
+        if entry['id'] == network_name:
+            return entry
+    raise ValueError(f'Unknown network: {network_name}')
+
+
+def get_network_hosts(path=NETWORK_CONFIG_PATH):
+    """{host: network name} of the configured networks"""
+    return {
+        os.path.expandvars(entry['host']): entry['id']
+        for entry in _network_entries(path)
+        if 'host' in entry
+    }
+
+
+class ChainConnection:
+    """A persistent web3 provider bound to a single network"""
+
+    def __init__(self, network_name, host, multicall_address=None):
+        self.network_name = network_name
+        self.w3 = Web3(PooledHTTPProvider(os.path.expandvars(host)))
+        self.multicall_address = multicall_address
+
+    @classmethod
+    def from_network(cls, network_name, path=NETWORK_CONFIG_PATH):
+        config = get_network_config(network_name, path)
+        if config.get('multicall2') is None:
+            raise ValueError(
+                f'No multicall2 address configured for {network_name}'
+            )
+        return cls(network_name, config['host'], config['multicall2'])
+
+
+class ChainPool:
+    """
+    Keeps one ChainConnection per network for the lifetime of the pool and
+    runs per-chain work on a thread pool, so the wall time of a fan-out is
+    bounded by the slowest chain instead of the sum of all of them.
+    """
+
+    def __init__(self, network_names, max_workers=None,
+                 path=NETWORK_CONFIG_PATH):
+        self.connections = {
+            name: ChainConnection.from_network(name, path)
+            for name in network_names
+        }
+        self.max_workers = max_workers or len(self.connections)
+
+    def __getitem__(self, network_name):
+        return self.connections[network_name]
+
+    def map(self, fn, *args):
+        """
+        Calls fn(connection, *args) for every network concurrently.
+        Returns a dict of network name -> result; the first exception
+        raised by any chain is re-raised.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                name: executor.submit(fn, connection, *args)
+                for name, connection in self.connections.items()
+            }
+            return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,218 @@
+import numpy as np
+
+from .chain_pool import ChainPool
+from .gas_benchmark import BASELINE_PATH, load_baseline
+from .read_client import ReadClient
+from .reward_calculator import switch_network, vespa_address_dict
+
+WEEK = 604800
+
+# Weeks _updateGlobalPoint backfills at most; a longer gap leaves the
+# global point, and every voting weight derived from it, wrong
+MAX_BACKFILL_WEEKS = 255
+
+# Backfill gas over a fresh checkpoint from which checkpoint() is called
+THRESHOLD_GAS = 500000
+
+# Gas of one backfilled week when no gas_benchmark baseline calibrates the
+# model: a cold slopeChanges read and the four new slots of a pointHistory
+# entry (4 x 20000), plus the loop arithmetic. An estimate.
+WEEK_GAS = 84000
+
+# A chain is checkpointed this many weeks before MAX_BACKFILL_WEEKS in any
+# case
+SAFETY_WEEKS = 8
+
+# Weeks of the projected cost curve
+HORIZON_WEEKS = [0, 1, 2, 4, 8, 13, 26, 52]
+
+
+class BackfillModel:
+    """
+    Gas of veSPA_v1.checkpoint() after `idle_weeks` weeks without a
+    global checkpoint, interpolated linearly between measured points
+    {idle_weeks: gas} and extrapolated from the last segment. The loop
+    stops growing at MAX_BACKFILL_WEEKS.
+    """
+
+    def __init__(self, baseline):
+        if len(baseline) < 2:
+            raise ValueError('the baseline needs two idle_weeks points')
+        self.weeks = np.array(sorted(baseline), dtype=float)
+        self.gas_used = np.array(
+            [baseline[w] for w in sorted(baseline)], dtype=float
+        )
+
+    @classmethod
+    def from_baseline(cls, path=BASELINE_PATH):
+        baseline = load_baseline(path)
+        if baseline is None or 'checkpoint' not in baseline:
+            raise FileNotFoundError(
+                f'No checkpoint baseline at {path}, run '
+                'scripts/gas_benchmark.py first'
+            )
+        return cls(baseline['checkpoint'])
+
+    @classmethod
+    def from_estimate(cls, idle_weeks, gas, calibration=None):
+        """
+        Model through the node's estimate `gas` of checkpoint() after
+        `idle_weeks` idle weeks, shaped like `calibration` (the model of
+        the gas_benchmark baseline) or growing WEEK_GAS per week
+        """
+        if calibration is None:
+            calibration = cls({
+                0: 0, MAX_BACKFILL_WEEKS: WEEK_GAS * MAX_BACKFILL_WEEKS
+            })
+        offset = gas - int(calibration.gas(idle_weeks))
+        return cls({
+            int(weeks): int(used) + offset
+            for weeks, used in zip(calibration.weeks, calibration.gas_used)
+        })
+
+    def gas(self, idle_weeks):
+        weeks = np.minimum(np.asarray(idle_weeks, dtype=float),
+                           MAX_BACKFILL_WEEKS)
+        slope = (
+            (self.gas_used[-1] - self.gas_used[-2]) /
+            (self.weeks[-1] - self.weeks[-2])
+        )
+        gas = np.where(
+            weeks > self.weeks[-1],
+            self.gas_used[-1] + slope * (weeks - self.weeks[-1]),
+            np.interp(weeks, self.weeks, self.gas_used),
+        )
+        return np.rint(gas).astype(np.int64)
+
+    def backfill(self, idle_weeks):
+        """Gas over a checkpoint without idle weeks"""
+        return self.gas(idle_weeks) - self.gas(0)
+
+
+def idle_weeks(last_ts, ts):
+    """Week slots a call at `ts` backfills past the one of `last_ts`"""
+    return ts // WEEK - last_ts // WEEK
+
+
+def get_chain_status(connection):
+    # ChainPool worker: the last global point, the chain's head and the
+    # node's estimate of a checkpoint() now
+    client = ReadClient.from_connection(connection)
+    client.reader.pin()
+    epoch = client.call([(client.vespa, 'epoch', ())])[0]
+    point = client.call([(client.vespa, 'pointHistory', (epoch,))])[0]
+    block = connection.w3.eth.get_block('latest')
+    checkpoint_gas = connection.w3.eth.estimate_gas({
+        'to': client.vespa.address,
+        'data': '0x' + client.vespa.encode('checkpoint', ()).hex(),
+    })
+    return {
+        'epoch': epoch,
+        'last_checkpoint': point[3],
+        'timestamp': block['timestamp'],
+        'gas_price': connection.w3.eth.gas_price,
+        'checkpoint_gas': checkpoint_gas,
+    }
+
+
+def assess(status, model, threshold=THRESHOLD_GAS,
+           safety_weeks=SAFETY_WEEKS, horizon=HORIZON_WEEKS):
+    """
+    Adds to a get_chain_status result the backfill the next caller pays,
+    the projected curve {weeks from now: (idle weeks, backfill gas, cost
+    in wei)}, the weeks left before the threshold and before the
+    backfill limit, and whether to checkpoint now.
+    """
+    idle = idle_weeks(status['last_checkpoint'], status['timestamp'])
+    ahead = np.array(horizon)
+    backfill = model.backfill(idle + ahead)
+    status = dict(status)
+    status['idle_weeks'] = idle
+    status['backfill_gas'] = int(model.backfill(idle))
+    status['curve'] = {
+        int(weeks): (
+            idle + int(weeks), int(gas), int(gas) * status['gas_price']
+        )
+        for weeks, gas in zip(ahead, backfill)
+    }
+    over = np.flatnonzero(model.backfill(
+        np.arange(idle, MAX_BACKFILL_WEEKS + 1)
+    ) >= threshold)
+    status['weeks_to_threshold'] = int(over[0]) if len(over) else None
+    status['weeks_to_limit'] = max(MAX_BACKFILL_WEEKS - idle, 0)
+    status['checkpoint'] = bool(
+        status['backfill_gas'] >= threshold or
+        idle >= MAX_BACKFILL_WEEKS - safety_weeks
+    )
+    return status
+
+
+def format_status(statuses):
+    lines = []
+    for network_name, status in statuses.items():
+        lines.append(
+            f'{network_name}: last checkpoint {status["last_checkpoint"]} '
+            f'(epoch {status["epoch"]}), {status["idle_weeks"]} idle weeks, '
+            f'checkpoint() estimated at {status["checkpoint_gas"]} gas, '
+            f'next caller backfills {status["backfill_gas"]} gas; '
+            f'threshold in {status["weeks_to_threshold"]} weeks, limit in '
+            f'{status["weeks_to_limit"]} weeks'
+            + (' -> checkpoint' if status['checkpoint'] else '')
+        )
+        lines.append(
+            f'{"in weeks":>10}{"idle weeks":>12}{"backfill gas":>14}'
+            f'{"cost (gwei)":>16}'
+        )
+        for weeks, (idle, gas, cost) in status['curve'].items():
+            lines.append(
+                f'{weeks:>10}{idle:>12}{gas:>14}{cost / 10 ** 9:>16.0f}'
+            )
+    return '\n'.join(lines)
+
+
+def check(calibration=None, threshold=THRESHOLD_GAS):
+    """
+    Assessed status of every network in vespa_address_dict, each with a
+    model through the node's estimate (see BackfillModel.from_estimate)
+    """
+    pool = ChainPool(vespa_address_dict.keys())
+    statuses = {}
+    for network_name, status in pool.map(get_chain_status).items():
+        model = BackfillModel.from_estimate(
+            idle_weeks(status['last_checkpoint'], status['timestamp']),
+            status['checkpoint_gas'], calibration
+        )
+        statuses[network_name] = assess(status, model, threshold)
+    return statuses
+
+
+def checkpoint(network_name, keeper):
+    from brownie import web3
+    from .batch_reader import get_multicall_address
+
+    print('Checkpointing veSPA in network', network_name)
+    switch_network(network_name)
+    vespa = ReadClient(
+        network_name, web3, get_multicall_address()
+    ).contract('vespa')
+    return vespa.checkpoint({'from': keeper})
+
+
+def main(send='false'):
+    # brownie run scripts/checkpoint_keeper.py main [true]
+    try:
+        calibration = BackfillModel.from_baseline()
+    except FileNotFoundError:
+        calibration = None
+        print(f'No gas baseline, projecting {WEEK_GAS} gas per idle week')
+    statuses = check(calibration)
+    print(format_status(statuses))
+    due = [name for name, status in statuses.items() if status['checkpoint']]
+    if not due or send.lower() != 'true':
+        return statuses
+    from .utils import get_account
+
+    keeper = get_account('keeper account')
+    for network_name in due:
+        checkpoint(network_name, keeper)
+    return statuses
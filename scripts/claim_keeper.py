@@ -0,0 +1,272 @@
+from dataclasses import dataclass, field
+import os
+
+import numpy as np
+
+from web3.exceptions import ContractLogicError
+
+from .balance_matrix import UserPoints
+from .batch_reader import BatchReader, BoundContract, get_multicall_address
+from .claim_simulator import (
+    REWARD_CHECKPOINT_DEADLINE,
+    RewardSimulator,
+    load_holders,
+)
+from .distributor_comparison import WEEKLY_GAS, checkpoint_weeks
+from .history_cache import CachedReader, HistoryCache
+from .registry import get_abi, get_address
+
+WEEK = 7 * 86400
+
+# Users are claimed for from this many pending weeks, or when they are
+# within CAP_MARGIN weeks of maxIterations
+MIN_PENDING_WEEKS = 26
+CAP_MARGIN = 4
+
+# Gas of the claims submitted by one run, as planned with the WEEKLY_GAS
+# model
+GAS_BUDGET = 15000000
+
+# Gas limit of a claim relative to the node's estimate
+GAS_MARGIN = 1.3
+
+# depositFor on top of the claim when restaking: the SPA approval and
+# transfer plus a user and a global veSPA checkpoint
+RESTAKE_GAS = 120000
+
+# A restaked lock has to outlive the submission by this much
+RESTAKE_MARGIN = 86400
+
+
+@dataclass
+class Backlog:
+    """
+    Pending rewards of one user: `pending` claimable weeks from
+    `cursor`, for `amount` in total. `claims` holds the (weeks, gas) of
+    the claims needed to clear them, maxIterations weeks at most each.
+    """
+    addr: str
+    cursor: int
+    pending: int
+    amount: int
+    restake: bool = False
+    claims: list = field(default_factory=list)
+
+    @property
+    def gas(self):
+        return sum(gas for _, gas in self.claims)
+
+
+def claim_gas(weeks, initialized, restake=False, gas=WEEKLY_GAS):
+    """
+    Modelled gas of a claim processing `weeks` weeks, to plan the budget.
+    Gas limits come from the node, see estimate_limits.
+    """
+    used = gas['claim'] + gas['claim_week'] * weeks
+    if not initialized:
+        used += gas['claim_init']
+    if restake:
+        used += RESTAKE_GAS
+    return used
+
+
+def checkpoint_gas(simulator, ts, gas=WEEKLY_GAS):
+    """Gas of the reward checkpoint the first claim at `ts` triggers"""
+    last = simulator.lastRewardCheckpointTime
+    if (
+        not simulator.canCheckpointReward or
+        ts <= last + REWARD_CHECKPOINT_DEADLINE
+    ):
+        return 0
+    return (
+        gas['checkpointReward'] +
+        gas['checkpointReward_week'] * checkpoint_weeks(last, ts)
+    )
+
+
+def find_backlogs(simulator, points, min_weeks=MIN_PENDING_WEEKS,
+                  cap_margin=CAP_MARGIN, restakable=(), gas=WEEKLY_GAS):
+    """
+    Backlogs of the holders of `points` with at least `min_weeks` pending
+    weeks, or within `cap_margin` weeks of maxIterations, the largest
+    first. Holders in `restakable` are claimed for with restake.
+    """
+    init_cursor, _ = simulator.initializeUsers(points)
+    stored = np.array(
+        [simulator.timeCursorOf.get(addr, 0) for addr in points.holders],
+        dtype=np.int64
+    )
+    cursor = np.where(stored == 0, init_cursor, stored)
+    # every pending week in one go
+    new_cursor, amounts, _, errors = simulator.computeRewards(
+        points, max_iterations=2 ** 62
+    )
+    cap = simulator.maxIterations
+    threshold = min(min_weeks, max(cap - cap_margin, 1))
+    restakable = set(restakable)
+    backlogs = []
+    for i, addr in enumerate(points.holders):
+        pending = (new_cursor[i] - int(cursor[i])) // WEEK
+        if errors[i] is not None or pending < threshold:
+            continue
+        backlog = Backlog(
+            addr, int(cursor[i]), pending, amounts[i], addr in restakable
+        )
+        initialized = stored[i] != 0
+        for start in range(0, pending, cap):
+            weeks = min(cap, pending - start)
+            backlog.claims.append((weeks, claim_gas(
+                weeks, initialized, backlog.restake, gas
+            )))
+            initialized = True
+        backlogs.append(backlog)
+    backlogs.sort(key=lambda b: (b.pending, b.amount), reverse=True)
+    return backlogs
+
+
+def plan_claims(backlogs, budget=GAS_BUDGET, checkpoint=0):
+    """
+    Claims [(backlog, claim index)] fitting in `budget` gas, in priority
+    order. A backlog may be cleared partially; its claims are taken in
+    order. `checkpoint` is charged to the first claim.
+    """
+    planned = []
+    spent = checkpoint
+    for backlog in backlogs:
+        for i, (_, gas) in enumerate(backlog.claims):
+            if spent + gas > budget:
+                break
+            planned.append((backlog, i))
+            spent += gas
+    return planned, spent
+
+
+def restakable_holders(reader, vespa, holders, ts):
+    """Holders whose lock accepts depositFor until `ts`"""
+    locks = reader.call(
+        [(vespa, 'lockedBalances', (addr,)) for addr in holders]
+    )
+    return [
+        addr for addr, (auto_cooldown, cooldown, amount, end) in zip(
+            holders, locks
+        )
+        if amount > 0 and end > ts and (auto_cooldown or not cooldown)
+    ]
+
+
+def estimate_limits(w3, backlogs, rd_address, keeper):
+    """
+    {addr: gas limit} of the claims of `backlogs`, GAS_MARGIN over the
+    node's estimate of their next claim. That claim processes the most
+    weeks and pays for the initialization and any due reward checkpoint,
+    so the limit also covers the later claims of the backlog. Backlogs
+    whose claim the node expects to revert are left out.
+    """
+    rd = BoundContract(rd_address, get_abi('RewardDistributor_v1'))
+    limits = {}
+    for backlog in backlogs:
+        data = rd.encode('claim', (backlog.addr, backlog.restake))
+        try:
+            estimate = w3.eth.estimate_gas({
+                'from': str(keeper), 'to': rd_address,
+                'data': '0x' + data.hex(),
+            })
+        except (ContractLogicError, ValueError) as e:
+            print(f'Skipping {backlog.addr}: {e}')
+            continue
+        limits[backlog.addr] = int(estimate * GAS_MARGIN)
+    return limits
+
+
+def claim_steps(planned, keeper, cap, limits):
+    """
+    Pipeline steps of the planned claims with an estimated gas limit
+    (see estimate_limits). A step is named after the week cursor it
+    starts from, so a resumed run never mistakes a new claim for a
+    confirmed one.
+    """
+    from .deploy_pipeline import call
+
+    steps = []
+    for backlog, i in planned:
+        if backlog.addr not in limits:
+            continue
+        steps.append(call(
+            f'claim {backlog.addr} {backlog.cursor + i * cap * WEEK}',
+            keeper, 'reward_distributor', get_abi('RewardDistributor_v1'),
+            'claim',
+            lambda addresses, b=backlog: (b.addr, b.restake),
+            gas=limits[backlog.addr]
+        ))
+    return steps
+
+
+def format_plan(backlogs, planned, spent, budget):
+    lines = [
+        f'{len(backlogs)} backlogged holders, '
+        f'{sum(len(b.claims) for b in backlogs)} claims '
+        f'({sum(b.gas for b in backlogs)} gas) to clear them',
+        f'planned: {len(planned)} claims, {spent} / {budget} gas',
+        f'{"holder":<44}{"pending":>9}{"claims":>8}{"restake":>9}'
+        f'{"gas":>10}{"amount":>28}',
+    ]
+    counts = {}
+    for backlog, _ in planned:
+        counts[backlog.addr] = counts.get(backlog.addr, 0) + 1
+    for backlog in backlogs:
+        if backlog.addr not in counts:
+            continue
+        lines.append(
+            f'{backlog.addr:<44}{backlog.pending:>9}'
+            f'{counts[backlog.addr]:>8}'
+            f'{str(backlog.restake):>9}{backlog.gas:>10}'
+            f'{backlog.amount:>28}'
+        )
+    return '\n'.join(lines)
+
+
+def main():
+    from brownie import network, web3
+    from .deploy_pipeline import DeploymentPipeline
+    from .utils import choice, confirm, get_account
+
+    holders = load_holders(input('Enter the holders file path: '))
+    restake = choice('Restake the rewards of active locks?')
+    rd_address = get_address('reward_distributor')
+
+    reader = BatchReader(web3, get_multicall_address())
+    reader = CachedReader(reader, HistoryCache(), network.show_active())
+    rd = BoundContract(rd_address, get_abi('RewardDistributor_v1'))
+    vespa = BoundContract(get_address('vespa_proxy'), get_abi('veSPA_v1'))
+    simulator = RewardSimulator.from_chain(reader, rd, holders)
+    points = UserPoints.from_chain(reader, vespa, holders)
+    now = web3.eth.get_block('latest')['timestamp']
+    restakable = []
+    if restake:
+        restakable = restakable_holders(
+            reader, vespa, holders, now + RESTAKE_MARGIN
+        )
+
+    backlogs = find_backlogs(simulator, points, restakable=restakable)
+    checkpoint = checkpoint_gas(simulator, now)
+    planned, spent = plan_claims(backlogs, GAS_BUDGET, checkpoint)
+    print(format_plan(backlogs, planned, spent, GAS_BUDGET))
+    if not planned:
+        return
+    confirm('Submit the planned claims?')
+
+    keeper = get_account('keeper account')
+    limits = estimate_limits(
+        web3, list({id(b): b for b, _ in planned}.values()), rd_address,
+        keeper
+    )
+    steps = claim_steps(planned, keeper, simulator.maxIterations, limits)
+    pipeline = DeploymentPipeline(
+        steps,
+        os.path.join(
+            'deployed', network.show_active(), 'claim_keeper_journal.json'
+        ),
+        contracts={'reward_distributor': rd_address},
+    )
+    pipeline.run()
+    print(f'{len(steps)} claims confirmed')
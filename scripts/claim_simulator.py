@@ -0,0 +1,308 @@
+from dataclasses import dataclass
+import json
+
+import numpy as np
+
+from . import wide_int
+from .balance_matrix import UserPoints, balance_matrix
+from .batch_reader import BatchReader, BoundContract, get_multicall_address
+from .history_cache import CachedReader, HistoryCache
+from .registry import get_abi
+from .reward_calculator import get_reward_history
+
+# Constants of RewardDistributor_v1
+WEEK = 7 * 86400
+REWARD_CHECKPOINT_DEADLINE = 86400
+CHECKPOINT_WEEKS = 20
+MAX_ITERATIONS = 50
+
+
+@dataclass
+class Claim:
+    """
+    Outcome of `claim(addr)` for one user: the amount paid out, the
+    Claimed event's lastRewardClaimTime / rewardClaimedTill and the
+    number of claimable weeks left behind by the maxIterations limit.
+    `error` holds the revert reason of a claim that would fail.
+    """
+    amount: int = 0
+    lastRewardClaimTime: int = 0
+    rewardClaimedTill: int = 0
+    backlog: int = 0
+    error: str = None
+
+
+class RewardSimulator:
+    """
+    Off-chain model of RewardDistributor_v1 computing the claims of many
+    users at once.
+
+    The storage mirrors the contract; rewardsPerWeek and veSPASupply are
+    {week: value} dicts, typically filled from get_reward_history. User
+    balances come from UserPoints and are evaluated with balance_matrix,
+    so every user is handled by the same array operations.
+    """
+
+    def __init__(
+        self,
+        startTime,
+        lastRewardCheckpointTime=None,
+        lastRewardBalance=0,
+        maxIterations=MAX_ITERATIONS,
+        canCheckpointReward=False,
+        rewardsPerWeek=None,
+        veSPASupply=None,
+        timeCursorOf=None,
+    ):
+        self.startTime = (startTime // WEEK) * WEEK
+        if lastRewardCheckpointTime is None:
+            lastRewardCheckpointTime = self.startTime
+        self.lastRewardCheckpointTime = lastRewardCheckpointTime
+        self.lastRewardBalance = lastRewardBalance
+        self.maxIterations = maxIterations
+        self.canCheckpointReward = canCheckpointReward
+        self.rewardsPerWeek = dict(rewardsPerWeek or {})
+        self.veSPASupply = dict(veSPASupply or {})
+        self.timeCursorOf = dict(timeCursorOf or {})
+
+    @classmethod
+    def from_chain(cls, reader, rd, holders):
+        """Loads the storage of a deployed RewardDistributor_v1"""
+        reader.pin()
+        holders = list(holders)
+        (
+            start_time, last_checkpoint, last_balance, max_iterations,
+            can_checkpoint, *cursors
+        ) = reader.call(
+            [
+                (rd, 'startTime', ()),
+                (rd, 'lastRewardCheckpointTime', ()),
+                (rd, 'lastRewardBalance', ()),
+                (rd, 'maxIterations', ()),
+                (rd, 'canCheckpointReward', ()),
+            ] +
+            [(rd, 'timeCursorOf', (addr,)) for addr in holders]
+        )
+        # Every week up to the ongoing one, which a checkpoint tops up
+        weeks = range(start_time, last_checkpoint + 1, WEEK)
+        history = get_reward_history(reader, rd, weeks)
+        return cls(
+            start_time,
+            last_checkpoint,
+            last_balance,
+            max_iterations,
+            can_checkpoint,
+            {week: value[0] for week, value in history.items()},
+            {week: value[1] for week, value in history.items()},
+            {
+                addr: cursor
+                for addr, cursor in zip(holders, cursors)
+                if cursor != 0
+            },
+        )
+
+    def checkpointReward(self, token_balance, ts, total_supply):
+        """
+        Port of `_checkpointReward` run at block timestamp `ts`.
+        `token_balance` is the SPA balance of the distributor and
+        `total_supply(week)` returns veSPA.totalSupply(week) at `ts`.
+        """
+        to_distribute = token_balance - self.lastRewardBalance
+        self.lastRewardBalance = token_balance
+
+        t = self.lastRewardCheckpointTime
+        since_last = ts - t
+        self.lastRewardCheckpointTime = ts
+        this_week = (t // WEEK) * WEEK
+
+        # At most 20 weeks are distributed, the rest of the gap is lost
+        for _ in range(CHECKPOINT_WEEKS):
+            next_week = this_week + WEEK
+            self.veSPASupply[this_week] = total_supply(this_week)
+            rewards = self.rewardsPerWeek.get(this_week, 0)
+            if ts < next_week:
+                if since_last == 0:
+                    rewards += to_distribute
+                else:
+                    rewards += (to_distribute * (ts - t)) // since_last
+                self.rewardsPerWeek[this_week] = rewards
+                break
+            rewards += (to_distribute * (next_week - t)) // since_last
+            self.rewardsPerWeek[this_week] = rewards
+            t = next_week
+            this_week = next_week
+        return to_distribute
+
+    def initializeUsers(self, points):
+        """
+        Vectorized `_initializeUser`: the week cursor of every holder of
+        `points`, and a mask of the holders without any deposit.
+        """
+        n_holders = len(points.holders)
+        counts = np.bincount(points.holder, minlength=n_holders)
+        start = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        order = np.argsort(points.holder, kind='stable')
+        ts = points.ts[order]
+
+        # _findUserTimestampEpoch(addr, startTime), with epoch 0 mapped
+        # to 1 for users depositing after the start
+        before = np.bincount(
+            points.holder[points.ts <= self.startTime], minlength=n_holders
+        )
+        user_epoch = np.maximum(before, 1)
+        has_deposit = counts > 0
+        user_point_ts = np.zeros(n_holders, dtype=np.int64)
+        user_point_ts[has_deposit] = ts[
+            (start + user_epoch - 1)[has_deposit]
+        ]
+
+        cursor = ((user_point_ts + WEEK - 1) // WEEK) * WEEK
+        cursor = np.maximum(cursor, self.startTime)
+        return cursor, ~has_deposit
+
+    def computeRewards(
+        self, points, max_iterations=None, last_checkpoint=None
+    ):
+        """
+        Vectorized `_computeRewards` for every holder of `points`.
+        Returns (weekCursor, amount, backlog, error) lists, where backlog
+        counts the claimable weeks left beyond `max_iterations` (defaults
+        to maxIterations, a large value gives the full pending rewards).
+        """
+        if max_iterations is None:
+            max_iterations = self.maxIterations
+        if last_checkpoint is None:
+            last_checkpoint = self.lastRewardCheckpointTime
+        last_checkpoint = (last_checkpoint // WEEK) * WEEK
+        n_holders = len(points.holders)
+
+        init_cursor, no_deposit = self.initializeUsers(points)
+        stored = np.array(
+            [self.timeCursorOf.get(addr, 0) for addr in points.holders],
+            dtype=np.int64
+        )
+        initialized = stored != 0
+        cursor = np.where(initialized, stored, init_cursor)
+        no_deposit &= ~initialized
+
+        due = np.maximum((last_checkpoint - cursor + WEEK - 1) // WEEK, 0)
+        due[no_deposit] = 0
+        iterations = np.minimum(due, max_iterations)
+        backlog = due - iterations
+        new_cursor = cursor + iterations * WEEK
+
+        amounts = np.zeros(n_holders, dtype=object)
+        errors = [None] * n_holders
+        for i in np.flatnonzero(no_deposit):
+            errors[i] = 'User has no deposit'
+
+        active = iterations > 0
+        if active.any():
+            first_week = cursor[active].min()
+            if np.any((cursor[active] - first_week) % WEEK):
+                raise ValueError('week cursors are not WEEK aligned')
+            weeks = list(range(first_week, new_cursor.max(), WEEK))
+            balances = balance_matrix(points, weeks)
+            first = (cursor - first_week) // WEEK
+            last = first + iterations
+            for j, week in enumerate(weeks):
+                users = np.flatnonzero(active & (first <= j) & (j < last))
+                if len(users) == 0:
+                    continue
+                values = wide_int.to_ints(
+                    wide_int.take([limb[:, j] for limb in balances], users)
+                )
+                supply = self.veSPASupply.get(week, 0)
+                if supply == 0:
+                    # balance * rewards / 0 reverts the whole claim
+                    for i in users[values > 0]:
+                        errors[i] = 'division by zero'
+                    continue
+                amounts[users] += (
+                    values * self.rewardsPerWeek.get(week, 0)
+                ) // supply
+
+        for i, error in enumerate(errors):
+            if error is not None:
+                amounts[i] = 0
+                new_cursor[i] = cursor[i]
+        return (
+            [int(c) for c in new_cursor],
+            [int(a) for a in amounts],
+            [int(b) for b in backlog],
+            errors,
+        )
+
+    def claim(self, points, ts=None, token_balance=None, total_supply=None):
+        """
+        Simulates `claim(addr, restake)` by every holder of `points` in a
+        block at `ts`. The first claim of the block checkpoints rewards
+        when allowed, which needs `token_balance` and `total_supply`.
+        Updates timeCursorOf / lastRewardBalance and returns
+        {addr: Claim}.
+        """
+        if (
+            ts is not None and self.canCheckpointReward and
+            ts > self.lastRewardCheckpointTime + REWARD_CHECKPOINT_DEADLINE
+        ):
+            self.checkpointReward(token_balance, ts, total_supply)
+        cursors, amounts, backlogs, errors = self.computeRewards(points)
+        claims = {}
+        for addr, cursor, amount, backlog, error in zip(
+            points.holders, cursors, amounts, backlogs, errors
+        ):
+            last_claim = self.timeCursorOf.get(addr, 0) or self.startTime
+            if error is None:
+                self.timeCursorOf[addr] = cursor
+                self.lastRewardBalance -= amount
+            claims[addr] = Claim(amount, last_claim, cursor, backlog, error)
+        return claims
+
+
+def load_holders(path):
+    # JSON list of addresses, or one address per line
+    with open(path) as f:
+        content = f.read().strip()
+    if content.startswith('['):
+        return json.loads(content)
+    return [line.strip() for line in content.splitlines() if line.strip()]
+
+
+def main():
+    from brownie import network, web3
+
+    rd_address = input('Enter the RewardDistributor_v1 address: ')
+    holders = load_holders(input('Enter the holders file path: '))
+
+    reader = BatchReader(web3, get_multicall_address())
+    reader = CachedReader(reader, HistoryCache(), network.show_active())
+    rd = BoundContract(rd_address, get_abi('RewardDistributor_v1'))
+    vespa = BoundContract(
+        reader.call([(rd, 'veSPA', ())])[0], get_abi('veSPA_v1')
+    )
+    simulator = RewardSimulator.from_chain(reader, rd, holders)
+    points = UserPoints.from_chain(reader, vespa, holders)
+    cursors, amounts, backlogs, errors = simulator.computeRewards(points)
+
+    backlogged = [
+        addr for addr, backlog in zip(holders, backlogs) if backlog > 0
+    ]
+    print('holders: ', len(holders))
+    print('total claimable: ', sum(amounts))
+    print(f'holders beyond maxIterations ({simulator.maxIterations}): ',
+          len(backlogged))
+    print('claims needed to clear the backlog: ', sum(
+        -(-backlog // simulator.maxIterations) for backlog in backlogs
+    ))
+    report = {
+        addr: {
+            'amount': amount,
+            'rewardClaimedTill': cursor,
+            'backlog': backlog,
+            'error': error,
+        }
+        for addr, cursor, amount, backlog, error in zip(
+            holders, cursors, amounts, backlogs, errors
+        )
+    }
+    print(json.dumps(report, indent=4))
@@ -4,21 +4,16 @@ from brownie import (
     ProxyAdmin,
     RewardDistributor_v1,
     veSPA_v1,
-    Contract,
     chain,
 )
 import eth_utils
+from .deploy_pipeline import DeploymentPipeline, call, create
 from .utils import (
     get_account,
     save_deployment_artifacts,
-    getConstantsFromNetwork,
     signal_handler,
 )
-
-from .constants import (
-    mainnet_addresses,
-    testnet_addresses,
-)
+from .registry import get_address
 
 GAS_LIMIT = 200000000
 
@@ -31,60 +26,47 @@ def main():
     owner = get_account('owner account')
     admin = get_account('admin account')
 
-    spa = getConstantsFromNetwork(
-        testnet_addresses.L2_SPA,
-        mainnet_addresses.L2_SPA
-    )
-
-    # Deploy the proxy admin contract
-    proxy_admin = ProxyAdmin.deploy(
-        {'from': admin, 'gas': GAS_LIMIT}
-    )
-
-    # Deploy the main veSPA contract
-    vespa_base = veSPA_v1.deploy(
-        {'from': owner, 'gas': GAS_LIMIT}
-    )
-
-    vespa_base.initialize(
-        spa,
-        'v0',
-        {'from': owner, 'gas': GAS_LIMIT}
-    )
-
-    # Deploy the proxy contract for the vespa contract
-    vespa_proxy = TransparentUpgradeableProxy.deploy(
-        vespa_base.address,
-        proxy_admin.address,
-        eth_utils.to_bytes(hexstr='0x'),
-        {'from': admin, 'gas': GAS_LIMIT},
-    )
-
-    vespa = Contract.from_abi('veSPA', vespa_proxy.address, veSPA_v1.abi)
-
-    vespa.initialize(
-        spa,
-        'v0',
-        {'from': owner, 'gas': GAS_LIMIT}
-    )
-
-    print(f'veSPA contract deployed at: {vespa_proxy.address}')
-
-    reward_distributor = RewardDistributor_v1.deploy(
-        spa,
-        vespa,
-        chain.time(),
-        {'from': owner, 'gas': GAS_LIMIT}
-    )
+    spa = get_address('spa')
+
+    # Dependencies only wait for transactions of the other account,
+    # the rest is sent back-to-back with precomputed nonces / addresses
+    pipeline = DeploymentPipeline([
+        create('proxy_admin', admin, ProxyAdmin),
+        create('vespa_base', owner, veSPA_v1),
+        call(
+            'vespa_base_initialize', owner, 'vespa_base', veSPA_v1.abi,
+            'initialize', lambda addresses: (spa, 'v0')
+        ),
+        # Deploy the proxy contract for the vespa contract
+        create(
+            'vespa_proxy', admin, TransparentUpgradeableProxy,
+            lambda addresses: (
+                addresses['vespa_base'],
+                addresses['proxy_admin'],
+                eth_utils.to_bytes(hexstr='0x'),
+            ),
+            deps=['proxy_admin', 'vespa_base']
+        ),
+        call(
+            'vespa_initialize', owner, 'vespa_proxy', veSPA_v1.abi,
+            'initialize', lambda addresses: (spa, 'v0')
+        ),
+        create(
+            'reward_distributor', owner, RewardDistributor_v1,
+            lambda addresses: (chain.time(),)
+        ),
+    ], gas_limit=GAS_LIMIT)
+    addresses = pipeline.run()
+    print(f'veSPA contract deployed at: {addresses["vespa_proxy"]}')
 
     # Create a dict with all the relevant data to be persisted
     data = dict(
         type='deployment',
         spa=spa,
-        vespa_logic_contract=vespa_base.address,
-        vespa_proxy=vespa_proxy.address,
-        reward_distributor=reward_distributor.address,
-        proxy_admin=proxy_admin.address,
+        vespa_logic_contract=addresses['vespa_base'],
+        vespa_proxy=addresses['vespa_proxy'],
+        reward_distributor=addresses['reward_distributor'],
+        proxy_admin=addresses['proxy_admin'],
         owner=owner.address,
     )
 
@@ -0,0 +1,254 @@
+from dataclasses import dataclass, field
+from typing import Callable
+import json
+import os
+
+from brownie import network, web3
+from eth_utils import keccak, to_bytes, to_checksum_address
+import rlp
+
+from .batch_reader import BoundContract
+
+# Seconds to wait for the receipt of a submitted transaction
+RECEIPT_TIMEOUT = 600
+
+
+def create_address(sender, nonce):
+    """Address of the contract created by `sender` with `nonce`"""
+    return to_checksum_address(
+        keccak(rlp.encode([to_bytes(hexstr=str(sender)), nonce]))[12:]
+    )
+
+
+@dataclass
+class Step:
+    """
+    One deployment transaction. `encode(addresses)` returns its data
+    given the addresses of the contracts created by the plan. `target`
+    is the step whose contract is called, None for a contract creation.
+    `deps` are the steps that have to be executed before this one.
+    `gas` overrides the gas limit of the pipeline for this step.
+    """
+    name: str
+    sender: object
+    encode: Callable
+    target: str = None
+    deps: tuple = field(default_factory=tuple)
+    gas: int = None
+
+
+def create(name, sender, container, args=lambda addresses: (), deps=()):
+    """Step deploying `container` with the constructor `args(addresses)`"""
+    return Step(
+        name, sender,
+        lambda addresses: container.deploy.encode_input(*args(addresses)),
+        None, tuple(deps)
+    )
+
+
+def call(name, sender, target, abi, fn_name, args=lambda addresses: (),
+         deps=(), gas=None):
+    """
+    Step calling `fn_name` on the contract created by step `target`, or
+    on the existing contract of that name
+    """
+    def encode(addresses):
+        contract = BoundContract(addresses[target], abi)
+        return '0x' + contract.encode(fn_name, args(addresses)).hex()
+    return Step(name, sender, encode, target, (target,) + tuple(deps), gas)
+
+
+class DeploymentPipeline:
+    """
+    Submits the transactions of a deployment plan without waiting for
+    each receipt.
+
+    Nonces are assigned upfront, so the address of every created
+    contract is known before anything is sent. A step only has to wait
+    for a dependency sent by another account: transactions of the same
+    account are executed in nonce order anyway. Steps are grouped in
+    waves accordingly, every wave is sent back-to-back and confirmed
+    before the next one. Progress is written to a journal after every
+    submission and confirmation; running the same plan again skips the
+    confirmed steps and re-plans the rest with fresh nonces.
+
+    A step without a gas limit (its own or the pipeline's) is estimated
+    by the node when it is sent, which fails against a dependency not
+    executed yet: such a step always waits for the wave of its
+    dependencies to be confirmed.
+
+    `contracts` names already deployed contracts {name: address} that
+    steps can target without creating them.
+    """
+
+    def __init__(self, steps, journal_path=None, gas_limit=None, w3=web3,
+                 contracts=None):
+        self.steps = {step.name: step for step in steps}
+        self.order = [step.name for step in steps]
+        self.contracts = dict(contracts or {})
+        for step in steps:
+            for dep in step.deps:
+                if dep in self.contracts:
+                    continue
+                if self.order.index(dep) > self.order.index(step.name):
+                    raise ValueError(f'{step.name} is listed before {dep}')
+        self.journal_path = journal_path or os.path.join(
+            'deployed', network.show_active(), 'deploy_journal.json'
+        )
+        self.gas_limit = gas_limit
+        self.w3 = w3
+        self.journal = self._load_journal()
+
+    def _load_journal(self):
+        if not os.path.exists(self.journal_path):
+            return {}
+        with open(self.journal_path) as f:
+            return json.load(f)
+
+    def _save_journal(self):
+        dirname = os.path.dirname(self.journal_path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        tmp_path = self.journal_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.journal, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, self.journal_path)
+
+    def _receipt(self, tx_hash):
+        return self.w3.eth.wait_for_transaction_receipt(
+            tx_hash, timeout=RECEIPT_TIMEOUT
+        )
+
+    def _confirm(self, names):
+        """
+        Waits for the submitted `names` and returns the failed ones.
+        A step fails if it reverted or a dependency failed.
+        """
+        failed = set()
+        for name in names:
+            entry = self.journal[name]
+            receipt = self._receipt(entry['tx'])
+            entry['block'] = receipt['blockNumber']
+            deps_failed = failed.intersection(self.steps[name].deps)
+            if receipt['status'] == 1 and not deps_failed:
+                entry['status'] = 'confirmed'
+            else:
+                entry['status'] = 'failed'
+                failed.add(name)
+            self._save_journal()
+        return failed
+
+    def resume(self):
+        """Settles the steps left submitted by an interrupted run"""
+        submitted = [
+            name for name in self.order
+            if self.journal.get(name, {}).get('status') == 'submitted'
+        ]
+        self._confirm(submitted)
+
+    def plan(self):
+        """
+        Returns the waves [[(name, nonce, address)]] of the steps not
+        confirmed yet. `address` is the created contract, or None.
+        """
+        done = {
+            name for name, entry in self.journal.items()
+            if entry.get('status') == 'confirmed'
+        }
+        done.update(self.contracts)
+        pending = [name for name in self.order if name not in done]
+        wave_of = {}
+        for name in pending:
+            step = self.steps[name]
+            wave = 0
+            for dep in step.deps:
+                if dep in done:
+                    continue
+                pipelined = (
+                    self.steps[dep].sender == step.sender and
+                    (step.gas or self.gas_limit) is not None
+                )
+                wave = max(wave, wave_of[dep] + (0 if pipelined else 1))
+            wave_of[name] = wave
+
+        nonces = {}
+        waves = []
+        for name in sorted(
+            pending, key=lambda n: (wave_of[n], self.order.index(n))
+        ):
+            step = self.steps[name]
+            sender = str(step.sender)
+            if sender not in nonces:
+                nonces[sender] = self.w3.eth.get_transaction_count(
+                    sender, 'pending'
+                )
+            nonce = nonces[sender]
+            nonces[sender] += 1
+            address = None
+            if step.target is None:
+                address = create_address(sender, nonce)
+            while len(waves) <= wave_of[name]:
+                waves.append([])
+            waves[wave_of[name]].append((name, nonce, address))
+        return waves
+
+    def addresses(self):
+        """
+        Addresses of the contracts created by confirmed steps, and of the
+        existing ones
+        """
+        addresses = dict(self.contracts)
+        addresses.update(
+            (name, entry['address'])
+            for name, entry in self.journal.items()
+            if entry.get('address') and entry['status'] == 'confirmed'
+        )
+        return addresses
+
+    def run(self):
+        """
+        Executes the plan and returns {step: created contract address}.
+        Raises RuntimeError with the failed steps; the confirmed ones
+        are kept in the journal for the next run. The journal is removed
+        once every step is confirmed.
+        """
+        self.resume()
+        waves = self.plan()
+        addresses = self.addresses()
+        for wave in waves:
+            for name, _, address in wave:
+                if address is not None:
+                    addresses[name] = address
+        for i, wave in enumerate(waves):
+            print(f'Wave {i + 1}/{len(waves)}: {[n for n, _, _ in wave]}')
+            submitted = []
+            try:
+                for name, nonce, address in wave:
+                    step = self.steps[name]
+                    to = None
+                    if step.target is not None:
+                        to = addresses[step.target]
+                    tx = step.sender.transfer(
+                        to, 0, gas_limit=step.gas or self.gas_limit,
+                        data=step.encode(addresses), nonce=nonce,
+                        required_confs=0, allow_revert=True
+                    )
+                    self.journal[name] = {
+                        'tx': tx.txid,
+                        'nonce': nonce,
+                        'address': address,
+                        'status': 'submitted',
+                    }
+                    self._save_journal()
+                    submitted.append(name)
+            finally:
+                # Settle what was sent even if a submission failed
+                failed = self._confirm(submitted)
+            if failed:
+                raise RuntimeError(
+                    f'Deployment steps failed: {sorted(failed)}. Fix the '
+                    'cause and run again to resume.'
+                )
+        addresses = self.addresses()
+        os.remove(self.journal_path)
+        return addresses
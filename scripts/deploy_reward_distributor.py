@@ -5,57 +5,47 @@ from brownie import (
     Contract,
     chain,
     network,
+    web3,
 )
 from .utils import (
     confirm,
     get_account,
     save_deployment_artifacts,
-    getConstantsFromNetwork,
     signal_handler,
 )
-
-from .constants import (
-    mainnet_addresses,
-    testnet_addresses,
-)
+from .registry import get_address
+from .rpc_provider import install
 
 import json
 
 GAS_LIMIT = 200000000
 
-vespa_address_dict = {
-    'arbitrum-one': '0x2e2071180682Ce6C247B1eF93d382D509F5F6A17',
-    'mainnet': '0xbF82a3212e13b2d407D10f5107b5C8404dE7F403',
-}
-
 
 def main():
     # handle ctrl-C event
     signal.signal(signal.SIGINT, signal_handler)
+    # retry the rate limited requests instead of aborting the deployment
+    install(web3)
     confirm(
         'EMERGENCY_RETURN address has been updated with the required value?'
         )
-    print('Confirm the addresses are correct: \n')
-    confirm(json.dumps(vespa_address_dict, indent=4) + '\n')
-    assert (network.show_active() in vespa_address_dict.keys)
-
-    # contract owner account
-    owner = get_account('owner account')
-
-    spa = getConstantsFromNetwork(
-        testnet_addresses.L2_SPA,
-        mainnet_addresses.L2_SPA
-    )
-
+    spa = get_address('spa')
     vespa = Contract.from_abi(
         'veSPA',
-        vespa_address_dict[network.show_active()],
+        get_address('vespa_proxy'),
         veSPA_v1.abi
         )
+    print('Confirm the addresses are correct: \n')
+    confirm(json.dumps(
+        {'network': network.show_active(), 'spa': spa, 'vespa': vespa.address},
+        indent=4
+    ) + '\n')
+
+    # contract owner account
+    owner = get_account('owner account')
 
+    # SPA and veSPA are constants of RewardDistributor_v1
     reward_distributor = RewardDistributor_v1.deploy(
-        spa,
-        vespa,
         chain.time(),
         {'from': owner, 'gas': GAS_LIMIT}
     )
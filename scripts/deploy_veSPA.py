@@ -9,14 +9,9 @@ import eth_utils
 from .utils import (
     get_account,
     save_deployment_artifacts,
-    getConstantsFromNetwork,
     signal_handler,
 )
-
-from .constants import (
-    mainnet_addresses,
-    testnet_addresses,
-)
+from .registry import get_address
 
 GAS_LIMIT = 200000000
 
@@ -29,10 +24,7 @@ def main():
     owner = get_account('owner account')
     admin = get_account('admin account')
 
-    spa = getConstantsFromNetwork(
-        testnet_addresses.L2_SPA,
-        mainnet_addresses.L2_SPA
-    )
+    spa = get_address('spa')
 
     # Deploy the proxy admin contract
     proxy_admin = ProxyAdmin.deploy(
@@ -0,0 +1,114 @@
+import numpy as np
+
+from . import wide_int
+from .vespa_engine import (
+    I_MIN_TIME,
+    I_YEAR,
+    MAX_TIME,
+    WEEK,
+    int128,
+    require,
+    sdiv,
+)
+
+INT128_MAX = (1 << 127) - 1
+
+
+def _checked(value):
+    # Checked int128 arithmetic reverts with Panic(0x11), which brownie
+    # reports as 'Integer overflow'
+    require(-INT128_MAX - 1 <= value <= INT128_MAX, 'Integer overflow')
+    return value
+
+
+def estimateDeposit(auto_cooldown, value, expected_unlock_time, ts):
+    """
+    veSPA_v1.estimateDeposit(autoCooldown, value, expectedUnlockTime)
+    executed at block.timestamp `ts`. Returns the same tuple: (autoCooldown,
+    initialVespaBalance, slope, bias, residue, actualUnlockTime,
+    providedUnlockTime, residuePeriodStart). Raises Revert like the call.
+    """
+    actual_unlock_time = (expected_unlock_time // WEEK) * WEEK
+    require(actual_unlock_time > ts, 'Cannot lock in the past')
+    require(
+        actual_unlock_time <= ts + MAX_TIME,
+        'Voting lock can be 4 years max'
+    )
+    amt = int128(value)
+    slope = sdiv(amt, I_YEAR)
+    residue = 0
+    residue_period_start = 0
+    if not auto_cooldown:
+        residue = sdiv(_checked(amt * I_MIN_TIME), I_YEAR)
+        residue_period_start = actual_unlock_time - WEEK
+        dt = actual_unlock_time - WEEK - ts
+    else:
+        dt = actual_unlock_time - ts
+    bias = _checked(slope * int128(dt))
+    if bias <= 0:
+        bias = 0
+    return (
+        auto_cooldown,
+        _checked(bias + residue),
+        slope,
+        bias,
+        residue,
+        actual_unlock_time,
+        expected_unlock_time,
+        residue_period_start,
+    )
+
+
+def quote_grid(amounts, unlock_times, auto_cooldown, ts):
+    """
+    estimateDeposit for every amount x expected unlock time at
+    block.timestamp `ts`, in one pass over the grid.
+
+    slope and residue only depend on the amount and are computed once per
+    row with Python ints; the bias of every cell is the exact product
+    slope * dt on wide_int limbs. Amounts have to be below 2**127 /
+    I_MIN_TIME, where the contract would not overflow. Returns a dict of
+    numpy arrays: 'slope' and 'residue' per amount, 'unlock_time',
+    'residue_period_start' and 'valid' per unlock time ('valid' is False
+    where the call reverts) and 'bias' / 'initial_balance' per cell, as
+    Python ints and zero in the columns that revert.
+    """
+    amounts = [int(amount) for amount in amounts]
+    if any(not 0 <= a <= INT128_MAX // I_MIN_TIME for a in amounts):
+        raise ValueError('amounts must be in [0, 2**127 / I_MIN_TIME]')
+    expected = np.asarray(unlock_times, dtype=np.int64)
+    unlock_time = (expected // WEEK) * WEEK
+    valid = (unlock_time > ts) & (unlock_time <= ts + MAX_TIME)
+
+    slope = [a // I_YEAR for a in amounts]
+    if auto_cooldown:
+        residue = [0] * len(amounts)
+        residue_period_start = np.zeros_like(unlock_time)
+        dt = unlock_time - ts
+    else:
+        residue = [a * I_MIN_TIME // I_YEAR for a in amounts]
+        residue_period_start = np.where(valid, unlock_time - WEEK, 0)
+        dt = unlock_time - WEEK - ts
+    # A negative dt gives a negative bias, which the contract clamps to 0
+    dt = np.where(valid, np.clip(dt, 0, MAX_TIME), 0)
+
+    n_limbs = wide_int.n_limbs_for(slope + residue)
+    slope_limbs = [
+        limb[:, None] for limb in wide_int.from_ints(slope, n_limbs)
+    ]
+    residue_limbs = [
+        np.where(valid, limb[:, None], 0)
+        for limb in wide_int.from_ints(residue, n_limbs)
+    ]
+    bias = wide_int.mul_small(slope_limbs, dt[None, :])
+    return {
+        'slope': np.array(slope, dtype=object),
+        'residue': np.array(residue, dtype=object),
+        'unlock_time': np.where(valid, unlock_time, 0),
+        'residue_period_start': residue_period_start,
+        'valid': valid,
+        'bias': wide_int.to_ints(bias),
+        'initial_balance': wide_int.to_ints(
+            wide_int.add(bias, residue_limbs)
+        ),
+    }
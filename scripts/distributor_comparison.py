@@ -0,0 +1,627 @@
+from dataclasses import dataclass
+import json
+import os
+
+import numpy as np
+
+from . import wide_int
+from .balance_matrix import UserPoints, balance_matrix
+from .claim_simulator import (
+    CHECKPOINT_WEEKS,
+    REWARD_CHECKPOINT_DEADLINE,
+    RewardSimulator,
+)
+from .vespa_engine import MAX_TIME, Revert, VeSPAEngine, WEEK, require
+
+# Constant of RewardDistributor_Frax_Model
+PRICE_PRECISION = 10 ** 18
+
+# Every simulated week, rewards are added an hour into the week and the
+# users due claim (or checkpoint) an hour later
+REWARD_OFFSET = 3600
+CLAIM_OFFSET = 7200
+
+# lockedEnd history lookup keys: holder index << TS_BITS | timestamp
+TS_BITS = 34
+
+# Gas of the paths each model runs, used to price a simulated schedule.
+# Rough figures from the storage slots and external calls of every path
+# (cold SLOAD 2100, new SSTORE 20000 / update 2900, a cold call 2600 plus
+# the veSPA view). Measured figures in MEASURED_GAS_PATH replace them;
+# reports flag the models priced with estimates.
+WEEKLY_GAS = {
+    'addRewards': 55000,
+    'checkpointReward': 35000,
+    # one week of the _checkpointReward loop: totalSupply + 2 SSTOREs
+    'checkpointReward_week': 30000,
+    # claim fixed part, SPA transfer and Claimed event included
+    'claim': 60000,
+    # _initializeUser binary search on the first claim
+    'claim_init': 20000,
+    # one _computeRewards iteration: balanceOf + 2 SLOADs
+    'claim_week': 9000,
+}
+FRAX_GAS = {
+    'notifyRewardAmount': 75000,
+    # sync, earned and the user's storage
+    'checkpointUser': 110000,
+    # getReward on top of its checkpoint: SPA transfer and event
+    'getReward': 35000,
+}
+
+# Gas measured on the deployed Frax model by
+# tests/test_distributor_comparison.py (UPDATE_GAS_BASELINE=1).
+# RewardDistributor_v1 only runs on a fork (its addresses are constants),
+# its figures are still the estimates above.
+MEASURED_GAS_PATH = os.path.join('benchmarks', 'gas_distributors.json')
+
+# Claim patterns of the default sweep: weeks between claims, 0 to only
+# claim at the end of the simulation
+PATTERNS = {
+    'weekly': 1,
+    'monthly': 4,
+    'quarterly': 13,
+    'at the end': 0,
+}
+
+
+class Population:
+    """
+    Locks driving both models: the veSPA state as a VeSPAEngine, the user
+    points of its holders and their lockedEnd history, which the Frax
+    model checkpoints. `lock_ends` lists the (addr, ts, lockedEnd) changes
+    in order.
+    """
+
+    def __init__(self, engine, lock_ends):
+        self.engine = engine
+        self.points = UserPoints.from_engine(engine)
+        n_holders = len(self.points.holders)
+        index = {addr: i for i, addr in enumerate(self.points.holders)}
+
+        self.first_deposit = np.full(n_holders, np.iinfo(np.int64).max)
+        np.minimum.at(self.first_deposit, self.points.holder, self.points.ts)
+
+        holder = np.array([index[addr] for addr, _, _ in lock_ends],
+                          dtype=np.int64)
+        keys = (holder << TS_BITS) + np.array(
+            [ts for _, ts, _ in lock_ends], dtype=np.int64
+        )
+        order = np.argsort(keys, kind='stable')
+        self._end_keys = keys[order]
+        self._end_holder = holder[order]
+        self._ends = np.array(
+            [end for _, _, end in lock_ends], dtype=np.int64
+        )[order]
+
+    @classmethod
+    def synthetic(cls, n_users, start, n_weeks, seed=0):
+        """
+        Random locks created from a month before `start` to three
+        quarters of the `n_weeks` simulated weeks: lognormal amounts,
+        1 to 208 week durations, half of them with auto cooldown and a
+        third topped up once with increaseAmount.
+        """
+        rng = np.random.default_rng(seed)
+        horizon = start + n_weeks * WEEK
+        created = rng.integers(
+            start - 4 * WEEK, start + n_weeks * WEEK * 3 // 4, n_users
+        )
+        amounts = np.exp(rng.normal(7, 2, n_users)).clip(1, 10 ** 9)
+        durations = rng.integers(1, MAX_TIME // WEEK, n_users) * WEEK
+        auto_cooldown = rng.random(n_users) < 0.5
+        topped_up = np.flatnonzero(rng.random(n_users) < 1 / 3)
+        top_up_ts = created[topped_up] + (
+            rng.random(len(topped_up)) *
+            (np.minimum(created[topped_up] + durations[topped_up] - WEEK,
+                        horizon) - created[topped_up])
+        ).astype(np.int64)
+
+        ops = [
+            (int(ts), 0, i) for i, ts in enumerate(created)
+        ] + [
+            (int(ts), 1, int(i)) for i, ts in zip(topped_up, top_up_ts)
+        ]
+        ops.sort()
+        engine = VeSPAEngine(ops[0][0] - 1, 0)
+        lock_ends = []
+        for blk, (ts, op, i) in enumerate(ops, 1):
+            addr = f'user{i}'
+            value = int(amounts[i] * 10 ** 18)
+            try:
+                if op == 0:
+                    engine.createLock(
+                        addr, value, ts + int(durations[i]),
+                        bool(auto_cooldown[i]), ts, blk
+                    )
+                else:
+                    engine.increaseAmount(addr, value, ts, blk)
+            except Revert:
+                continue
+            lock_ends.append((addr, ts, engine.lockedEnd(addr)))
+        return cls(engine, lock_ends)
+
+    @classmethod
+    def from_store(cls, store, network_name, vespa, genesis_ts, genesis_blk,
+                   to_block=None):
+        """
+        Population recorded by the event indexer for the veSPA_v1 at
+        `vespa`, like event_indexer.build_engine.
+        """
+        engine = VeSPAEngine(genesis_ts, genesis_blk)
+        lock_ends = []
+        names = ['UserCheckpoint', 'Withdraw', 'GlobalCheckpoint']
+        for name, args, ts, blk, _ in store.events(
+            network_name, vespa, names, to_block
+        ):
+            engine.apply_event(name, args, ts, blk)
+            if name != 'GlobalCheckpoint':
+                addr = args['provider']
+                lock_ends.append((addr, ts, engine.lockedEnd(addr)))
+        return cls(engine, lock_ends)
+
+    def balances(self, ts):
+        """veSPA.balanceOf(holder, ts) of every holder, as Python ints"""
+        return wide_int.to_ints(balance_matrix(self.points, [ts]))[:, 0]
+
+    def locked_end(self, index, ts):
+        """veSPA.lockedEnd(holder) at `ts` of the holders at `index`"""
+        index = np.asarray(index, dtype=np.int64)
+        found = np.searchsorted(
+            self._end_keys, (index << TS_BITS) + ts, 'right'
+        ) - 1
+        valid = found >= 0
+        found = np.maximum(found, 0)
+        valid &= self._end_holder[found] == index
+        return np.where(valid, self._ends[found], 0)
+
+    def total_supply(self, ts):
+        return self.engine.totalSupply(ts)
+
+
+class FraxSimulator:
+    """
+    Off-chain model of RewardDistributor_Frax_Model for the holders of a
+    Population. Global storage is mirrored by attributes and the user
+    mappings by arrays indexed like the holders; functions run for many
+    users executed in the same block at once.
+
+    getReward as written only pays out when the user's rewards are zero
+    (`if (reward0 == 0)`), so it never pays anything. The simulator pays
+    and resets the accrued rewards, which is what the fork intends.
+    """
+
+    def __init__(self, n_holders, ts, rewardDuration=WEEK):
+        # storage as written by `initialize` at `ts`
+        self.periodFinish = 0
+        self.lastUpdateTime = ts
+        self.rewardRate = 0
+        self.rewardDuration = rewardDuration
+        self.rewardPerVeSPAStored = 0
+        self.totalVeSPAParticipating = 0
+        self.totalVeSPASupplyStored = 0
+        self.rewards = np.zeros(n_holders, dtype=object)
+        self.userRewardPerTokenPaid = np.zeros(n_holders, dtype=object)
+        self.userVeSPACheckpointed = np.zeros(n_holders, dtype=object)
+        self.userVeSPAEndpointCheckpointed = np.zeros(
+            n_holders, dtype=np.int64
+        )
+        self.lastRewardClaimTime = np.zeros(n_holders, dtype=np.int64)
+        self.userIsInitialized = np.zeros(n_holders, dtype=bool)
+
+    def lastTimeRewardApplicable(self, ts):
+        return min(ts, self.periodFinish)
+
+    def rewardPerVeSPA(self, ts):
+        if self.totalVeSPASupplyStored == 0:
+            return self.rewardPerVeSPAStored
+        return self.rewardPerVeSPAStored + (
+            (self.lastTimeRewardApplicable(ts) - self.lastUpdateTime) *
+            self.rewardRate * PRICE_PRECISION
+        ) // self.totalVeSPASupplyStored
+
+    def sync(self, ts, total_supply):
+        """`total_supply` is veSPA.totalSupply() at `ts`"""
+        self.rewardPerVeSPAStored = self.rewardPerVeSPA(ts)
+        self.totalVeSPASupplyStored = total_supply
+        self.lastUpdateTime = self.lastTimeRewardApplicable(ts)
+
+    def notifyRewardAmount(self, amount, ts, total_supply):
+        self.sync(ts, total_supply)
+        if ts >= self.periodFinish:
+            self.rewardRate = amount // self.rewardDuration
+        else:
+            leftover = (self.periodFinish - ts) * self.rewardRate
+            self.rewardRate = (amount + leftover) // self.rewardDuration
+        self.lastUpdateTime = ts
+        self.periodFinish = ts + self.rewardDuration
+
+    def earned(self, users, ts, balances):
+        """
+        earned(account) at `ts` for the holders at `users`, whose
+        veSPA.balanceOf at `ts` is `balances`.
+        """
+        end = self.userVeSPAEndpointCheckpointed[users]
+        last_claim = self.lastRewardClaimTime[users]
+        eligible = np.where(ts < end, balances, 0)
+
+        expired = eligible == 0
+        claimed_after_end = expired & (last_claim >= end)
+        partial = expired & ~claimed_after_end
+        require(
+            not np.any(partial & (ts == last_claim)),
+            'Division or modulo by zero'
+        )
+        eligible_time_fraction = np.where(
+            partial,
+            (end - last_claim).astype(object) * PRICE_PRECISION //
+            np.maximum(ts - last_claim, 1),
+            PRICE_PRECISION
+        )
+
+        old = self.userVeSPACheckpointed[users]
+        balance_to_use = np.where(eligible >= old, old, (eligible + old) // 2)
+        earned = self.rewards[users] + balance_to_use * (
+            (self.rewardPerVeSPA(ts) - self.userRewardPerTokenPaid[users]) *
+            eligible_time_fraction
+        ) // (PRICE_PRECISION * PRICE_PRECISION)
+        return np.where(
+            ~self.userIsInitialized[users] | claimed_after_end, 0, earned
+        )
+
+    def checkpointUsers(self, users, ts, balances, ends, total_supply):
+        """
+        _checkpointUser(account) for the holders at `users` in one block:
+        `balances` / `ends` are their veSPA balanceOf / lockedEnd at `ts`.
+        Within a block only the first sync moves rewardPerVeSPAStored.
+        """
+        users = np.asarray(users, dtype=np.int64)
+        self.sync(ts, total_supply)
+        self.rewards[users] = self.earned(users, ts, balances)
+        self.userRewardPerTokenPaid[users] = self.rewardPerVeSPAStored
+        self.totalVeSPAParticipating += int(
+            np.sum(balances - self.userVeSPACheckpointed[users])
+        )
+        self.userVeSPACheckpointed[users] = balances
+        self.userVeSPAEndpointCheckpointed[users] = ends
+        new = users[~self.userIsInitialized[users]]
+        self.userIsInitialized[new] = True
+        self.lastRewardClaimTime[new] = ts
+
+    def getReward(self, users, ts, balances, ends, total_supply):
+        """Pays and resets the rewards of `users`, returned as an array"""
+        users = np.asarray(users, dtype=np.int64)
+        self.checkpointUsers(users, ts, balances, ends, total_supply)
+        paid = self.rewards[users].copy()
+        self.rewards[users] = 0
+        return paid
+
+
+@dataclass
+class ModelRun:
+    """
+    Outcome of a claim pattern on one model: SPA paid to every holder (in
+    the population's order), the total gas of the transactions sent, the
+    number of claim transactions and the checkpoints the model needed:
+    _checkpointReward runs for RewardDistributor_v1, checkpointOtherUser
+    transactions (first checkpoint and lock changes) for the Frax model.
+    """
+    paid: np.ndarray
+    gas: int = 0
+    claims: int = 0
+    checkpoints: int = 0
+    rewards: int = 0
+
+    @property
+    def undistributed(self):
+        return self.rewards - int(np.sum(self.paid))
+
+
+def _steps(population, start, n_weeks, claim_every):
+    """
+    Yields (week, reward_ts, claim_ts, joined, claimers) for every
+    simulated week. Holders join at the first claim time after their
+    first deposit and then claim every `claim_every[holder]` weeks (never
+    before the end when 0).
+    """
+    joined_week = np.maximum(
+        -((start + CLAIM_OFFSET - population.first_deposit) // WEEK), 0
+    )
+    for week in range(n_weeks):
+        week_start = start + week * WEEK
+        since = week - joined_week
+        claimers = np.flatnonzero(
+            (since > 0) & (claim_every > 0) &
+            (since % np.maximum(claim_every, 1) == 0)
+        )
+        yield (
+            week,
+            week_start + REWARD_OFFSET,
+            week_start + CLAIM_OFFSET,
+            np.flatnonzero(joined_week == week),
+            claimers,
+        )
+
+
+def _joined(population, start, n_weeks):
+    end_ts = start + n_weeks * WEEK + CLAIM_OFFSET
+    return end_ts, np.flatnonzero(population.first_deposit <= end_ts)
+
+
+def checkpoint_weeks(last_checkpoint, ts):
+    # Iterations of the _checkpointReward loop run at `ts`
+    return min(ts // WEEK - last_checkpoint // WEEK + 1, CHECKPOINT_WEEKS)
+
+
+def simulate_weekly(population, start, rewards, claim_every,
+                    gas=WEEKLY_GAS):
+    """
+    Runs RewardDistributor_v1 (canCheckpointReward enabled) on the
+    population: rewards[week] is added every week and holders claim
+    without restaking on their schedule. At the end every holder claims,
+    as many times as the maxIterations backlog requires.
+    """
+    n_holders = len(population.points.holders)
+    claim_every = np.broadcast_to(claim_every, n_holders)
+    simulator = RewardSimulator(start, canCheckpointReward=True)
+    run = ModelRun(np.zeros(n_holders, dtype=object),
+                   rewards=int(sum(rewards)))
+    token_balance = 0
+
+    def checkpoint_gas(before, ts):
+        if simulator.lastRewardCheckpointTime == before:
+            return 0
+        run.checkpoints += 1
+        return (
+            gas['checkpointReward'] +
+            gas['checkpointReward_week'] * checkpoint_weeks(before, ts)
+        )
+
+    def claim(users, ts):
+        nonlocal token_balance
+        points = population.points.take(users)
+        init_cursor, _ = simulator.initializeUsers(points)
+        stored = np.array(
+            [simulator.timeCursorOf.get(addr, 0) for addr in points.holders],
+            dtype=np.int64
+        )
+        cursor = np.where(stored == 0, init_cursor, stored)
+        before = simulator.lastRewardCheckpointTime
+        claims = simulator.claim(
+            points, ts, token_balance, population.total_supply
+        )
+        run.gas += checkpoint_gas(before, ts)
+        backlog = np.zeros(len(users), dtype=np.int64)
+        for i, result in enumerate(claims.values()):
+            if result.error is not None:
+                continue
+            run.claims += 1
+            run.paid[users[i]] += result.amount
+            token_balance -= result.amount
+            backlog[i] = result.backlog
+            run.gas += gas['claim'] + gas['claim_week'] * (
+                (result.rewardClaimedTill - cursor[i]) // WEEK
+            )
+            if stored[i] == 0:
+                run.gas += gas['claim_init']
+        return users[backlog > 0]
+
+    for week, reward_ts, claim_ts, _, claimers in _steps(
+        population, start, len(rewards), claim_every
+    ):
+        token_balance += rewards[week]
+        run.gas += gas['addRewards']
+        before = simulator.lastRewardCheckpointTime
+        if reward_ts > before + REWARD_CHECKPOINT_DEADLINE:
+            simulator.checkpointReward(
+                token_balance, reward_ts, population.total_supply
+            )
+        run.gas += checkpoint_gas(before, reward_ts)
+        if len(claimers):
+            claim(claimers, claim_ts)
+
+    end_ts, users = _joined(population, start, len(rewards))
+    while len(users):
+        users = claim(users, end_ts)
+    return run
+
+
+def simulate_frax(population, start, rewards, claim_every, gas=FRAX_GAS):
+    """
+    Runs RewardDistributor_Frax_Model on the population: rewards[week] is
+    notified every week, holders are checkpointed when they join and after
+    each lock change, and claim with getReward on their schedule. At the
+    end every holder claims once.
+    """
+    n_holders = len(population.points.holders)
+    claim_every = np.broadcast_to(claim_every, n_holders)
+    simulator = FraxSimulator(n_holders, start)
+    run = ModelRun(np.zeros(n_holders, dtype=object),
+                   rewards=int(sum(rewards)))
+    points = population.points
+
+    def call(method, users, ts, balances):
+        return method(
+            users, ts, balances[users], population.locked_end(users, ts),
+            population.total_supply(ts)
+        )
+
+    last_ts = start
+    for week, reward_ts, claim_ts, joined, claimers in _steps(
+        population, start, len(rewards), claim_every
+    ):
+        simulator.notifyRewardAmount(
+            rewards[week], reward_ts, population.total_supply(reward_ts)
+        )
+        run.gas += gas['notifyRewardAmount']
+
+        changed = np.zeros(n_holders, dtype=bool)
+        changed[points.holder[
+            (points.ts > last_ts) & (points.ts <= claim_ts)
+        ]] = True
+        changed &= simulator.userIsInitialized
+        changed[claimers] = False
+        changed[joined] = True
+        checkpointed = np.flatnonzero(changed)
+        last_ts = claim_ts
+        if not len(checkpointed) and not len(claimers):
+            continue
+
+        balances = population.balances(claim_ts)
+        if len(checkpointed):
+            call(simulator.checkpointUsers, checkpointed, claim_ts, balances)
+            run.checkpoints += len(checkpointed)
+            run.gas += gas['checkpointUser'] * len(checkpointed)
+        if len(claimers):
+            run.paid[claimers] += call(
+                simulator.getReward, claimers, claim_ts, balances
+            )
+            run.claims += len(claimers)
+            run.gas += (
+                (gas['checkpointUser'] + gas['getReward']) * len(claimers)
+            )
+
+    end_ts, users = _joined(population, start, len(rewards))
+    if len(users):
+        run.paid[users] += call(
+            simulator.getReward, users, end_ts, population.balances(end_ts)
+        )
+        run.claims += len(users)
+        run.gas += (gas['checkpointUser'] + gas['getReward']) * len(users)
+    return run
+
+
+def save_measured_gas(model, gas, path=MEASURED_GAS_PATH):
+    """Stores the measured {path: gas} of `model`"""
+    data = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+    data[model] = gas
+    dirname = os.path.dirname(path)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4, sort_keys=True)
+
+
+def load_gas(path=MEASURED_GAS_PATH):
+    """
+    Returns ({model: gas figures}, {model: measured}). A model counts as
+    measured when every one of its figures was measured.
+    """
+    gas = {
+        'RewardDistributor_v1': dict(WEEKLY_GAS),
+        'Frax_Model': dict(FRAX_GAS),
+    }
+    measured = {model: False for model in gas}
+    if os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+        for model, figures in data.items():
+            if model in gas:
+                gas[model].update(figures)
+                measured[model] = set(figures) >= set(gas[model])
+    return gas, measured
+
+
+def compare(population, start, rewards, patterns=PATTERNS, gas=None):
+    """
+    Runs both models on the same population and reward schedule for every
+    claim pattern ({name: weeks between claims, as an int or one per
+    holder}). `gas` is {model: gas figures}, the estimates by default.
+    Returns {name: {'RewardDistributor_v1': ModelRun,
+    'Frax_Model': ModelRun}}.
+    """
+    start = (start // WEEK) * WEEK
+    gas = gas or {}
+    return {
+        name: {
+            'RewardDistributor_v1': simulate_weekly(
+                population, start, rewards, claim_every,
+                gas.get('RewardDistributor_v1', WEEKLY_GAS)
+            ),
+            'Frax_Model': simulate_frax(
+                population, start, rewards, claim_every,
+                gas.get('Frax_Model', FRAX_GAS)
+            ),
+        }
+        for name, claim_every in patterns.items()
+    }
+
+
+def format_report(results, measured=None):
+    """`measured` is {model: measured} from load_gas, estimates if None"""
+    measured = measured or {}
+    lines = [
+        f'{"pattern":<12}{"model":<22}{"paid":>14}{"undistributed":>15}'
+        f'{"claims":>9}{"checkpoints":>13}{"gas":>16}{"gas/claim":>11}'
+        f'{"gas from":>11}'
+    ]
+    for name, runs in results.items():
+        for model, run in runs.items():
+            paid = int(np.sum(run.paid)) / 10 ** 18
+            gas_per_claim = run.gas // max(run.claims, 1)
+            source = 'measured' if measured.get(model) else 'estimate'
+            lines.append(
+                f'{name:<12}{model:<22}{paid:>14.2f}'
+                f'{run.undistributed / 10 ** 18:>15.2f}{run.claims:>9}'
+                f'{run.checkpoints:>13}{run.gas:>16}{gas_per_claim:>11}'
+                f'{source:>11}'
+            )
+        weekly, frax = (
+            runs['RewardDistributor_v1'].paid, runs['Frax_Model'].paid
+        )
+        paid = (weekly > 0) | (frax > 0)
+        if paid.any():
+            share = np.mean(frax[paid] > weekly[paid])
+            lines.append(
+                f'{"":<12}holders paid more by the Frax model: {share:.1%}'
+            )
+    return '\n'.join(lines)
+
+
+def main():
+    source = input('Population: synthetic (s) or indexed (i)? ').strip()
+    n_weeks = int(input('Enter the number of weeks to simulate: ') or 104)
+    reward = int(float(
+        input('Enter the weekly rewards (SPA): ') or 10000
+    ) * 10 ** 18)
+    if source == 'i':
+        from brownie import network
+        from .event_indexer import EventStore
+
+        vespa = input('Enter the veSPA address: ').strip()
+        genesis_ts = int(input('Enter pointHistory(0) ts: '))
+        genesis_blk = int(input('Enter pointHistory(0) blk: '))
+        population = Population.from_store(
+            EventStore(), network.show_active(), vespa, genesis_ts,
+            genesis_blk
+        )
+        start = int(input('Enter the distribution start time: '))
+    else:
+        n_users = int(input('Enter the number of users: ') or 100000)
+        start = (int(input('Enter the start time: ') or 0) // WEEK) * WEEK
+        start = start or 2700 * WEEK
+        population = Population.synthetic(n_users, start, n_weeks)
+
+    gas, measured = load_gas()
+    results = compare(population, start, [reward] * n_weeks, gas=gas)
+    print(format_report(results, measured))
+    path = input('Per-holder payouts file (empty to skip): ').strip()
+    if path:
+        with open(path, 'w') as f:
+            json.dump(
+                {
+                    name: {
+                        model: dict(zip(
+                            population.points.holders,
+                            (int(amount) for amount in run.paid)
+                        ))
+                        for model, run in runs.items()
+                    }
+                    for name, runs in results.items()
+                },
+                f, indent=4
+            )
+        print(f'Payouts stored at: {path}')
@@ -0,0 +1,412 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import sqlite3
+import threading
+
+from brownie import RewardDistributor_v1, network, veSPA_v1, web3
+from eth_abi import decode
+from eth_utils import event_abi_to_log_topic, to_checksum_address
+
+from .reward_calculator import vespa_address_dict
+from .vespa_engine import VeSPAEngine
+
+
+INDEX_PATH = os.path.join('cache', 'events.sqlite')
+
+# Events indexed per contract kind
+EVENTS = {
+    'veSPA': ['UserCheckpoint', 'GlobalCheckpoint', 'Withdraw', 'Supply'],
+    'RewardDistributor': ['Claimed', 'RewardsCheckpointed'],
+}
+
+# Block range of eth_getLogs requests. The range is halved when a
+# request fails (providers cap the range or the number of results) or
+# returns more than TARGET_LOGS logs, and doubled when it returns less
+# than a quarter of that.
+INITIAL_CHUNK = 2000
+MAX_CHUNK = 500000
+TARGET_LOGS = 5000
+
+# Number of indexed blocks behind the head checked for reorgs on every
+# sync. Deeper reorgs are not detected.
+REORG_DEPTH = 64
+
+# Parallel eth_getBlockByNumber requests for the timestamps of a chunk
+MAX_WORKERS = 8
+
+
+def _hex(value):
+    if isinstance(value, str):
+        return value.lower()
+    return '0x' + bytes(value).hex()
+
+
+def _to_json(value):
+    if isinstance(value, bytes):
+        return '0x' + value.hex()
+    if isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    return value
+
+
+class EventDecoder:
+    """
+    Decodes the logs of one contract for the events in `names`.
+    Like BoundContract, it works from the ABI alone.
+    """
+
+    def __init__(self, address, abi, names):
+        self.address = to_checksum_address(address)
+        self.events = {}
+        for item in abi:
+            if item.get('type') != 'event' or item['name'] not in names:
+                continue
+            self.events[_hex(event_abi_to_log_topic(item))] = item
+
+    @property
+    def topics(self):
+        return list(self.events)
+
+    def decode(self, log):
+        """Returns (event name, {arg: value}) of a raw log"""
+        topics = [_hex(topic) for topic in log['topics']]
+        item = self.events[topics[0]]
+        indexed = [i for i in item['inputs'] if i['indexed']]
+        data = [i for i in item['inputs'] if not i['indexed']]
+        args = {}
+        for param, topic in zip(indexed, topics[1:]):
+            args[param['name']] = decode(
+                [param['type']], bytes.fromhex(topic[2:])
+            )[0]
+        values = decode(
+            [param['type'] for param in data], bytes.fromhex(
+                _hex(log['data'])[2:]
+            )
+        )
+        for param, value in zip(data, values):
+            args[param['name']] = value
+        return item['name'], {
+            key: _to_json(value) for key, value in args.items()
+        }
+
+
+class EventStore:
+    """
+    SQLite store of decoded logs.
+
+    `events` holds one row per log, keyed by (network, block, log index),
+    with the provider / recipient argument in `account` for holder
+    queries. `blocks` keeps the hash and timestamp of every block with
+    indexed logs and of every chunk end, which is what reorgs are
+    detected against. `progress` records the last block indexed for
+    a set of contracts, so an interrupted sync resumes where it stopped.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.db:
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS events ('
+                'network TEXT, block INTEGER, log_index INTEGER, '
+                'contract TEXT, name TEXT, account TEXT, args TEXT, '
+                'tx_hash TEXT, PRIMARY KEY (network, block, log_index))'
+            )
+            self.db.execute(
+                'CREATE INDEX IF NOT EXISTS events_account '
+                'ON events (network, contract, account, block, log_index)'
+            )
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS blocks ('
+                'network TEXT, number INTEGER, hash TEXT, ts INTEGER, '
+                'PRIMARY KEY (network, number))'
+            )
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS progress ('
+                'network TEXT, key TEXT, block INTEGER, '
+                'PRIMARY KEY (network, key))'
+            )
+
+    def get_progress(self, network, key):
+        """Last indexed block, or None if nothing was indexed yet"""
+        with self.lock:
+            row = self.db.execute(
+                'SELECT block FROM progress WHERE network = ? AND key = ?',
+                (network, key)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def save_chunk(self, network, key, to_block, events, blocks):
+        """
+        Stores the `events` rows (block, log_index, contract, name,
+        account, args, tx_hash) and `blocks` rows (number, hash, ts) of a
+        chunk and moves the progress to `to_block`, in one transaction.
+        """
+        with self.lock, self.db:
+            self.db.executemany(
+                'INSERT OR REPLACE INTO events VALUES '
+                '(?, ?, ?, ?, ?, ?, ?, ?)',
+                [(network,) + tuple(row) for row in events]
+            )
+            self.db.executemany(
+                'INSERT OR REPLACE INTO blocks VALUES (?, ?, ?, ?)',
+                [(network,) + tuple(row) for row in blocks]
+            )
+            self.db.execute(
+                'INSERT OR REPLACE INTO progress VALUES (?, ?, ?)',
+                (network, key, to_block)
+            )
+
+    def recent_blocks(self, network, from_block):
+        """[(number, hash)] of stored blocks >= from_block, newest first"""
+        with self.lock:
+            return self.db.execute(
+                'SELECT number, hash FROM blocks '
+                'WHERE network = ? AND number >= ? ORDER BY number DESC',
+                (network, from_block)
+            ).fetchall()
+
+    def rollback(self, network, block):
+        """Drops everything indexed after `block` on `network`"""
+        with self.lock, self.db:
+            self.db.execute(
+                'DELETE FROM events WHERE network = ? AND block > ?',
+                (network, block)
+            )
+            self.db.execute(
+                'DELETE FROM blocks WHERE network = ? AND number > ?',
+                (network, block)
+            )
+            self.db.execute(
+                'UPDATE progress SET block = ? '
+                'WHERE network = ? AND block > ?',
+                (block, network, block)
+            )
+
+    def events(self, network, contract=None, names=None, to_block=None,
+               to_ts=None, by_account=False):
+        """
+        Yields (name, args, ts, block, contract) in log order, optionally
+        filtered by contract, event names, last block and last timestamp.
+        With `by_account` the events are grouped by account (provider /
+        recipient), in log order within each account.
+        """
+        query = (
+            'SELECT e.name, e.args, b.ts, e.block, e.contract FROM events e '
+            'JOIN blocks b ON b.network = e.network AND b.number = e.block '
+            'WHERE e.network = ?'
+        )
+        params = [network]
+        if contract is not None:
+            query += ' AND e.contract = ?'
+            params.append(contract.lower())
+        if names is not None:
+            query += f' AND e.name IN ({",".join("?" * len(names))})'
+            params += list(names)
+        if to_block is not None:
+            query += ' AND e.block <= ?'
+            params.append(to_block)
+        if to_ts is not None:
+            query += ' AND b.ts <= ?'
+            params.append(to_ts)
+        query += ' ORDER BY '
+        if by_account:
+            query += 'e.account, '
+        query += 'e.block, e.log_index'
+        # A separate cursor, so callers can stream without holding the lock
+        for name, args, ts, block, address in self.db.cursor().execute(
+            query, params
+        ):
+            yield name, json.loads(args), ts, block, address
+
+    def accounts(self, network, contract):
+        """Every address that appears as provider / recipient"""
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT DISTINCT account FROM events '
+                'WHERE network = ? AND contract = ? AND account IS NOT NULL '
+                'ORDER BY account',
+                (network, contract.lower())
+            ).fetchall()
+        return [row[0] for row in rows]
+
+
+class EventIndexer:
+    """
+    Streams the logs of `contracts`, a {address: (kind, abi)} dict with
+    kinds from EVENTS, into an EventStore.
+
+    Logs are fetched with one eth_getLogs per block range, sized
+    adaptively, and stored chunk by chunk together with the progress, so
+    `sync` can be interrupted and resumed at any point. Before resuming,
+    the hashes of the last indexed blocks are compared with the chain and
+    anything past a reorg is dropped and indexed again.
+    """
+
+    def __init__(self, w3, store, network, contracts, start_block=0,
+                 confirmations=0, chunk=INITIAL_CHUNK):
+        self.w3 = w3
+        self.store = store
+        self.network = network
+        self.decoders = {
+            to_checksum_address(address).lower(): EventDecoder(
+                address, abi, EVENTS[kind]
+            )
+            for address, (kind, abi) in contracts.items()
+        }
+        self.key = ','.join(sorted(self.decoders))
+        self.start_block = start_block
+        self.confirmations = confirmations
+        self.chunk = chunk
+        # Lowered to the last working range when a request fails, so the
+        # range does not keep growing back into the provider limit
+        self.max_chunk = MAX_CHUNK
+        self.requests = 0
+        self.reorgs = 0
+
+    def _get_blocks(self, numbers):
+        def fetch(number):
+            return self.w3.eth.get_block(number)
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            blocks = list(executor.map(fetch, numbers))
+        self.requests += len(numbers)
+        return {
+            block['number']: (_hex(block['hash']), block['timestamp'])
+            for block in blocks
+        }
+
+    def _get_logs(self, from_block, to_block):
+        topics = sorted({
+            topic
+            for decoder in self.decoders.values()
+            for topic in decoder.topics
+        })
+        self.requests += 1
+        return self.w3.eth.get_logs({
+            'fromBlock': from_block,
+            'toBlock': to_block,
+            'address': [d.address for d in self.decoders.values()],
+            'topics': [topics],
+        })
+
+    def check_reorg(self):
+        """
+        Rolls the store back to the last block still on the canonical
+        chain. Returns the block rolled back to, or None.
+        """
+        progress = self.store.get_progress(self.network, self.key)
+        if progress is None:
+            return None
+        recent = self.store.recent_blocks(
+            self.network, progress - REORG_DEPTH
+        )
+        common = None
+        for number, block_hash in recent:
+            if self._get_blocks([number])[number][0] == block_hash:
+                common = number
+                break
+        if not recent or common == progress:
+            return None
+        if common is None:
+            # Everything we can verify was reorged out
+            common = progress - REORG_DEPTH - 1
+        self.store.rollback(self.network, common)
+        self.reorgs += 1
+        return common
+
+    def index_range(self, from_block, to_block):
+        """Indexes one chunk, returns the number of logs stored"""
+        logs = self._get_logs(from_block, to_block)
+        numbers = sorted({log['blockNumber'] for log in logs} | {to_block})
+        blocks = self._get_blocks(numbers)
+        events = []
+        for log in logs:
+            address = log['address'].lower()
+            name, args = self.decoders[address].decode(log)
+            account = args.get('provider', args.get('_recipient'))
+            events.append((
+                log['blockNumber'],
+                log['logIndex'],
+                address,
+                name,
+                account,
+                json.dumps(args),
+                _hex(log['transactionHash']),
+            ))
+        self.store.save_chunk(
+            self.network, self.key, to_block, events,
+            [(number, *blocks[number]) for number in numbers]
+        )
+        return len(logs)
+
+    def sync(self, to_block=None):
+        """
+        Indexes up to `to_block` (default: head - confirmations) and
+        returns the number of logs stored.
+        """
+        self.check_reorg()
+        if to_block is None:
+            to_block = self.w3.eth.block_number - self.confirmations
+        progress = self.store.get_progress(self.network, self.key)
+        block = self.start_block if progress is None else progress + 1
+        indexed = 0
+        while block <= to_block:
+            end = min(block + self.chunk - 1, to_block)
+            try:
+                count = self.index_range(block, end)
+            except Exception:
+                # Range or result size limits surface as various RPC /
+                # transport errors; retry with a smaller range
+                if self.chunk == 1:
+                    raise
+                self.chunk = max(self.chunk // 2, 1)
+                self.max_chunk = self.chunk
+                continue
+            indexed += count
+            block = end + 1
+            if count > TARGET_LOGS:
+                self.chunk = max(self.chunk // 2, 1)
+            elif count < TARGET_LOGS // 4:
+                self.chunk = min(self.chunk * 2, self.max_chunk)
+        return indexed
+
+
+def build_engine(store, network, vespa, genesis_ts, genesis_blk,
+                 to_block=None):
+    """
+    Returns a VeSPAEngine replayed from the indexed events of `vespa`.
+    `genesis_ts` / `genesis_blk` are pointHistory(0) ts / blk.
+    """
+    engine = VeSPAEngine(genesis_ts, genesis_blk)
+    names = ['UserCheckpoint', 'Withdraw', 'GlobalCheckpoint']
+    for name, args, ts, blk, _ in store.events(
+        network, vespa, names, to_block
+    ):
+        engine.apply_event(name, args, ts, blk)
+    return engine
+
+
+def main():
+    network_name = network.show_active()
+    contracts = {vespa_address_dict[network_name]: ('veSPA', veSPA_v1.abi)}
+    rd_address = input(
+        'Enter the RewardDistributor_v1 address (empty to skip): '
+    ).strip()
+    if rd_address:
+        contracts[rd_address] = (
+            'RewardDistributor', RewardDistributor_v1.abi
+        )
+    start_block = int(input('Enter the deployment block: ') or 0)
+    store = EventStore()
+    indexer = EventIndexer(
+        web3, store, network_name, contracts, start_block, confirmations=5
+    )
+    indexed = indexer.sync()
+    print(f'{indexed} events indexed with {indexer.requests} requests')
+    print(f'Reorgs handled: {indexer.reorgs}')
+    print(f'Index stored at: {INDEX_PATH}')
@@ -0,0 +1,223 @@
+from brownie import (
+    MockToken,
+    ProxyAdmin,
+    TransparentUpgradeableProxy,
+    accounts,
+    chain,
+    network,
+    veSPA_v1,
+    Contract,
+)
+import eth_utils
+import json
+import os
+
+WEEK = 604800
+MAX_TIME = 4 * 365 * 86400
+AMOUNT = 1000000000000000000000
+GAS_LIMIT = 10000000
+
+# veSPA_v1 entry points whose cost grows with the number of weeks
+# _updateGlobalPoint has to backfill (capped at 255)
+ENTRY_POINTS = [
+    'createLock',
+    'increaseAmount',
+    'increaseUnlockTime',
+    'withdraw',
+    'checkpoint',
+]
+# The setup lock of increaseAmount / increaseUnlockTime has to outlive the
+# idle period, which caps it a few weeks below the 4 year MAX_TIME
+IDLE_WEEKS = [0, 1, 10, 52, 204]
+
+BASELINE_PATH = os.path.join('benchmarks', 'gas_veSPA_v1.json')
+# Allowed relative gas increase over the baseline
+REGRESSION_THRESHOLD = 0.02
+
+
+def deploy_vespa(owner, spa, implementation=veSPA_v1):
+    # Same layout as production: the implementation behind a proxy
+    proxy_admin = ProxyAdmin.deploy({'from': owner, 'gas': GAS_LIMIT})
+    vespa_base = implementation.deploy({'from': owner, 'gas': GAS_LIMIT})
+    proxy = TransparentUpgradeableProxy.deploy(
+        vespa_base.address,
+        proxy_admin.address,
+        eth_utils.to_bytes(hexstr='0x'),
+        {'from': owner, 'gas': GAS_LIMIT},
+    )
+    vespa = Contract.from_abi('veSPA', proxy.address, implementation.abi)
+    vespa.initialize(spa, 'v0', {'from': owner, 'gas': GAS_LIMIT})
+    return vespa
+
+
+def fund(spa, vespa, account):
+    spa.mint(100000000000000000000000, {'from': account})
+    spa.approve(vespa, int(100000 * 10 ** 18), {'from': account})
+
+
+def populate(spa, vespa, lockers):
+    """
+    Background locks expiring every 26 weeks, so the backfill loop
+    applies real slope changes instead of walking empty weeks.
+    """
+    for i, locker in enumerate(lockers):
+        fund(spa, vespa, locker)
+        vespa.createLock(
+            AMOUNT * (i + 1),
+            chain.time() + min(WEEK * 26 * (i + 1), MAX_TIME),
+            i % 2 == 0,
+            {'from': locker}
+        )
+
+
+def _prepare(vespa, entry_point, user, idle_weeks):
+    # Puts `user` in a state where `entry_point` succeeds after the
+    # idle period
+    if entry_point in ('increaseAmount', 'increaseUnlockTime'):
+        vespa.createLock(
+            AMOUNT, chain.time() + WEEK * (idle_weeks + 3), False,
+            {'from': user}
+        )
+    elif entry_point == 'withdraw':
+        # auto cooldown locks can be withdrawn right after expiry
+        vespa.createLock(
+            AMOUNT, chain.time() + WEEK * 2, True, {'from': user}
+        )
+        chain.sleep(WEEK * 2)
+
+
+def _call(vespa, entry_point, user):
+    tx_params = {'from': user, 'gas': GAS_LIMIT}
+    if entry_point == 'createLock':
+        return vespa.createLock(
+            AMOUNT, chain.time() + WEEK * 52, False, tx_params
+        )
+    if entry_point == 'increaseAmount':
+        return vespa.increaseAmount(AMOUNT, tx_params)
+    if entry_point == 'increaseUnlockTime':
+        return vespa.increaseUnlockTime(chain.time() + MAX_TIME, tx_params)
+    if entry_point == 'withdraw':
+        return vespa.withdraw(tx_params)
+    return vespa.checkpoint(tx_params)
+
+
+def execute(vespa, entry_point, user, idle_weeks):
+    """
+    Calls `entry_point` as `user` when no global checkpoint happened for
+    `idle_weeks` weeks and returns the transaction. The last checkpoint
+    is placed one hour after a week boundary, so the call always
+    backfills idle_weeks + 1 week slots regardless of the wall clock.
+    """
+    _prepare(vespa, entry_point, user, idle_weeks)
+    chain.sleep(WEEK - chain.time() % WEEK + 3600)
+    vespa.checkpoint({'from': user})
+    chain.sleep(WEEK * idle_weeks)
+    return _call(vespa, entry_point, user)
+
+
+def measure(vespa, entry_point, user, idle_weeks):
+    """Gas used by `entry_point`, see execute"""
+    return execute(vespa, entry_point, user, idle_weeks).gas_used
+
+
+def run_benchmark(vespa, user, setup=None, entry_points=ENTRY_POINTS,
+                  idle_weeks=IDLE_WEEKS):
+    """
+    Returns {entry_point: {idle_weeks: gas}}. Every measurement runs
+    `setup()` then the entry point from a snapshot it reverts to, so the
+    chain is left as it was found.
+    """
+    results = {}
+    for entry_point in entry_points:
+        results[entry_point] = {}
+        for weeks in idle_weeks:
+            chain.snapshot()
+            try:
+                if setup is not None:
+                    setup()
+                results[entry_point][weeks] = measure(
+                    vespa, entry_point, user, weeks
+                )
+            finally:
+                chain.revert()
+    return results
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    dirname = os.path.dirname(path)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    data = {
+        'contract': 'veSPA_v1',
+        'idle_weeks': sorted({w for gas in results.values() for w in gas}),
+        'gas': {
+            entry_point: {str(weeks): used for weeks, used in gas.items()}
+            for entry_point, gas in results.items()
+        },
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4, sort_keys=True)
+
+
+def load_baseline(path=BASELINE_PATH):
+    """Returns {entry_point: {idle_weeks: gas}} or None if missing"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        data = json.load(f)
+    return {
+        entry_point: {int(weeks): used for weeks, used in gas.items()}
+        for entry_point, gas in data['gas'].items()
+    }
+
+
+def find_regressions(baseline, results, threshold=REGRESSION_THRESHOLD):
+    """
+    Returns (entry_point, idle_weeks, baseline_gas, gas) for every
+    measurement more than `threshold` above its baseline.
+    """
+    regressions = []
+    for entry_point, gas in results.items():
+        for weeks, used in gas.items():
+            expected = baseline.get(entry_point, {}).get(weeks)
+            if expected is not None and used > expected * (1 + threshold):
+                regressions.append((entry_point, weeks, expected, used))
+    return regressions
+
+
+def format_table(results, baseline=None):
+    idle_weeks = sorted({w for gas in results.values() for w in gas})
+    lines = [
+        f'{"idle weeks":<20}' + ''.join(f'{w:>18}' for w in idle_weeks)
+    ]
+    for entry_point, gas in results.items():
+        cells = []
+        for weeks in idle_weeks:
+            cell = str(gas.get(weeks, '-'))
+            expected = (baseline or {}).get(entry_point, {}).get(weeks)
+            if expected and weeks in gas:
+                cell += f' ({(gas[weeks] - expected) / expected:+.1%})'
+            cells.append(f'{cell:>18}')
+        lines.append(f'{entry_point:<20}' + ''.join(cells))
+    return '\n'.join(lines)
+
+
+def main():
+    if network.show_active() != 'development':
+        print('The gas benchmark only runs on the development network')
+        return
+    owner = accounts[0]
+    spa = MockToken.deploy(
+        'L2 Sperax Token', 'SPA', int(10 ** 18), {'from': owner}
+    )
+    vespa = deploy_vespa(owner, spa)
+    user = accounts[6]
+
+    def setup():
+        populate(spa, vespa, accounts[1:6])
+        fund(spa, vespa, user)
+
+    results = run_benchmark(vespa, user, setup)
+    print(format_table(results, load_baseline()))
+    save_baseline(results)
+    print(f'Baseline stored at: {BASELINE_PATH}')
@@ -0,0 +1,221 @@
+from collections import defaultdict
+from brownie import (
+    Contract,
+    MockToken,
+    RewardDistributor_v1,
+    accounts,
+    chain,
+    network,
+    veSPA_v0,
+    veSPA_v1,
+    veSPA_v1_Non_Upgradeable,
+    veSPA_v2,
+)
+from .gas_benchmark import GAS_LIMIT, deploy_vespa, fund
+import json
+import os
+
+WEEK = 604800
+AMOUNT = 1000000000000000000000
+REWARDS = 10000000000000000000000
+
+# SPA and veSPA addresses RewardDistributor_v1 has as constants
+# (arbitrum-one), rewritten by deploy_distributor
+DISTRIBUTOR_SPA = '0x5575552988A3A80504bBaeB1311674fCFd40aD4B'
+DISTRIBUTOR_VESPA = '0x2e2071180682Ce6C247B1eF93d382D509F5F6A17'
+
+# Implementation reported as the reference column of the deltas
+REFERENCE = 'veSPA_v1'
+MATRIX_PATH = os.path.join('benchmarks', 'gas_matrix.json')
+
+
+def _deploy_v0(owner, spa):
+    return veSPA_v0.deploy(spa, {'from': owner, 'gas': GAS_LIMIT})
+
+
+def _deploy_v1(owner, spa):
+    return deploy_vespa(owner, spa, veSPA_v1)
+
+
+def _deploy_v1_non_upgradeable(owner, spa):
+    return veSPA_v1_Non_Upgradeable.deploy(
+        spa, 'v1', {'from': owner, 'gas': GAS_LIMIT}
+    )
+
+
+def _deploy_v2(owner, spa):
+    return deploy_vespa(owner, spa, veSPA_v2)
+
+
+# Every implementation deployed the way it ships: v1 / v2 behind a
+# TransparentUpgradeableProxy, v0 / v1_Non_Upgradeable directly
+VERSIONS = {
+    'veSPA_v0': _deploy_v0,
+    'veSPA_v1': _deploy_v1,
+    'veSPA_v1_Non_Upgradeable': _deploy_v1_non_upgradeable,
+    'veSPA_v2': _deploy_v2,
+}
+
+
+def deploy_distributor(owner, spa, vespa):
+    """
+    RewardDistributor_v1 reading `spa` and `vespa`. Its SPA and veSPA
+    addresses are compiled in as PUSH20 operands, they are replaced in
+    the creation code before it is sent.
+    """
+    data = RewardDistributor_v1.deploy.encode_input(chain.time()).lower()
+    for constant, address in (
+        (DISTRIBUTOR_SPA, spa.address), (DISTRIBUTOR_VESPA, vespa.address)
+    ):
+        constant = constant[2:].lower()
+        if constant not in data:
+            raise ValueError(
+                f'0x{constant} not found in the RewardDistributor_v1 code'
+            )
+        data = data.replace(constant, address[2:].lower())
+    tx = owner.transfer(None, 0, gas_limit=GAS_LIMIT, data=data)
+    return Contract.from_abi(
+        'RewardDistributor_v1', tx.contract_address, RewardDistributor_v1.abi
+    )
+
+
+def run_workload(vespa, rd, spa, owner, users):
+    """
+    Runs the scripted workload against `vespa` and a RewardDistributor_v1
+    `rd` bound to it, and returns {label: [gas, ...]}. Labels are
+    function names, with 'increaseAmount@expiry' for a top-up in the last
+    week of a lock, where veSPA_v2 renews the lock.
+    """
+    gas = defaultdict(list)
+
+    def record(label, tx):
+        gas[label].append(tx.gas_used)
+
+    u1, u2, u3, u4 = users
+    # Start one hour into a week so every step lands in a known week
+    chain.sleep(WEEK - chain.time() % WEEK + 3600)
+    for user, weeks, auto_cooldown in (
+        (u1, 52, False), (u2, 26, True), (u3, 104, False), (u4, 4, False)
+    ):
+        record('createLock', vespa.createLock(
+            AMOUNT, chain.time() + WEEK * weeks, auto_cooldown,
+            {'from': user}
+        ))
+
+    chain.sleep(WEEK)
+    rd.addRewards(REWARDS, {'from': owner})
+    record('checkpointReward', rd.checkpointReward({'from': owner}))
+    record('increaseAmount', vespa.increaseAmount(AMOUNT, {'from': u1}))
+    record('increaseAmount', vespa.increaseAmount(AMOUNT, {'from': u3}))
+    record('depositFor', vespa.depositFor(u2, AMOUNT, {'from': owner}))
+    record('increaseUnlockTime', vespa.increaseUnlockTime(
+        chain.time() + WEEK * 78, {'from': u1}
+    ))
+
+    chain.sleep(WEEK * 2)
+    record('checkpoint', vespa.checkpoint({'from': owner}))
+    # u4's lock ends within MIN_TIME
+    record(
+        'increaseAmount@expiry', vespa.increaseAmount(AMOUNT, {'from': u4})
+    )
+    record('initiateCooldown', vespa.initiateCooldown({'from': u4}))
+    rd.addRewards(REWARDS, {'from': owner})
+    record('checkpointReward', rd.checkpointReward({'from': owner}))
+    for user in (u1, u2, u3):
+        record('claim', rd.claim(user, False, {'from': user}))
+
+    chain.sleep(WEEK * 2)
+    record('withdraw', vespa.withdraw({'from': u4}))
+    chain.sleep(WEEK * 24)
+    record('checkpoint', vespa.checkpoint({'from': owner}))
+    record('withdraw', vespa.withdraw({'from': u2}))
+    rd.addRewards(REWARDS, {'from': owner})
+    record('checkpointReward', rd.checkpointReward({'from': owner}))
+    for user in (u1, u3):
+        record('claim', rd.claim(user, False, {'from': user}))
+    return dict(gas)
+
+
+def run_matrix(owner, users, versions=VERSIONS):
+    """
+    Returns {version: {label: [gas, ...]}}. Each version is deployed and
+    exercised from the same chain snapshot, which is restored afterwards.
+    """
+    matrix = {}
+    for name, deploy in versions.items():
+        chain.snapshot()
+        try:
+            spa = MockToken.deploy(
+                'L2 Sperax Token', 'SPA', int(10 ** 18), {'from': owner}
+            )
+            vespa = deploy(owner, spa)
+            rd = deploy_distributor(owner, spa, vespa)
+            spa.mint(REWARDS * 10, {'from': owner})
+            spa.approve(rd, REWARDS * 10, {'from': owner})
+            for account in [owner] + list(users):
+                fund(spa, vespa, account)
+            matrix[name] = run_workload(vespa, rd, spa, owner, users)
+        finally:
+            chain.revert()
+    return matrix
+
+
+def summarize(matrix, reference=REFERENCE):
+    """
+    Returns {label: {version: (mean_gas, delta)}} where delta is the
+    relative difference with the reference version (None for itself).
+    """
+    labels = []
+    for gas in matrix.values():
+        labels += [label for label in gas if label not in labels]
+    summary = {}
+    for label in labels:
+        row = {}
+        base = matrix.get(reference, {}).get(label)
+        base_mean = sum(base) / len(base) if base else None
+        for version, gas in matrix.items():
+            if label not in gas:
+                continue
+            mean = sum(gas[label]) / len(gas[label])
+            delta = None
+            if base_mean and version != reference:
+                delta = (mean - base_mean) / base_mean
+            row[version] = (round(mean), delta)
+        summary[label] = row
+    return summary
+
+
+def format_matrix(summary, versions):
+    width = max(len(v) for v in versions) + 2
+    lines = [f'{"function":<24}' + ''.join(f'{v:>{width}}' for v in versions)]
+    for label, row in summary.items():
+        cells = []
+        for version in versions:
+            if version not in row:
+                cells.append(f'{"-":>{width}}')
+                continue
+            mean, delta = row[version]
+            cell = str(mean)
+            if delta is not None:
+                cell += f' ({delta:+.1%})'
+            cells.append(f'{cell:>{width}}')
+        lines.append(f'{label:<24}' + ''.join(cells))
+    return '\n'.join(lines)
+
+
+def main():
+    if network.show_active() != 'development':
+        print('The gas matrix only runs on the development network')
+        return
+    matrix = run_matrix(accounts[0], accounts[1:5])
+    summary = summarize(matrix)
+    print(f'Mean gas per call, deltas against {REFERENCE}:')
+    print(format_matrix(summary, list(matrix)))
+
+    os.makedirs(os.path.dirname(MATRIX_PATH), exist_ok=True)
+    with open(MATRIX_PATH, 'w') as f:
+        json.dump(
+            {'reference': REFERENCE, 'gas': matrix, 'summary': summary},
+            f, indent=4, sort_keys=True
+        )
+    print(f'Gas matrix stored at: {MATRIX_PATH}')
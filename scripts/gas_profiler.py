@@ -0,0 +1,253 @@
+from collections import Counter
+from brownie import (
+    MockToken,
+    RewardDistributor_v1,
+    accounts,
+    chain,
+    network,
+    veSPA_v1,
+)
+from .gas_benchmark import deploy_vespa, execute, fund, populate
+from .registry import NETWORK_ALIASES, get_address
+import os
+
+# Folded stacks, one file per profile, for flamegraph.pl / speedscope
+PROFILE_DIR = 'benchmarks'
+
+# Rows printed per table
+TABLE_ROWS = 25
+
+
+def step_costs(trace):
+    """
+    Gas charged to every step of a brownie expanded trace, excluding the
+    gas spent in the frames it calls, so the costs add up to the gas of
+    the execution. Also returns the calls that entered a new frame as
+    (call step, return step, inclusive gas) tuples.
+
+    A step costs the drop of remaining gas to the next step of its frame;
+    the last step of a frame, which has no next step there, costs its
+    gasCost. A call costs the drop across the whole call minus what the
+    frame it opened spent.
+    """
+    costs = [0] * len(trace)
+    calls = []
+    open_calls = []
+    # gas spent so far by each open frame, the called frames included
+    spent = [0]
+    for i, step in enumerate(trace):
+        nxt = trace[i + 1] if i + 1 < len(trace) else None
+        if nxt is not None and nxt['depth'] > step['depth']:
+            open_calls.append(i)
+            spent.append(0)
+            continue
+        if nxt is None or nxt['depth'] < step['depth']:
+            costs[i] = step['gasCost']
+        else:
+            costs[i] = step['gas'] - nxt['gas']
+        spent[-1] += costs[i]
+        if nxt is None:
+            continue
+        while open_calls and trace[open_calls[-1]]['depth'] >= nxt['depth']:
+            call = open_calls.pop()
+            inclusive = trace[call]['gas'] - nxt['gas']
+            costs[call] = inclusive - spent.pop()
+            spent[-1] += inclusive
+            calls.append((call, i + 1, inclusive))
+    return costs, calls
+
+
+class GasProfile:
+    """
+    Gas of a transaction attributed from its debug trace, as Counters:
+
+    - `functions`: self gas per function (brownie's `fn`, internal
+      functions included)
+    - `lines`: self gas per (contract, source file, line)
+    - `opcodes` / `opcode_counts`: gas and executions per opcode
+    - `calls`: (caller fn, callee fn, opcode) -> gas spent in the called
+      frame, call overhead included, with the number of calls in
+      `call_counts`
+    - `stacks`: self gas per folded stack of the frames' functions
+
+    `total` is the execution gas, without the intrinsic cost and refunds.
+    """
+
+    def __init__(self, tx):
+        self.tx = tx
+        self.functions = Counter()
+        self.lines = Counter()
+        self.opcodes = Counter()
+        self.opcode_counts = Counter()
+        self.calls = Counter()
+        self.call_counts = Counter()
+        self.stacks = Counter()
+        self._sources = {}
+        self._build(tx.trace)
+
+    def _line(self, filename, offset):
+        if filename not in self._sources:
+            try:
+                with open(filename) as f:
+                    self._sources[filename] = f.read()
+            except OSError:
+                self._sources[filename] = None
+        source = self._sources[filename]
+        if source is None:
+            return None
+        return source.count('\n', 0, offset) + 1
+
+    def line_text(self, filename, line):
+        source = self._sources.get(filename)
+        if source is None or line is None:
+            return ''
+        return source.splitlines()[line - 1].strip()
+
+    def _build(self, trace):
+        costs, calls = step_costs(trace)
+        self.total = sum(costs)
+        returns = {call: ret for call, ret, _ in calls}
+        frames = []
+        for i, (step, cost) in enumerate(zip(trace, costs)):
+            while frames and frames[-1][1] <= i:
+                frames.pop()
+            fn = step.get('fn', '<unknown>')
+            self.functions[fn] += cost
+            self.opcodes[step['op']] += cost
+            self.opcode_counts[step['op']] += 1
+            source = step.get('source')
+            if source:
+                filename = source['filename']
+                line = self._line(filename, source['offset'][0])
+            else:
+                filename, line = None, None
+            self.lines[(step.get('contractName'), filename, line)] += cost
+            self.stacks[';'.join([f for f, _ in frames] + [fn])] += cost
+            if i in returns:
+                frames.append((fn, returns[i]))
+        for call, _, inclusive in calls:
+            key = (
+                trace[call].get('fn', '<unknown>'),
+                trace[call + 1].get('fn', '<unknown>'),
+                trace[call]['op'],
+            )
+            self.calls[key] += inclusive
+            self.call_counts[key] += 1
+
+    def storage(self):
+        """{opcode: (executions, gas)} of the storage reads and writes"""
+        return {
+            op: (self.opcode_counts[op], self.opcodes[op])
+            for op in ('SLOAD', 'SSTORE')
+        }
+
+    def folded(self):
+        """Folded stacks ('a;b;c gas' lines) for flamegraph.pl"""
+        return '\n'.join(
+            f'{stack} {gas}' for stack, gas in sorted(self.stacks.items())
+            if gas > 0
+        )
+
+
+def _table(title, rows, total, limit=TABLE_ROWS):
+    lines = [f'{title:<90}{"gas":>10}{"share":>8}']
+    for label, gas in rows[:limit]:
+        lines.append(f'{label[:89]:<90}{gas:>10}{gas / total:>8.1%}')
+    return '\n'.join(lines)
+
+
+def format_profile(profile, limit=TABLE_ROWS):
+    total = max(profile.total, 1)
+    lines_rows = []
+    for (contract, filename, line), gas in profile.lines.most_common():
+        if filename is None:
+            label = f'{contract} <no source>'
+        else:
+            label = (
+                f'{os.path.basename(filename)}:{line} '
+                f'{profile.line_text(filename, line)}'
+            )
+        lines_rows.append((label, gas))
+    call_rows = []
+    for (caller, callee, op), gas in profile.calls.most_common():
+        count = profile.call_counts[(caller, callee, op)]
+        call_rows.append((f'{caller} -> {callee} ({op} x{count})', gas))
+    storage = profile.storage()
+    return '\n\n'.join([
+        f'{profile.tx.txid}: {profile.tx.gas_used} gas used, '
+        f'{profile.total} in execution; ' + ', '.join(
+            f'{op} x{count} = {gas}' for op, (count, gas) in storage.items()
+        ),
+        _table('function (self)', profile.functions.most_common(), total,
+               limit),
+        _table('source line (self)', lines_rows, total, limit),
+        _table('external call (inclusive)', call_rows, total, limit),
+        _table('opcode', [
+            (f'{op} x{profile.opcode_counts[op]}', gas)
+            for op, gas in profile.opcodes.most_common()
+        ], total, limit),
+    ])
+
+
+def save_folded(profile, name, path=PROFILE_DIR):
+    os.makedirs(path, exist_ok=True)
+    filename = os.path.join(path, f'gas_profile_{name}.folded')
+    with open(filename, 'w') as f:
+        f.write(profile.folded() + '\n')
+    return filename
+
+
+def sample_checkpoint(idle_weeks=10):
+    """
+    createLock on a fresh veSPA_v1 with background locks, after
+    `idle_weeks` weeks without a global checkpoint
+    """
+    owner = accounts[0]
+    spa = MockToken.deploy(
+        'L2 Sperax Token', 'SPA', int(10 ** 18), {'from': owner}
+    )
+    vespa = deploy_vespa(owner, spa)
+    populate(spa, vespa, accounts[1:6])
+    fund(spa, vespa, accounts[6])
+    return execute(vespa, 'createLock', accounts[6], idle_weeks)
+
+
+def sample_claim(holder):
+    """
+    RewardDistributor_v1.claim(holder, False) on a fork, bound to the
+    project build so the trace maps to source lines. Refuses to run
+    outside the forks of NETWORK_ALIASES, where the claim would be sent.
+    """
+    if network.show_active() not in NETWORK_ALIASES:
+        raise ValueError(
+            f'Not a fork: {network.show_active()}, the sample claim would '
+            'be sent on chain'
+        )
+    # register the implementation the veSPA proxy delegates to
+    veSPA_v1.at(get_address('vespa_logic_contract'))
+    rd = RewardDistributor_v1.at(get_address('reward_distributor'))
+    return rd.claim(holder, False, {'from': accounts[0]})
+
+
+def main():
+    tx_hash = input(
+        'Enter the transaction hash to profile (empty for a sample): '
+    ).strip()
+    if tx_hash:
+        name = tx_hash[:10]
+        tx = chain.get_transaction(tx_hash)
+    elif network.show_active() == 'development':
+        name = 'createLock'
+        tx = sample_checkpoint()
+    elif network.show_active() in NETWORK_ALIASES:
+        name = 'claim'
+        tx = sample_claim(input('Enter the holder to claim for: ').strip())
+    else:
+        print(
+            'Samples only run on development or a fork, pass the hash of '
+            'an existing transaction instead'
+        )
+        return
+    profile = GasProfile(tx)
+    print(format_profile(profile))
+    print(f'Folded stacks stored at: {save_folded(profile, name)}')
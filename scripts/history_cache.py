@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+from . import rpc_trace
+
+
+CACHE_PATH = os.path.join('cache', 'history.sqlite')
+
+# Marker for cache misses, as None / 0 are valid contract return values
+MISSING = object()
+
+
+def _to_tuple(value):
+    if isinstance(value, list):
+        return tuple(_to_tuple(v) for v in value)
+    return value
+
+
+def _to_json(value):
+    if isinstance(value, bytes):
+        return '0x' + value.hex()
+    if isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    return value
+
+
+class HistoryCache:
+    """
+    Content-addressed SQLite cache for contract reads.
+
+    Entries are keyed by (network, contract, function, args). Immutable
+    entries are stored with a NULL block and served forever. Mutable
+    entries record the block they were read at and are only served for
+    reads pinned to that same block, so a new head invalidates them.
+    The week_epochs table indexes the global epoch of settled weeks.
+    """
+
+    def __init__(self, path=CACHE_PATH):
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with self.lock, self.db:
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS calls ('
+                'key TEXT PRIMARY KEY, network TEXT, contract TEXT, '
+                'function TEXT, args TEXT, value TEXT, block INTEGER)'
+            )
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS week_epochs ('
+                'network TEXT, contract TEXT, week INTEGER, epoch INTEGER, '
+                'PRIMARY KEY (network, contract, week))'
+            )
+
+    @staticmethod
+    def key(network, contract, function, args):
+        payload = json.dumps(
+            [network, contract.lower(), function, _to_json(args)],
+            separators=(',', ':')
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, network, contract, function, args, block=None):
+        """Returns the cached value or MISSING"""
+        key = self.key(network, contract, function, args)
+        with self.lock:
+            row = self.db.execute(
+                'SELECT value, block FROM calls WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] != block):
+                self.misses += 1
+                return MISSING
+            self.hits += 1
+        return _to_tuple(json.loads(row[0]))
+
+    def put(self, network, contract, function, args, value, block=None):
+        """Stores `value`; block=None marks it as immutable"""
+        key = self.key(network, contract, function, args)
+        with self.lock, self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO calls VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (
+                    key, network, contract.lower(), function,
+                    json.dumps(_to_json(args)),
+                    json.dumps(_to_json(value)), block
+                )
+            )
+
+    def get_week_epoch(self, network, contract, week):
+        with self.lock:
+            row = self.db.execute(
+                'SELECT epoch FROM week_epochs '
+                'WHERE network = ? AND contract = ? AND week = ?',
+                (network, contract.lower(), week)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def put_week_epoch(self, network, contract, week, epoch):
+        with self.lock, self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO week_epochs VALUES (?, ?, ?, ?)',
+                (network, contract.lower(), week, epoch)
+            )
+
+
+class CachedReader:
+    """
+    BatchReader wrapper serving reads from a HistoryCache.
+    Only cache misses are sent to the node, still batched together.
+    """
+
+    def __init__(self, reader, cache, network):
+        self.reader = reader
+        self.cache = cache
+        self.network = network
+
+    def __getattr__(self, name):
+        # pin, is_settled, round_trips, block_identifier, ...
+        return getattr(self.reader, name)
+
+    def call(self, calls, immutable=False):
+        """
+        `immutable` is either a bool or a callable (call, result) -> bool
+        deciding whether a freshly read result can be cached forever.
+        """
+        block = self.reader.block_identifier
+        results = []
+        missed = []
+        for i, (contract, fn_name, args) in enumerate(calls):
+            value = self.cache.get(
+                self.network, contract.address, fn_name, args, block
+            )
+            if value is MISSING:
+                missed.append(i)
+            else:
+                rpc_trace.record_hit(self.network, contract.address, fn_name)
+            results.append(value)
+        if not missed:
+            return results
+
+        fetched = self.reader.call([calls[i] for i in missed])
+        for i, value in zip(missed, fetched):
+            results[i] = value
+            contract, fn_name, args = calls[i]
+            if callable(immutable):
+                is_immutable = immutable(calls[i], value)
+            else:
+                is_immutable = immutable
+            if is_immutable:
+                self.cache.put(
+                    self.network, contract.address, fn_name, args, value
+                )
+            elif block is not None:
+                self.cache.put(
+                    self.network, contract.address, fn_name, args, value,
+                    block
+                )
+        return results
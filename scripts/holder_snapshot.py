@@ -0,0 +1,219 @@
+from dataclasses import replace
+from itertools import groupby
+import csv
+
+from brownie import network, veSPA_v1, web3
+
+from .batch_reader import (
+    BatchReader,
+    BoundContract,
+    find_epoch,
+    get_multicall_address,
+)
+from .event_indexer import (
+    EventIndexer,
+    EventStore,
+)
+from .reward_calculator import vespa_address_dict
+from .vespa_engine import (
+    LockedBalance,
+    Point,
+    decay,
+    locked_after_event,
+    user_point,
+)
+
+# Rows buffered before being written out
+BATCH_SIZE = 10000
+
+COLUMNS = [
+    'address',
+    'balance',
+    'locked_amount',
+    'locked_end',
+    'auto_cooldown',
+    'cooldown_initiated',
+]
+
+
+def block_time(reader, vespa, block):
+    """
+    Timestamp veSPA_v1.balanceOfAt / totalSupplyAt use for `block`: the
+    linear interpolation between the global points around it, or up to
+    the pinned head block after the last one.
+    """
+    head = reader.pin()
+    epoch = reader.call([(vespa, 'epoch', ())])[0]
+    target_epoch = find_epoch(reader, vespa, 'pointHistory', 4, block, epoch)
+    if target_epoch < epoch:
+        point0, point1 = reader.call([
+            (vespa, 'pointHistory', (target_epoch,)),
+            (vespa, 'pointHistory', (target_epoch + 1,)),
+        ])
+        d_block = point1[4] - point0[4]
+        dt = point1[3] - point0[3]
+    else:
+        point0 = reader.call([(vespa, 'pointHistory', (target_epoch,))])[0]
+        d_block = head - point0[4]
+        dt = reader.block_timestamp - point0[3]
+    if d_block == 0:
+        return point0[3]
+    return point0[3] + (dt * (block - point0[4])) // d_block
+
+
+def holder_state(events):
+    """
+    (LockedBalance, last user Point) of a holder after its UserCheckpoint
+    and Withdraw `events`, as yielded by EventStore.events.
+    """
+    locked = LockedBalance()
+    point = Point()
+    for name, args, ts, blk, _ in events:
+        if name == 'Withdraw':
+            locked = LockedBalance()
+            point = Point(ts=ts, blk=blk)
+            continue
+        locked = locked_after_event(locked, args)
+        point = Point()
+        if locked.end > ts and locked.amount > 0:
+            point = user_point(replace(locked), ts)
+        point.ts = ts
+        point.blk = blk
+    return locked, point
+
+
+def iter_snapshot(store, network_name, vespa, ts=None, block=None,
+                  time=None, include_empty=False):
+    """
+    Yields one row per holder (see COLUMNS) of `vespa` at timestamp `ts`,
+    or at `block` where `time` is its block_time. Holders are streamed
+    from the store one at a time, so memory does not grow with their
+    number. Holders without lock nor balance are skipped unless
+    `include_empty`.
+    """
+    if (ts is None) == (block is None):
+        raise ValueError('Pass either a timestamp or a block')
+    if block is not None and time is None:
+        raise ValueError('A block snapshot needs its block_time')
+    events = store.events(
+        network_name, vespa, ['UserCheckpoint', 'Withdraw'],
+        to_block=block, to_ts=ts, by_account=True
+    )
+    for holder, holder_events in groupby(
+        events, key=lambda event: event[1]['provider']
+    ):
+        locked, point = holder_state(holder_events)
+        balance = decay(point, ts if block is None else time)
+        if not include_empty and balance == 0 and locked.amount == 0:
+            continue
+        yield (
+            holder,
+            balance,
+            locked.amount,
+            locked.end,
+            locked.autoCooldown,
+            locked.cooldownInitiated,
+        )
+
+
+class CsvWriter:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    # Amounts can exceed 64 bits and are stored as decimal strings
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError(
+                'Parquet export requires pyarrow: pip install pyarrow'
+            )
+        self.pa = pa
+        self.schema = pa.schema([
+            ('address', pa.string()),
+            ('balance', pa.string()),
+            ('locked_amount', pa.string()),
+            ('locked_end', pa.int64()),
+            ('auto_cooldown', pa.bool_()),
+            ('cooldown_initiated', pa.bool_()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        columns[1] = [str(v) for v in columns[1]]
+        columns[2] = [str(v) for v in columns[2]]
+        self.writer.write_table(self.pa.Table.from_arrays(
+            [list(c) for c in columns], schema=self.schema
+        ))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {
+    'csv': CsvWriter,
+    'parquet': ParquetWriter,
+}
+
+
+def export_snapshot(rows, path, fmt='csv', batch_size=BATCH_SIZE):
+    """
+    Writes the `rows` of iter_snapshot to `path` in batches of
+    `batch_size` and returns the number of rows written.
+    """
+    writer = WRITERS[fmt](path)
+    count = 0
+    batch = []
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                writer.write(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write(batch)
+            count += len(batch)
+    finally:
+        writer.close()
+    return count
+
+
+def main():
+    network_name = network.show_active()
+    vespa_address = vespa_address_dict[network_name]
+    at = input('Enter the snapshot timestamp, or #<block> for a block: ')
+    fmt = input('Enter the output format [csv/parquet]: ').strip() or 'csv'
+    path = f'snapshot_{network_name}_{at.lstrip("#")}.{fmt}'
+
+    store = EventStore()
+    indexer = EventIndexer(
+        web3, store, network_name,
+        {vespa_address: ('veSPA', veSPA_v1.abi)}, confirmations=5
+    )
+    print(f'{indexer.sync()} new events indexed')
+
+    if at.startswith('#'):
+        block = int(at[1:])
+        reader = BatchReader(web3, get_multicall_address())
+        vespa = BoundContract(vespa_address, veSPA_v1.abi)
+        rows = iter_snapshot(
+            store, network_name, vespa_address, block=block,
+            time=block_time(reader, vespa, block)
+        )
+    else:
+        rows = iter_snapshot(store, network_name, vespa_address, ts=int(at))
+    count = export_snapshot(rows, path, fmt)
+    print(f'{count} holders exported to: {path}')
@@ -0,0 +1,82 @@
+from .batch_reader import BatchReader, BoundContract
+from .chain_pool import ChainConnection
+from .history_cache import CachedReader
+from .registry import get_abi, get_address
+
+# Contract kinds bound by ReadClient: (registry name, exported ABI)
+CONTRACTS = {
+    'vespa': ('vespa_proxy', 'veSPA_v1'),
+    'rd': ('reward_distributor', 'RewardDistributor_v1'),
+}
+
+
+class ReadClient:
+    """
+    Read-only access to veSPA_v1 and RewardDistributor_v1 on one network.
+
+    Addresses come from the deployment registry and ABIs from its
+    exported ABI cache, reads go through a BatchReader over plain web3,
+    so neither brownie nor the project is loaded. Only `contract` imports
+    brownie, for the paths that send transactions.
+    """
+
+    def __init__(self, network_name, w3, multicall_address, cache=None,
+                 addresses=None):
+        self.network_name = network_name
+        self.w3 = w3
+        self.addresses = dict(addresses or {})
+        self.bound = {}
+        self.reader = BatchReader(w3, multicall_address)
+        if cache is not None:
+            self.reader = CachedReader(self.reader, cache, network_name)
+
+    @classmethod
+    def from_connection(cls, connection, cache=None):
+        return cls(
+            connection.network_name, connection.w3,
+            connection.multicall_address, cache
+        )
+
+    @classmethod
+    def from_network(cls, network_name, cache=None):
+        """Client over a new provider, configured from network-config"""
+        return cls.from_connection(
+            ChainConnection.from_network(network_name), cache
+        )
+
+    def address(self, kind):
+        if kind not in self.addresses:
+            self.addresses[kind] = get_address(
+                CONTRACTS[kind][0], self.network_name
+            )
+        return self.addresses[kind]
+
+    def bind(self, kind):
+        """BoundContract of `kind` (see CONTRACTS), bound on first use"""
+        if kind not in self.bound:
+            self.bound[kind] = BoundContract(
+                self.address(kind), get_abi(CONTRACTS[kind][1])
+            )
+        return self.bound[kind]
+
+    @property
+    def vespa(self):
+        return self.bind('vespa')
+
+    @property
+    def rd(self):
+        return self.bind('rd')
+
+    def call(self, calls, immutable=False):
+        return self.reader.call(calls, immutable)
+
+    def contract(self, kind):
+        """
+        brownie Contract of `kind` to send transactions with. Needs the
+        brownie network of this client to be connected.
+        """
+        from brownie import Contract
+        _, contract_name = CONTRACTS[kind]
+        return Contract.from_abi(
+            contract_name, self.address(kind), get_abi(contract_name)
+        )
@@ -0,0 +1,262 @@
+import json
+import os
+import re
+import threading
+import time
+
+DEPLOYED_PATH = 'deployed'
+# Decoded ABIs, exported once from the brownie build artifacts
+ABI_PATH = os.path.join(DEPLOYED_PATH, 'abis')
+BUILD_PATH = os.path.join('build', 'contracts')
+INDEX_FILE = 'index.json'
+# Progress files of the deploy pipeline and the claim keeper, kept next to
+# the artifacts but not indexed
+JOURNAL_SUFFIX = '_journal.json'
+# Format of the artifact names written by utils.save_deployment_artifacts
+ARTIFACT_TIME_FORMAT = '%m-%d-%Y_%H:%M:%S'
+# Addresses migrated from the constants the scripts used to hardcode,
+# older than every recorded artifact
+SEED_FILE = 'seed.json'
+
+# Contracts bound by the scripts, see export_abis
+ABI_EXPORTS = [
+    'veSPA_v1',
+    'RewardDistributor_v1',
+    'RewardDistributor',
+    'ProxyAdmin',
+    'TransparentUpgradeableProxy',
+    'MockToken',
+]
+
+# Forks resolve to the addresses of the network they fork
+NETWORK_ALIASES = {
+    'arbitrum-main-fork': 'arbitrum-one',
+    'mainnet-fork': 'mainnet',
+}
+
+# Local networks fall back to the addresses of this network for the
+# contracts they have not deployed themselves, as the mainnet constants
+# used to
+FALLBACK_NETWORKS = {
+    'development': 'arbitrum-one',
+    'geth-dev': 'arbitrum-one',
+}
+
+# Artifact keys naming the same contract
+NAME_ALIASES = {
+    'vespa': 'vespa_proxy',
+}
+
+ADDRESS_RE = re.compile(r'^0x[0-9a-fA-F]{40}$')
+
+
+def _artifact_time(path):
+    if os.path.basename(path) == SEED_FILE:
+        return 0
+    name = os.path.splitext(os.path.basename(path))[0]
+    try:
+        return time.mktime(time.strptime(name, ARTIFACT_TIME_FORMAT))
+    except ValueError:
+        return os.path.getmtime(path)
+
+
+class Registry:
+    """
+    Index of the deployment artifacts under deployed/<network>/.
+
+    Every network directory holds an index.json mapping each contract
+    name to the addresses it was deployed at, oldest first, and to an
+    optional pinned address. Artifacts written since the index was saved
+    are folded in memory on first use, so a lookup reads the directory
+    once and then is a dict access. Lookups never write: the index is
+    saved by record, pin and rebuild. Decoded ABIs are cached in
+    deployed/abis/.
+    """
+
+    def __init__(self, path=DEPLOYED_PATH, abi_path=None):
+        self.path = path
+        self.abi_path = abi_path or os.path.join(path, 'abis')
+        self.indexes = {}
+        self.abis = {}
+        self.lock = threading.Lock()
+
+    def _network(self, network_name):
+        if network_name is None:
+            from brownie import network
+            network_name = network.show_active()
+        return NETWORK_ALIASES.get(network_name, network_name)
+
+    def _save_index(self, network_name, index):
+        dirname = os.path.join(self.path, network_name)
+        os.makedirs(dirname, exist_ok=True)
+        with open(os.path.join(dirname, INDEX_FILE), 'w') as f:
+            json.dump(index, f, indent=4, sort_keys=True)
+
+    def index(self, network_name=None):
+        """Returns the index of `network_name`, updated with new artifacts"""
+        network_name = self._network(network_name)
+        with self.lock:
+            if network_name not in self.indexes:
+                self.indexes[network_name] = self._build(network_name)
+            return self.indexes[network_name]
+
+    def _build(self, network_name, saved=True):
+        # The saved index (unless `saved` is False) plus the artifacts it
+        # does not list yet
+        dirname = os.path.join(self.path, network_name)
+        index = {'artifacts': [], 'contracts': {}, 'pinned': {}}
+        index_path = os.path.join(dirname, INDEX_FILE)
+        if saved and os.path.exists(index_path):
+            with open(index_path) as f:
+                index = json.load(f)
+        if os.path.isdir(dirname):
+            new = [
+                os.path.join(dirname, name) for name in os.listdir(dirname)
+                if name.endswith('.json') and name != INDEX_FILE and
+                not name.endswith(JOURNAL_SUFFIX) and
+                name not in index['artifacts']
+            ]
+            for path in sorted(new, key=_artifact_time):
+                with open(path) as f:
+                    self._add(index, os.path.basename(path), json.load(f))
+        return index
+
+    def rebuild(self, network_name=None):
+        """
+        Rebuilds the index of `network_name` from its artifacts, keeping
+        the pins, and saves it
+        """
+        network_name = self._network(network_name)
+        index = self._build(network_name, saved=False)
+        index['pinned'] = self.index(network_name)['pinned']
+        with self.lock:
+            self.indexes[network_name] = index
+        self._save_index(network_name, index)
+        return index
+
+    @staticmethod
+    def _add(index, artifact, data):
+        index['artifacts'].append(artifact)
+        for key, value in data.items():
+            if not isinstance(value, str) or not ADDRESS_RE.match(value):
+                continue
+            name = NAME_ALIASES.get(key, key)
+            addresses = index['contracts'].setdefault(name, [])
+            if value in addresses:
+                addresses.remove(value)
+            addresses.append(value)
+
+    def address(self, name, network_name=None):
+        """
+        Pinned or latest address of `name` on `network_name`, or on its
+        fallback network if it has none
+        """
+        network_name = self._network(network_name)
+        index = self.index(network_name)
+        name = NAME_ALIASES.get(name, name)
+        if name in index['pinned']:
+            return index['pinned'][name]
+        if not index['contracts'].get(name):
+            if network_name in FALLBACK_NETWORKS:
+                return self.address(name, FALLBACK_NETWORKS[network_name])
+            raise KeyError(
+                f'No {name} deployment recorded for {network_name}'
+            )
+        return index['contracts'][name][-1]
+
+    def addresses(self, name):
+        """{network: address} of `name` on every network that has one"""
+        result = {}
+        for network_name in sorted(os.listdir(self.path)):
+            if not os.path.isdir(os.path.join(self.path, network_name)):
+                continue
+            try:
+                result[network_name] = self.address(name, network_name)
+            except KeyError:
+                continue
+        return result
+
+    def pin(self, name, address, network_name=None):
+        """Pins `name` to `address`, or unpins it with address=None"""
+        index = self.index(network_name)
+        name = NAME_ALIASES.get(name, name)
+        if address is None:
+            index['pinned'].pop(name, None)
+        else:
+            index['pinned'][name] = address
+        self._save_index(self._network(network_name), index)
+
+    def record(self, data, network_name=None):
+        """
+        Writes a deployment artifact for `network_name` and adds it to the
+        index. Returns the artifact path.
+        """
+        network_name = self._network(network_name)
+        dirname = os.path.join(self.path, network_name)
+        os.makedirs(dirname, exist_ok=True)
+        name = time.strftime(ARTIFACT_TIME_FORMAT) + '.json'
+        path = os.path.join(dirname, name)
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=4, sort_keys=True)
+        index = self.index(network_name)
+        if name not in index['artifacts']:
+            self._add(index, name, data)
+        self._save_index(network_name, index)
+        return path
+
+    def abi(self, contract_name):
+        """
+        ABI of `contract_name` from the ABI cache, filled from the brownie
+        build artifacts on first use.
+        """
+        if contract_name in self.abis:
+            return self.abis[contract_name]
+        path = os.path.join(self.abi_path, contract_name + '.json')
+        if not os.path.exists(path):
+            self.export_abis([contract_name])
+        with open(path) as f:
+            self.abis[contract_name] = json.load(f)
+        return self.abis[contract_name]
+
+    def export_abis(self, names=ABI_EXPORTS, build_path=BUILD_PATH):
+        """Copies the ABIs of `names` from the compiled project"""
+        os.makedirs(self.abi_path, exist_ok=True)
+        for contract_name in names:
+            build = os.path.join(build_path, contract_name + '.json')
+            if not os.path.exists(build):
+                raise FileNotFoundError(
+                    f'{build} not found, run `brownie compile` first'
+                )
+            with open(build) as f:
+                abi = json.load(f)['abi']
+            with open(
+                os.path.join(self.abi_path, contract_name + '.json'), 'w'
+            ) as f:
+                json.dump(abi, f, indent=4)
+
+
+registry = Registry()
+
+
+def get_address(name, network_name=None):
+    """Pinned or latest address of `name`, on the active network by default"""
+    return registry.address(name, network_name)
+
+
+def get_abi(contract_name):
+    return registry.abi(contract_name)
+
+
+def main():
+    registry.export_abis()
+    print(f'ABIs exported to: {registry.abi_path}')
+
+
+def rebuild_indexes():
+    # brownie run scripts/registry.py rebuild_indexes
+    for network_name in sorted(os.listdir(registry.path)):
+        if network_name == os.path.basename(registry.abi_path):
+            continue
+        if os.path.isdir(os.path.join(registry.path, network_name)):
+            registry.rebuild(network_name)
+            print(f'Index of {network_name} rebuilt')
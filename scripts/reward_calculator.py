@@ -1,64 +1,294 @@
-from brownie import (
-    network,
-    veSPA_v1,
-    chain,
-    Contract
-)
-from .utils import confirm
+# brownie is only imported by the functions that use the brownie network,
+# so reports run with `python -m scripts.reward_calculator` start without
+# loading the project
+from . import rpc_provider, rpc_trace
+from .batch_reader import find_epoch, get_multicall_address
+from .chain_pool import ChainPool
+from .history_cache import HistoryCache
+from .read_client import ReadClient
+from .registry import get_address
+from .vespa_engine import VeSPAEngine
+import argparse
 import json
+import sys
 
 
+# Networks the rewards are split across
+REWARD_NETWORKS = ['arbitrum-one', 'mainnet']
+
 # Dictionary of concerned conteract addresses
 # Key is the network name, value is the veSPA address for that network
 vespa_address_dict = {
-    'arbitrum-one': '0x2e2071180682Ce6C247B1eF93d382D509F5F6A17',
-    'mainnet': '0xbF82a3212e13b2d407D10f5107b5C8404dE7F403',
+    network_name: get_address('vespa_proxy', network_name)
+    for network_name in REWARD_NETWORKS
 }
 
 
-def get_week_epoch(vespa, time, epoch):
-    min_epoch = 0
-    max_epoch = epoch
-    for i in range(0, 128):
-        if (min_epoch >= max_epoch):
-            break
-        mid = (min_epoch + max_epoch + 1) / 2
-        if (vespa.pointHistory(mid)[3] <= time):
-            min_epoch = mid
-        else:
-            max_epoch = mid - 1
-    return min_epoch
-
-
-# Function to get veSPA balance for a given network and week timestamp
-def get_vespa_balance(network_name, time):
-    print('Getting veSPA balance for', network_name)
-    network.disconnect()
+YEAR = 365 * 86400
+WEEK = 604800
+
+
+def get_week_epoch(reader, vespa, time, epoch=None):
+    cache = getattr(reader, 'cache', None)
+    settled = cache is not None and reader.is_settled(time)
+    if settled:
+        # Settled weeks are looked up in the week -> epoch index
+        week_epoch = cache.get_week_epoch(reader.network, vespa.address, time)
+        if week_epoch is not None:
+            return week_epoch
+    if epoch is None:
+        epoch = reader.call([(vespa, 'epoch', ())])[0]
+    week_epoch = find_epoch(
+        reader, vespa, 'pointHistory', 3, time, epoch,
+        lambda call, point: reader.is_settled(point[3])
+    )
+    if settled:
+        cache.put_week_epoch(reader.network, vespa.address, time, week_epoch)
+    return week_epoch
+
+
+def get_week_data(reader, vespa, time):
+    """
+    Returns the SPA locked and the veSPA supply of `vespa` at `time`
+    using batched reads pinned to the current block.
+    """
+    reader.pin()
+    week_epoch = get_week_epoch(reader, vespa, time)
+    point, supply = reader.call(
+        [
+            (vespa, 'pointHistory', (week_epoch,)),
+            (vespa, 'totalSupply', (time,)),
+        ],
+        reader.is_settled(time)
+    )
+    spa_locked = point[1] * YEAR
+    return spa_locked, supply
+
+
+def get_global_history(reader, vespa, to_time):
+    """
+    Returns a VeSPAEngine loaded with the whole pointHistory of `vespa`
+    and the slopeChanges of every week up to `to_time`, read in batches
+    pinned to the current block. Settled points and past slope changes
+    are final and get cached.
+    """
+    reader.pin()
+    epoch = reader.call([(vespa, 'epoch', ())])[0]
+    points = reader.call(
+        [(vespa, 'pointHistory', (e,)) for e in range(epoch + 1)],
+        lambda call, point: reader.is_settled(point[3])
+    )
+    # slopeChanges are only written for future weeks
+    weeks = list(range(
+        (points[0][3] // WEEK + 1) * WEEK, to_time + WEEK, WEEK
+    ))
+    slope_changes = reader.call(
+        [(vespa, 'slopeChanges', (week,)) for week in weeks],
+        lambda call, value: reader.is_settled(call[2][0])
+    )
+    return VeSPAEngine.from_global_history(
+        points, dict(zip(weeks, slope_changes))
+    )
+
+
+def get_weeks_data(reader, vespa, weeks):
+    """
+    Returns {week: (spa_locked, supply)} like get_week_data for every
+    week in `weeks`, from a single read of the global history.
+    """
+    engine = get_global_history(reader, vespa, max(weeks))
+    return {
+        week: (
+            engine.global_point(week).slope * YEAR,
+            engine.totalSupply(week),
+        )
+        for week in weeks
+    }
+
+
+def get_reward_history(reader, rd, weeks):
+    """
+    Returns {week: (rewardsPerWeek, veSPASupply)} of RewardDistributor_v1.
+    Weeks before the last reward checkpoint are final and get cached.
+    """
+    reader.pin()
+    last_checkpoint = reader.call([(rd, 'lastRewardCheckpointTime', ())])[0]
+    last_checkpoint_week = (last_checkpoint // WEEK) * WEEK
+    calls = []
+    for week in weeks:
+        calls.append((rd, 'rewardsPerWeek', (week,)))
+        calls.append((rd, 'veSPASupply', (week,)))
+    results = reader.call(
+        calls,
+        lambda call, value: call[2][0] < last_checkpoint_week
+    )
+    return {
+        week: (results[2 * i], results[2 * i + 1])
+        for i, week in enumerate(weeks)
+    }
+
+
+def switch_network(network_name):
+    from brownie import network, web3
+    # Reconnect only when the active network differs
+    if network.is_connected():
+        if network.show_active() == network_name:
+            return
+        network.disconnect()
     network.connect(network_name)
-    vespa = Contract.from_abi(
-        'veSPA',
-        vespa_address_dict[network_name],
-        veSPA_v1.abi
+    rpc_provider.install(web3)
+
+
+def get_chain_weeks(connection, weeks, cache=None):
+    # ChainPool worker of get_vespa_history
+    client = ReadClient.from_connection(connection, cache)
+    return get_weeks_data(client.reader, client.vespa, weeks)
+
+
+def get_vespa_history(weeks, cache=None):
+    """
+    Returns {network: {week: (spa_locked, vespa)}} for every network in
+    vespa_address_dict, all chains queried in parallel.
+    """
+    pool = ChainPool(vespa_address_dict.keys())
+    return pool.map(get_chain_weeks, weeks, cache)
+
+
+def get_series_history(weeks, cache=None):
+    """
+    Returns {network: {week: (spa_locked, vespa)}} like get_vespa_history
+    from the weekly supply series, brought up to date first. Only weeks
+    past the head of a chain are read live.
+    """
+    from .supply_series import SupplySeries, get_history, update_series
+    series = SupplySeries()
+    update_series(series, cache)
+    history = get_history(series, weeks)
+    missing = sorted({
+        week for week in weeks for key in vespa_address_dict
+        if week not in history[key]
+    })
+    if missing:
+        live = get_vespa_history(missing, cache)
+        for key in vespa_address_dict:
+            for week in missing:
+                history[key].setdefault(week, live[key][week])
+    return history
+
+
+def split_rewards(balances, rewards):
+    """
+    Splits `rewards` between chains pro rata to their veSPA supply.
+    `balances` is {network: (spa_locked, vespa)}; returns the per-chain
+    data with the total SPA locked and veSPA.
+    """
+    chain_data = {}
+    total_vespa = 0
+    total_spa = 0
+    # Calculate the total veSPA balance across all networks
+    for key in vespa_address_dict:
+        chain_data[key] = {'vespa': 0, 'rewards': 0, 'spa_locked': 0}
+        (spa, vespa) = balances[key]
+        chain_data[key]['vespa'] = vespa
+        chain_data[key]['spa_locked'] = spa
+        total_vespa += chain_data[key]['vespa']
+        total_spa += chain_data[key]['spa_locked']
+
+    # Calculate the rewards for each network
+    for key in vespa_address_dict:
+        if total_vespa > 0:
+            chain_data[key]['rewards'] = (
+                chain_data[key]['vespa'] *
+                rewards
+            ) // total_vespa
+    return chain_data, total_spa, total_vespa
+
+
+def format_history(report):
+    networks = list(vespa_address_dict)
+    header = f'{"week":<12}' + ''.join(
+        f'{n + " veSPA":>30}{n + " rewards":>30}' for n in networks
+    ) + f'{"total veSPA":>30}'
+    lines = [header]
+    for week, data in report.items():
+        line = f'{week:<12}'
+        for key in networks:
+            line += (
+                f'{data["chains"][key]["vespa"]:>30}'
+                f'{data["chains"][key]["rewards"]:>30}'
+            )
+        lines.append(line + f'{data["total_vespa"]:>30}')
+    return '\n'.join(lines)
+
+
+def backfill(from_week, to_week, rewards=0, output=None):
+    """
+    Per-chain split of `rewards` (wei, per week) for every week from
+    `from_week` to `to_week`, with one history read per chain.
+    """
+    weeks = list(range(
+        (from_week // WEEK) * WEEK, (to_week // WEEK) * WEEK + 1, WEEK
+    ))
+    history = get_series_history(weeks, cache=HistoryCache())
+    report = {}
+    for week in weeks:
+        chain_data, total_spa, total_vespa = split_rewards(
+            {key: history[key][week] for key in vespa_address_dict},
+            rewards
+        )
+        report[week] = {
+            'chains': chain_data,
+            'total_spa_locked': total_spa,
+            'total_vespa': total_vespa,
+        }
+    print(format_history(report))
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f'Report stored at: {output}')
+    return report
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        prog='reward_calculator',
+        description='Per-chain reward split for a range of weeks'
     )
-    epoch = get_week_epoch(vespa, time, vespa.epoch())
-    slope = vespa.pointHistory(epoch)[1]
-    spa_locked = slope * 365 * 86400
-    return spa_locked, vespa.totalSupply(time)
+    parser.add_argument('--from-week', type=int, required=True,
+                        help='first week timestamp')
+    parser.add_argument('--to-week', type=int,
+                        help='last week timestamp (default: --from-week)')
+    parser.add_argument('--rewards', type=float, default=0,
+                        help='SPA distributed every week')
+    parser.add_argument('--output', help='JSON report path')
+    parsed = parser.parse_args(args)
+    if parsed.to_week is None:
+        parsed.to_week = parsed.from_week
+    return parsed
 
 
 def distribute_rewards(network_name, rewards, owner):
     print('Adding rewards in network', network_name)
-    network.disconnect()
-    network.connect(network_name)
-    rd = Contract.from_abi(
-        'RewardDistributor',
-        vespa_address_dict[network_name]['reward_distributor'],
-        veSPA_v1.abi
-    )
+    from brownie import web3
+    switch_network(network_name)
+    rd = ReadClient(
+        network_name, web3, get_multicall_address()
+    ).contract('rd')
     rd.addRewards(rewards, {'from': owner})
 
 
-def main():
+def main(*args):
+    # brownie run scripts/reward_calculator.py main --from-week <ts> ...
+    # or, without brownie: python -m scripts.reward_calculator --from-week
+    if args:
+        options = parse_args(args)
+        backfill(
+            options.from_week, options.to_week,
+            int(options.rewards * 10 ** 18), options.output
+        )
+        return
+    from brownie import chain
+    from .utils import confirm
     print('Confirm the addresses are correct: \n')
     confirm(json.dumps(vespa_address_dict, indent=4) + '\n')
     confirm('NOTE: Please confirm that your infura key is set in the network-config.yaml file') # noqa
@@ -78,27 +308,17 @@ def main():
     # If time is 0, then we calculate the rewards for this week
     if time <= 0:
         time = (chain.time() // 604800) * 604800
-    chain_data = {}
-    total_vespa = 0
-    total_spa = 0
-    # Calculate the total veSPA balance across all networks
-    for key in vespa_address_dict:
-        chain_data[key] = {'vespa': 0, 'rewards': 0, 'spa_locked': 0}
-        (spa, vespa) = get_vespa_balance(key, time)
-        chain_data[key]['vespa'] = vespa
-        chain_data[key]['spa_locked'] = spa
-        total_vespa += chain_data[key]['vespa']
-        total_spa += chain_data[key]['spa_locked']
-
-    # Calculate the rewards for each network
-    for key in vespa_address_dict:
-        chain_data[key]['rewards'] = (
-            chain_data[key]['vespa'] *
-            rewards
-        ) // total_vespa
+    history = get_series_history([time], cache=HistoryCache())
+    balances = {key: history[key][time] for key in vespa_address_dict}
+    chain_data, total_spa, total_vespa = split_rewards(balances, rewards)
 
     print('Week timestamp: ', time)
     print('total rewards: ', rewards)
     print('total spa locked across chains', total_spa)
     print('total veSPA across chains', total_vespa)
     print('reward distribution: ', json.dumps(chain_data, indent=4))
+
+
+if __name__ == '__main__':
+    rpc_trace.enable_from_env()
+    main(*sys.argv[1:])
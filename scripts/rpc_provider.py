@@ -0,0 +1,258 @@
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+from web3 import HTTPProvider
+import json
+import random
+import requests
+import threading
+import time
+
+# Default limits of an endpoint, shared by every provider pointing at it.
+# Sized for the Infura / Alchemy plans the weekly jobs run on.
+RATE = 10
+BURST = 20
+MAX_CONCURRENCY = 4
+POOL_SIZE = 8
+TIMEOUT = 30
+
+# Retries of a request on rate limiting, 5xx responses and connection
+# errors, with exponential backoff and full jitter
+RETRIES = 6
+BACKOFF = 0.5
+MAX_BACKOFF = 30
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# JSON-RPC error codes providers use for rate limiting
+RETRY_CODES = {-32005, -32029, 429}
+
+# Local nodes (ganache, forks) are left unthrottled by install()
+LOCAL_HOSTS = {'localhost', '127.0.0.1'}
+
+# Methods never deduplicated, and only retried when the node rejected the
+# request (a 429 or a rate limit error): after a timeout, a connection
+# error or a 5xx the transaction may have been accepted, and sending it
+# again would duplicate it or fail on its nonce. Concurrent identical
+# requests of the other methods are sent once and share the response.
+SEND_METHODS = {'eth_sendTransaction', 'eth_sendRawTransaction'}
+
+
+class RateLimited(Exception):
+    """
+    A response asking to slow down, retried by the provider. `rejected`
+    is True when the node certainly did not process the request.
+    """
+
+    def __init__(self, reason, retry_after=None, rejected=True):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.rejected = rejected
+
+
+def parse_retry_after(value, limit=MAX_BACKOFF):
+    """
+    Seconds to wait from a Retry-After header, given in seconds or as an
+    HTTP-date, capped at `limit`. None if it cannot be parsed.
+    """
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        seconds = date.timestamp() - time.time()
+    return min(max(seconds, 0), limit)
+
+
+class TokenBucket:
+    """
+    `rate` requests per second with bursts of up to `burst`. acquire()
+    reserves a token and sleeps until it is available, so waiting threads
+    are served in order without busy looping.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or rate
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Returns the time spent waiting"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            wait = max(-self.tokens / self.rate, 0)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class Endpoint:
+    """
+    State shared by the providers of one URI: a keep-alive session with a
+    bounded connection pool, the token bucket, the concurrency limit and
+    the in-flight requests.
+    """
+
+    def __init__(self, uri, rate=RATE, burst=BURST,
+                 max_concurrency=MAX_CONCURRENCY, pool_size=POOL_SIZE):
+        self.uri = uri
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.bucket = TokenBucket(rate, burst)
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.requests = 0
+        self.retries = 0
+        self.deduplicated = 0
+        self.throttled = 0.0
+
+
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+
+
+def get_endpoint(uri, **limits):
+    """The Endpoint of `uri`, created with `limits` on first use"""
+    with _endpoints_lock:
+        if uri not in _endpoints:
+            _endpoints[uri] = Endpoint(uri, **limits)
+        return _endpoints[uri]
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class PooledHTTPProvider(HTTPProvider):
+    """
+    HTTPProvider sending through the shared Endpoint of its URI: pooled
+    keep-alive connections, token-bucket rate limiting, at most
+    `max_concurrency` requests in flight and retries with jittered
+    exponential backoff on 429 / 5xx / rate limit errors / connection
+    errors (Retry-After is honoured); transactions only on a 429 or a
+    rate limit error. Concurrent identical read requests are sent once
+    and share the response.
+    """
+
+    def __init__(self, endpoint_uri, retries=RETRIES, backoff=BACKOFF,
+                 max_backoff=MAX_BACKOFF, timeout=TIMEOUT, **limits):
+        super().__init__(endpoint_uri)
+        self.endpoint = get_endpoint(endpoint_uri, **limits)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+    def make_request(self, method, params):
+        if method in SEND_METHODS:
+            return self._send(method, params)
+        key = (method, json.dumps(params, sort_keys=True, default=str))
+        endpoint = self.endpoint
+        with endpoint.lock:
+            inflight = endpoint.inflight.get(key)
+            leader = inflight is None
+            if leader:
+                inflight = endpoint.inflight[key] = _InFlight()
+            else:
+                endpoint.deduplicated += 1
+        if not leader:
+            inflight.done.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            return dict(inflight.response)
+        try:
+            inflight.response = self._send(method, params)
+            return inflight.response
+        except Exception as e:
+            inflight.error = e
+            raise
+        finally:
+            with endpoint.lock:
+                del endpoint.inflight[key]
+            inflight.done.set()
+
+    def _send(self, method, params):
+        endpoint = self.endpoint
+        request_data = self.encode_rpc_request(method, params)
+        for attempt in range(self.retries + 1):
+            endpoint.throttled += endpoint.bucket.acquire()
+            try:
+                with endpoint.slots:
+                    endpoint.requests += 1
+                    return self._post(request_data)
+            except (RateLimited, requests.ConnectionError,
+                    requests.Timeout) as e:
+                if attempt == self.retries:
+                    raise
+                if method in SEND_METHODS and not getattr(
+                    e, 'rejected', False
+                ):
+                    raise
+                endpoint.retries += 1
+                delay = random.uniform(
+                    0, min(self.max_backoff, self.backoff * 2 ** attempt)
+                )
+                retry_after = getattr(e, 'retry_after', None)
+                time.sleep(max(delay, retry_after or 0))
+
+    def _post(self, request_data):
+        response = self.endpoint.session.post(
+            self.endpoint_uri,
+            data=request_data,
+            headers={'Content-Type': 'application/json'},
+            timeout=self.timeout,
+        )
+        if response.status_code in RETRY_STATUS:
+            raise RateLimited(
+                f'HTTP {response.status_code}',
+                parse_retry_after(
+                    response.headers.get('Retry-After'), self.max_backoff
+                ),
+                response.status_code == 429
+            )
+        response.raise_for_status()
+        result = self.decode_rpc_response(response.content)
+        error = result.get('error') if isinstance(result, dict) else None
+        if error and (
+            error.get('code') in RETRY_CODES or
+            'rate limit' in str(error.get('message', '')).lower()
+        ):
+            raise RateLimited(error.get('message'))
+        return result
+
+
+def install(w3, **options):
+    """
+    Swaps the HTTPProvider of `w3` (brownie's web3 included) for a
+    PooledHTTPProvider on the same URI, unless it is a local node. Returns
+    the provider.
+    """
+    provider = w3.provider
+    if (
+        not isinstance(provider, HTTPProvider) or
+        isinstance(provider, PooledHTTPProvider) or
+        urlparse(provider.endpoint_uri).hostname in LOCAL_HOSTS
+    ):
+        return provider
+    w3.provider = PooledHTTPProvider(provider.endpoint_uri, **options)
+    return w3.provider
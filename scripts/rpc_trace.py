@@ -0,0 +1,354 @@
+from collections import defaultdict
+from eth_abi import decode
+from urllib.parse import urlparse
+import atexit
+import json
+import os
+import threading
+import time
+
+from .batch_reader import MULTICALL2_ABI, BoundContract
+from .registry import ABI_EXPORTS, registry
+
+# Opt-in switch read by enable_from_env: RPC_TRACE=1 prints the summary
+# at exit, RPC_TRACE=<file.json> also exports it
+TRACE_ENV = 'RPC_TRACE'
+
+# Upper bounds in ms of the latency histogram buckets, plus one open bucket
+LATENCY_BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 10000]
+
+# Methods whose first param is a transaction dict with `to` / `data`
+CONTRACT_METHODS = ['eth_call', 'eth_estimateGas', 'eth_sendTransaction']
+
+AGGREGATE = BoundContract(
+    '0x' + '00' * 20, MULTICALL2_ABI
+).functions[('aggregate', 1)]
+
+
+class CallStats:
+    """Counters of one (network, contract, function, method) key"""
+
+    def __init__(self):
+        self.calls = 0
+        # calls sent inside a Multicall2 aggregate, not as their own RPC
+        self.batched = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self.latency = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def add(self, latency, request_bytes, response_bytes, batched=False,
+            error=False):
+        self.calls += 1
+        self.batched += batched
+        self.errors += error
+        self.latency += latency
+        ms = latency * 1000
+        bucket = next(
+            (i for i, bound in enumerate(LATENCY_BUCKETS) if ms <= bound),
+            len(LATENCY_BUCKETS)
+        )
+        self.histogram[bucket] += 1
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+
+    def percentile(self, q):
+        """Upper bound in ms of the bucket holding the q-th quantile"""
+        target = q * sum(self.histogram)
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS + [None], self.histogram):
+            seen += count
+            if count and seen >= target:
+                return bound
+        return 0
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'batched': self.batched,
+            'cache_hits': self.cache_hits,
+            'errors': self.errors,
+            'latency': self.latency,
+            'histogram': dict(zip(
+                [str(bound) for bound in LATENCY_BUCKETS] + ['inf'],
+                self.histogram
+            )),
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+        }
+
+
+class RpcTracer:
+    """
+    Records every JSON-RPC request sent through web3's HTTPProvider, and
+    the cache hits of CachedReader, per (network, contract, function,
+    method). eth_call / eth_estimateGas / eth_sendTransaction are
+    attributed to the function of their selector; the calls packed in a
+    Multicall2 aggregate are recorded one by one, with the latency of the
+    round trip that carried them. Other methods are recorded under
+    contract '-' and their own name.
+
+    Networks are named after the brownie network-config host of the
+    provider, contracts after the deployment registry and functions after
+    the project ABIs, as far as they are known; unknown ones keep their
+    address / selector.
+    """
+
+    def __init__(self):
+        self.stats = defaultdict(CallStats)
+        self.lock = threading.Lock()
+        self.selectors = {}
+        self.contracts = {}
+        self.hosts = None
+        self.started = time.time()
+
+    # ------------------------- Labels -------------------------
+
+    def register_abi(self, abi):
+        for (name, _), (selector, _, _) in BoundContract(
+            '0x' + '00' * 20, abi
+        ).functions.items():
+            self.selectors['0x' + selector.hex()] = name
+
+    def register_contract(self, network_name, address, name):
+        self.contracts[(network_name, address.lower())] = name
+
+    def _load_labels(self):
+        # Project ABIs and registry addresses, once
+        from .chain_pool import get_network_hosts
+
+        try:
+            hosts = get_network_hosts()
+        except (OSError, ValueError):
+            hosts = {}
+        self.register_abi(MULTICALL2_ABI)
+        for contract_name in ABI_EXPORTS:
+            try:
+                self.register_abi(registry.abi(contract_name))
+            except FileNotFoundError:
+                continue
+        for network_name in set(hosts.values()):
+            contracts = registry.index(network_name)['contracts']
+            for name, addresses in contracts.items():
+                for address in addresses:
+                    self.register_contract(network_name, address, name)
+        self.hosts = hosts
+
+    def network_name(self, endpoint_uri):
+        if self.hosts is None:
+            with self.lock:
+                if self.hosts is None:
+                    self._load_labels()
+        return self.hosts.get(endpoint_uri) or urlparse(endpoint_uri).netloc
+
+    def _function(self, data):
+        selector = data[:10]
+        return self.selectors.get(selector, selector)
+
+    def _contract(self, network_name, address):
+        return self.contracts.get((network_name, address.lower()), address)
+
+    # ------------------------ Recording ------------------------
+
+    def record(self, key, *args, **kwargs):
+        with self.lock:
+            self.stats[key].add(*args, **kwargs)
+
+    def record_hit(self, network_name, address, fn_name):
+        key = (network_name, self._contract(network_name, address), fn_name,
+               'cache')
+        with self.lock:
+            self.stats[key].cache_hits += 1
+
+    def trace(self, endpoint_uri, method, params, request_bytes, send):
+        """Runs `send()`, the actual request, and records it"""
+        start = time.perf_counter()
+        error = True
+        response = None
+        try:
+            response = send()
+            error = 'error' in response
+            return response
+        finally:
+            latency = time.perf_counter() - start
+            response_bytes = len(json.dumps(response, default=str))
+            self._record_request(
+                self.network_name(endpoint_uri), method, params, latency,
+                request_bytes, response_bytes, response, error
+            )
+
+    def _record_request(self, network_name, method, params, latency,
+                        request_bytes, response_bytes, response, error):
+        tx = params[0] if params and isinstance(params[0], dict) else {}
+        if method not in CONTRACT_METHODS or not tx.get('to'):
+            self.record((network_name, '-', method, method), latency,
+                        request_bytes, response_bytes, error=error)
+            return
+        data = tx.get('data') or tx.get('input') or '0x'
+        key = (
+            network_name, self._contract(network_name, tx['to']),
+            self._function(data), method
+        )
+        self.record(key, latency, request_bytes, response_bytes,
+                    error=error)
+        selector, input_types, output_types = AGGREGATE
+        if method != 'eth_call' or data[:10] != '0x' + selector.hex():
+            return
+        calls = decode(input_types, bytes.fromhex(data[10:]))[0]
+        returned = [b''] * len(calls)
+        if not error:
+            returned = decode(
+                output_types, bytes.fromhex(response['result'][2:])
+            )[1]
+        for (target, call_data), return_data in zip(calls, returned):
+            key = (
+                network_name, self._contract(network_name, target),
+                self._function('0x' + call_data.hex()), method
+            )
+            self.record(key, latency, len(call_data), len(return_data),
+                        batched=True, error=error)
+
+    # ------------------------- Reports -------------------------
+
+    def summary(self):
+        """Rows sorted by total latency, the slowest first"""
+        with self.lock:
+            rows = [
+                dict(zip(('network', 'contract', 'function', 'method'), key),
+                     **stats.to_dict())
+                for key, stats in self.stats.items()
+            ]
+            percentiles = {
+                key: (stats.percentile(0.5), stats.percentile(0.95))
+                for key, stats in self.stats.items()
+            }
+        for row in rows:
+            key = (row['network'], row['contract'], row['function'],
+                   row['method'])
+            row['p50'], row['p95'] = percentiles[key]
+        return sorted(rows, key=lambda row: row['latency'], reverse=True)
+
+    def format_summary(self):
+        rows = self.summary()
+        round_trips = sum(row['calls'] - row['batched'] for row in rows)
+        lines = [
+            f'RPC requests: {round_trips} in '
+            f'{time.time() - self.started:.1f}s',
+            f'{"network":<18}{"contract":<44}{"function":<24}'
+            f'{"method":<22}{"calls":>7}{"batched":>8}{"hits":>7}'
+            f'{"errors":>7}{"total s":>9}{"p50 ms":>8}{"p95 ms":>8}'
+            f'{"req KB":>9}{"resp KB":>9}',
+        ]
+        for row in rows:
+            lines.append(
+                f'{row["network"][:17]:<18}{row["contract"]:<44}'
+                f'{row["function"][:23]:<24}{row["method"][:21]:<22}'
+                f'{row["calls"]:>7}{row["batched"]:>8}'
+                f'{row["cache_hits"]:>7}{row["errors"]:>7}'
+                f'{row["latency"]:>9.2f}{str(row["p50"]):>8}'
+                f'{str(row["p95"]):>8}'
+                f'{row["request_bytes"] / 1024:>9.1f}'
+                f'{row["response_bytes"] / 1024:>9.1f}'
+            )
+        return '\n'.join(lines)
+
+    def export(self, path):
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(
+                {'buckets_ms': LATENCY_BUCKETS, 'calls': self.summary()},
+                f, indent=4
+            )
+
+
+tracer = None
+
+
+def _patch_provider():
+    from web3 import HTTPProvider
+    from .rpc_provider import PooledHTTPProvider
+
+    # PooledHTTPProvider overrides make_request, so it is patched as well;
+    # its retries are part of the latency of the request
+    for cls in (HTTPProvider, PooledHTTPProvider):
+        if getattr(cls.__dict__['make_request'], 'traced', False):
+            continue
+        _patch(cls)
+
+
+def _patch(cls):
+    make_request = cls.make_request
+
+    def traced_make_request(self, method, params):
+        if tracer is None:
+            return make_request(self, method, params)
+        request_bytes = len(self.encode_rpc_request(method, params))
+        return tracer.trace(
+            self.endpoint_uri, method, params, request_bytes,
+            lambda: make_request(self, method, params)
+        )
+
+    traced_make_request.traced = True
+    cls.make_request = traced_make_request
+
+
+def report(export_path=None):
+    if tracer is None:
+        return
+    print(tracer.format_summary())
+    if export_path:
+        tracer.export(export_path)
+        print(f'RPC trace stored at: {export_path}')
+
+
+def enable(export_path=None, at_exit=True):
+    """
+    Starts tracing every HTTPProvider of the process, brownie's included.
+    With `at_exit` the summary is printed (and exported to `export_path`)
+    when the process exits.
+    """
+    global tracer
+    if tracer is None:
+        tracer = RpcTracer()
+        _patch_provider()
+        if at_exit:
+            atexit.register(report, export_path)
+    return tracer
+
+
+def disable():
+    global tracer
+    tracer = None
+
+
+def enable_from_env():
+    value = os.environ.get(TRACE_ENV)
+    if value:
+        enable(None if value == '1' else value)
+    return tracer
+
+
+def record_hit(network_name, address, fn_name):
+    # Called by CachedReader, a no-op unless tracing
+    if tracer is not None:
+        tracer.record_hit(network_name, address, fn_name)
+
+
+def main(script, method='main', *args):
+    """
+    brownie run scripts/rpc_trace.py main scripts/<script>.py [method]
+    [args...] runs a script with tracing and prints the summary after it.
+    RPC_TRACE=<file.json> also exports it.
+    """
+    from brownie.project.scripts import run
+
+    export_path = os.environ.get(TRACE_ENV)
+    enable(at_exit=False)
+    try:
+        run(script, method, args)
+    finally:
+        report(None if export_path in (None, '1') else export_path)
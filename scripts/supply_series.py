@@ -0,0 +1,229 @@
+from dataclasses import dataclass
+import os
+import sqlite3
+import threading
+
+from .chain_pool import ChainPool
+from .read_client import ReadClient
+from .reward_calculator import (
+    WEEK,
+    YEAR,
+    get_global_history,
+    get_week_epoch,
+    vespa_address_dict,
+)
+
+SERIES_PATH = os.path.join('cache', 'supply_series.sqlite')
+
+# From this many new weeks an update reads the whole global history once
+# instead of locating the point of every week
+FULL_HISTORY_WEEKS = 8
+
+
+@dataclass
+class WeekSupply:
+    """
+    veSPA state of one chain at a week start: totalSupply, the SPA locked
+    (slope * YEAR, as reward_calculator computes it) and the residue of
+    the global point. `final` is False until the week is settled.
+    """
+    vespa: int
+    spa_locked: int
+    residue: int
+    final: bool = True
+
+
+class SupplySeries:
+    """
+    SQLite time series of the weekly veSPA supply, one row per
+    (network, contract, week). Settled weeks are final; the unsettled
+    ones are stored as provisional and read again by the next update.
+    Queries never touch a node.
+    """
+
+    def __init__(self, path=SERIES_PATH):
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.db:
+            # ints are stored as text, they overflow SQLite's INTEGER
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS weekly_supply ('
+                'network TEXT, contract TEXT, week INTEGER, vespa TEXT, '
+                'spa_locked TEXT, residue TEXT, final INTEGER, '
+                'PRIMARY KEY (network, contract, week))'
+            )
+
+    def put(self, network, contract, rows):
+        """Stores {week: WeekSupply}"""
+        with self.lock, self.db:
+            self.db.executemany(
+                'INSERT OR REPLACE INTO weekly_supply '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (
+                        network, contract.lower(), week, str(row.vespa),
+                        str(row.spa_locked), str(row.residue), row.final
+                    )
+                    for week, row in rows.items()
+                ]
+            )
+
+    def first_week(self, network, contract):
+        """The first week stored, or None"""
+        with self.lock:
+            row = self.db.execute(
+                'SELECT MIN(week) FROM weekly_supply '
+                'WHERE network = ? AND contract = ?',
+                (network, contract.lower())
+            ).fetchone()
+        return row[0]
+
+    def last_final_week(self, network, contract):
+        """The last settled week stored, or None"""
+        with self.lock:
+            row = self.db.execute(
+                'SELECT MAX(week) FROM weekly_supply '
+                'WHERE network = ? AND contract = ? AND final = 1',
+                (network, contract.lower())
+            ).fetchone()
+        return row[0]
+
+    def range(self, network, contract, from_week=None, to_week=None):
+        """{week: WeekSupply} of the stored weeks in [from_week, to_week]"""
+        query = (
+            'SELECT week, vespa, spa_locked, residue, final '
+            'FROM weekly_supply WHERE network = ? AND contract = ?'
+        )
+        params = [network, contract.lower()]
+        if from_week is not None:
+            query += ' AND week >= ?'
+            params.append(from_week)
+        if to_week is not None:
+            query += ' AND week <= ?'
+            params.append(to_week)
+        with self.lock:
+            rows = self.db.execute(query + ' ORDER BY week', params)
+            return {
+                week: WeekSupply(
+                    int(vespa), int(spa_locked), int(residue), bool(final)
+                )
+                for week, vespa, spa_locked, residue, final in rows
+            }
+
+    def get(self, network, contract, week):
+        return self.range(network, contract, week, week).get(week)
+
+
+def fetch_weeks(reader, vespa, weeks):
+    """
+    {week: (totalSupply, slope * YEAR, residue)} of `vespa` at every week
+    in `weeks`, read at the pinned block. Few weeks are located one by
+    one in the week -> epoch index, many with one global history read.
+    """
+    reader.pin()
+    if len(weeks) >= FULL_HISTORY_WEEKS:
+        engine = get_global_history(reader, vespa, max(weeks))
+        return {
+            week: (
+                engine.totalSupply(week),
+                engine.global_point(week).slope * YEAR,
+                engine.global_point(week).residue,
+            )
+            for week in weeks
+        }
+    epoch = reader.call([(vespa, 'epoch', ())])[0]
+    epochs = [get_week_epoch(reader, vespa, week, epoch) for week in weeks]
+    results = reader.call(
+        [(vespa, 'pointHistory', (e,)) for e in epochs] +
+        [(vespa, 'totalSupply', (week,)) for week in weeks]
+    )
+    points, supplies = results[:len(weeks)], results[len(weeks):]
+    return {
+        week: (supply, point[1] * YEAR, point[2])
+        for week, point, supply in zip(weeks, points, supplies)
+    }
+
+
+def update_chain(client, series):
+    """
+    Adds the weeks of `client`'s veSPA missing from `series`, from the
+    last settled week stored (or the first week after genesis) to the
+    week of the head block. Returns the number of weeks read.
+    """
+    reader, vespa = client.reader, client.vespa
+    reader.pin()
+    last = series.last_final_week(client.network_name, vespa.address)
+    if last is None:
+        genesis_ts = reader.call([(vespa, 'pointHistory', (0,))], True)[0][3]
+        start = -(-genesis_ts // WEEK) * WEEK
+    else:
+        start = last + WEEK
+    head_week = (reader.block_timestamp // WEEK) * WEEK
+    weeks = list(range(start, head_week + 1, WEEK))
+    if not weeks:
+        return 0
+    series.put(client.network_name, vespa.address, {
+        week: WeekSupply(supply, spa_locked, residue,
+                         reader.is_settled(week))
+        for week, (supply, spa_locked, residue) in fetch_weeks(
+            reader, vespa, weeks
+        ).items()
+    })
+    return len(weeks)
+
+
+def _update_connection(connection, series, cache):
+    # ChainPool worker of update_series
+    return update_chain(ReadClient.from_connection(connection, cache), series)
+
+
+def update_series(series, cache=None, network_names=None):
+    """
+    Brings the series of every network in vespa_address_dict up to date,
+    all chains in parallel. Returns {network: weeks read}.
+    """
+    pool = ChainPool(network_names or vespa_address_dict.keys())
+    return pool.map(_update_connection, series, cache)
+
+
+def get_history(series, weeks, network_names=None):
+    """
+    {network: {week: (spa_locked, vespa)}} of `weeks` from the series,
+    zero before genesis. Weeks not stored yet are left out.
+    """
+    history = {}
+    for network_name in network_names or vespa_address_dict:
+        contract = vespa_address_dict[network_name]
+        rows = series.range(network_name, contract, min(weeks), max(weeks))
+        first = series.first_week(network_name, contract)
+        history[network_name] = {}
+        for week in weeks:
+            if week in rows:
+                row = rows[week]
+                history[network_name][week] = (row.spa_locked, row.vespa)
+            elif first is not None and week < first:
+                history[network_name][week] = (0, 0)
+    return history
+
+
+def main(from_week=None, to_week=None):
+    # brownie run scripts/supply_series.py main [from_week] [to_week]
+    series = SupplySeries()
+    for network_name, count in update_series(series).items():
+        print(f'{network_name}: {count} weeks read')
+    for network_name, contract in vespa_address_dict.items():
+        print(network_name)
+        print(f'{"week":<12}{"veSPA":>30}{"SPA locked":>36}{"residue":>30}')
+        rows = series.range(
+            network_name, contract,
+            None if from_week is None else int(from_week),
+            None if to_week is None else int(to_week),
+        )
+        for week, row in rows.items():
+            print(
+                f'{week:<12}{row.vespa:>30}{row.spa_locked:>36}'
+                f'{row.residue:>30}' + ('' if row.final else ' *')
+            )
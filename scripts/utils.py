@@ -4,9 +4,8 @@ from brownie import (
 )
 import click
 import sys
-import time
-import json
-import os
+
+from .registry import registry
 
 
 def signal_handler(signal, frame):
@@ -76,26 +75,7 @@ def onlyDevelopment(func):
         func()  # can also just return t/f
 
 
-def getConstantsFromNetwork(testnetAddr, mainnetAddr):
-    """
-    Checks if network is in the list of testnets
-    If so, returns testnet address
-    If not, returns mainnet address
-    """
-    testnets = [
-        'arbitrum-rinkeby',
-        'rinkeby'
-    ]
-    if network.show_active() in testnets:
-        return testnetAddr
-    return mainnetAddr
-
-
 def save_deployment_artifacts(data):
-    # Function to store deployment artifacts
-    path = os.path.join('deployed', network.show_active())
-    os.makedirs(path, exist_ok=True)
-    file = os.path.join(path, time.strftime('%m-%d-%Y_%H:%M:%S') + '.json')
-    with open(file, 'w') as json_file:
-        json.dump(data, json_file, indent=4, sort_keys=True)
+    # Function to store deployment artifacts, indexed by the registry
+    file = registry.record(data, network.show_active())
     print(f'Artifacts stored at: {file}')
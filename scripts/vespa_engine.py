@@ -0,0 +1,506 @@
+from bisect import bisect_right
+from collections import defaultdict
+from dataclasses import dataclass, replace
+
+# Constants of veSPA_v1
+WEEK = 7 * 86400
+MAX_TIME = 4 * 365 * 86400
+MIN_TIME = WEEK
+MULTIPLIER = 10 ** 18
+I_YEAR = 365 * 86400
+I_MIN_TIME = WEEK
+
+# veSPA_v1.ActionType
+DEPOSIT_FOR = 0
+CREATE_LOCK = 1
+INCREASE_AMOUNT = 2
+INCREASE_LOCK_TIME = 3
+INITIATE_COOLDOWN = 4
+
+
+class Revert(Exception):
+    """Raised where the contract would revert, with the same reason"""
+
+
+def int128(value):
+    # Solidity explicit conversion to int128 (two's complement wrap)
+    value &= (1 << 128) - 1
+    if value >= 1 << 127:
+        value -= 1 << 128
+    return value
+
+
+def sdiv(a, b):
+    # Solidity signed division truncates towards zero
+    q = abs(a) // abs(b)
+    return q if (a >= 0) == (b >= 0) else -q
+
+
+def require(condition, reason=''):
+    if not condition:
+        raise Revert(reason)
+
+
+@dataclass
+class Point:
+    bias: int = 0
+    slope: int = 0
+    residue: int = 0
+    ts: int = 0
+    blk: int = 0
+
+
+@dataclass
+class LockedBalance:
+    autoCooldown: bool = False
+    cooldownInitiated: bool = False
+    amount: int = 0
+    end: int = 0
+
+
+def user_point(deposit, ts):
+    # Slope, bias and residue of a deposit; moves deposit.end back
+    # one week for locks without cooldown, like the contract does
+    # on its memory copy
+    point = Point()
+    if deposit.amount > 0:
+        amt = int128(deposit.amount)
+        if not deposit.cooldownInitiated:
+            point.residue = sdiv(amt * I_MIN_TIME, I_YEAR)
+            deposit.end -= WEEK
+        if deposit.end > ts:
+            point.slope = sdiv(amt, I_YEAR)
+            point.bias = point.slope * int128(deposit.end - ts)
+    return point
+
+
+def locked_after_event(existing, args):
+    """
+    LockedBalance of the provider after a UserCheckpoint event with
+    `args`, given its LockedBalance before the event.
+    """
+    action = args['actionType']
+    if action == CREATE_LOCK:
+        enable_cooldown = args['autoCooldown']
+    elif action == INITIATE_COOLDOWN:
+        enable_cooldown = True
+    else:
+        enable_cooldown = existing.cooldownInitiated
+    # The emitted locktime was moved back one week by _checkpoint
+    # for deposits which are not in cooldown
+    end = args['locktime']
+    if not enable_cooldown:
+        end += WEEK
+    return LockedBalance(
+        args['autoCooldown'], enable_cooldown,
+        existing.amount + args['value'], end
+    )
+
+
+def decay(point, ts):
+    # bias - slope * dt, clamped at zero, plus the residue
+    bias = point.bias - point.slope * int128(ts - point.ts)
+    if bias < 0:
+        bias = 0
+    return bias + point.residue
+
+
+class VeSPAEngine:
+    """
+    Pure-Python replica of the veSPA_v1 storage and accounting.
+
+    State can be built by replaying the contract events (`apply_event`)
+    or by calling the mutating functions directly with the block
+    timestamp / number they are executed at. View functions answer the
+    same queries as the contract without any RPC.
+    """
+
+    def __init__(self, genesis_ts, genesis_blk):
+        # pointHistory[0] as written by `initialize`
+        self.epoch = 0
+        self.pointHistory = [Point(0, 0, 0, genesis_ts, genesis_blk)]
+        self.slopeChanges = defaultdict(int)
+        self.lockedBalances = defaultdict(LockedBalance)
+        self.userPointHistory = defaultdict(lambda: [Point()])
+        self.totalSPALocked = 0
+        self.head_ts = genesis_ts
+        self.head_blk = genesis_blk
+        self._global_ts = [genesis_ts]
+        self._global_blk = [genesis_blk]
+        self._user_ts = defaultdict(lambda: [0])
+
+    @classmethod
+    def from_global_history(cls, points, slope_changes):
+        """
+        Engine holding only the global state read from the contract:
+        `points` is pointHistory(0..epoch) as (bias, slope, residue, ts,
+        blk) tuples and `slope_changes` a {week: slopeChanges(week)} dict
+        covering the weeks supply queries walk through. Enough for
+        totalSupply / totalSupplyAt, not for user views.
+        """
+        engine = cls(*points[0][3:5])
+        for epoch, point in enumerate(points[1:], 1):
+            engine._set_point(epoch, Point(*point))
+        engine.epoch = len(points) - 1
+        engine.slopeChanges.update(slope_changes)
+        engine.head_ts, engine.head_blk = points[-1][3:5]
+        return engine
+
+    def userPointEpoch(self, addr):
+        return len(self.userPointHistory[addr]) - 1
+
+    def lockedEnd(self, addr):
+        return self.lockedBalances[addr].end
+
+    def _advance(self, ts, blk):
+        require(ts >= self.head_ts, 'Events must be applied in order')
+        self.head_ts = ts
+        self.head_blk = blk
+
+    def _set_point(self, epoch, point):
+        point = replace(point)
+        if epoch == len(self.pointHistory):
+            self.pointHistory.append(point)
+            self._global_ts.append(point.ts)
+            self._global_blk.append(point.blk)
+        else:
+            self.pointHistory[epoch] = point
+            self._global_ts[epoch] = point.ts
+            self._global_blk[epoch] = point.blk
+
+    def _update_global_point(self, ts, blk):
+        _epoch = self.epoch
+        last_point = Point(0, 0, 0, ts, blk)
+        initial_last_point = Point(0, 0, 0, ts, blk)
+        if _epoch > 0:
+            last_point = replace(self.pointHistory[_epoch])
+            initial_last_point = replace(self.pointHistory[_epoch])
+        last_checkpoint = last_point.ts
+
+        block_slope = 0
+        if ts > last_point.ts:
+            block_slope = (
+                (MULTIPLIER * (blk - last_point.blk)) //
+                (ts - last_point.ts)
+            )
+
+        ti = (last_checkpoint // WEEK) * WEEK
+        for i in range(255):
+            ti += WEEK
+            d_slope = 0
+            if ti > ts:
+                ti = ts
+            else:
+                d_slope = self.slopeChanges.get(ti, 0)
+            last_point.bias -= (
+                last_point.slope * int128(ti - last_checkpoint)
+            )
+            last_point.slope += d_slope
+            if last_point.bias < 0:
+                last_point.bias = 0
+            if last_point.slope < 0:
+                last_point.slope = 0
+
+            last_checkpoint = ti
+            last_point.ts = ti
+            last_point.blk = (
+                initial_last_point.blk +
+                (block_slope * (ti - initial_last_point.ts)) // MULTIPLIER
+            )
+            _epoch += 1
+            if ti == ts:
+                last_point.blk = blk
+                self._set_point(_epoch, last_point)
+                break
+            self._set_point(_epoch, last_point)
+
+        self.epoch = _epoch
+        return last_point
+
+    def _checkpoint(self, addr, old_deposit, new_deposit, ts, blk):
+        old_deposit = replace(old_deposit)
+        new_deposit = replace(new_deposit)
+        u_old = user_point(old_deposit, ts)
+        u_new = Point()
+        if new_deposit.end > ts and new_deposit.amount > 0:
+            u_new = user_point(new_deposit, ts)
+
+        d_slope_old = self.slopeChanges.get(old_deposit.end, 0)
+        d_slope_new = 0
+        if new_deposit.end != 0:
+            d_slope_new = self.slopeChanges.get(new_deposit.end, 0)
+
+        last_point = self._update_global_point(ts, blk)
+        last_point.slope += u_new.slope - u_old.slope
+        last_point.bias += u_new.bias - u_old.bias
+        last_point.residue += u_new.residue - u_old.residue
+        if last_point.slope < 0:
+            last_point.slope = 0
+        if last_point.bias < 0:
+            last_point.bias = 0
+        self._set_point(self.epoch, last_point)
+
+        if old_deposit.end > ts:
+            d_slope_old += u_old.slope
+            if new_deposit.end == old_deposit.end:
+                d_slope_old -= u_new.slope
+            self.slopeChanges[old_deposit.end] = d_slope_old
+
+        if new_deposit.end > ts:
+            if new_deposit.end > old_deposit.end:
+                d_slope_new -= u_new.slope
+                self.slopeChanges[new_deposit.end] = d_slope_new
+
+        u_new.ts = ts
+        u_new.blk = blk
+        self.userPointHistory[addr].append(u_new)
+        self._user_ts[addr].append(ts)
+        # The end emitted in UserCheckpoint is the adjusted one
+        return new_deposit.end
+
+    def _deposit_for(
+        self, addr, auto_cooldown, enable_cooldown, value, unlock_time,
+        old_deposit, ts, blk
+    ):
+        self._advance(ts, blk)
+        new_deposit = replace(self.lockedBalances[addr])
+        self.totalSPALocked += value
+        new_deposit.amount += value
+        new_deposit.autoCooldown = auto_cooldown
+        new_deposit.cooldownInitiated = enable_cooldown
+        if unlock_time != 0:
+            new_deposit.end = unlock_time
+        self.lockedBalances[addr] = replace(new_deposit)
+        return self._checkpoint(addr, old_deposit, new_deposit, ts, blk)
+
+    # ---------------------- Mutating functions ----------------------
+
+    def checkpoint(self, ts, blk):
+        self._advance(ts, blk)
+        self._update_global_point(ts, blk)
+
+    def depositFor(self, addr, value, ts, blk):
+        existing = replace(self.lockedBalances[addr])
+        require(value > 0, 'Cannot deposit 0 tokens')
+        require(existing.amount > 0, 'No existing lock')
+        if not existing.autoCooldown:
+            require(
+                not existing.cooldownInitiated,
+                'Cannot deposit during cooldown'
+            )
+        require(existing.end > ts, 'Lock expired. Withdraw')
+        return self._deposit_for(
+            addr, existing.autoCooldown, existing.cooldownInitiated,
+            value, 0, existing, ts, blk
+        )
+
+    def createLock(self, addr, value, unlock_time, auto_cooldown, ts, blk):
+        rounded_unlock_time = (unlock_time // WEEK) * WEEK
+        existing = replace(self.lockedBalances[addr])
+        require(value > 0, 'Cannot lock 0 tokens')
+        require(existing.amount == 0, 'Withdraw old tokens first')
+        require(rounded_unlock_time > ts, 'Cannot lock in the past')
+        require(
+            rounded_unlock_time <= ts + MAX_TIME,
+            'Voting lock can be 4 years max'
+        )
+        return self._deposit_for(
+            addr, auto_cooldown, auto_cooldown, value, rounded_unlock_time,
+            existing, ts, blk
+        )
+
+    def increaseAmount(self, addr, value, ts, blk):
+        existing = replace(self.lockedBalances[addr])
+        require(value > 0, 'Cannot deposit 0 tokens')
+        require(existing.amount > 0, 'No existing lock found')
+        if not existing.autoCooldown:
+            require(
+                not existing.cooldownInitiated,
+                'Cannot deposit during cooldown'
+            )
+        require(existing.end > ts, 'Lock expired. Withdraw')
+        return self._deposit_for(
+            addr, existing.autoCooldown, existing.cooldownInitiated,
+            value, 0, existing, ts, blk
+        )
+
+    def increaseUnlockTime(self, addr, unlock_time, ts, blk):
+        existing = replace(self.lockedBalances[addr])
+        rounded_unlock_time = (unlock_time // WEEK) * WEEK
+        require(existing.amount > 0, 'No existing lock found')
+        if not existing.autoCooldown:
+            require(
+                not existing.cooldownInitiated,
+                'Deposit is in cooldown'
+            )
+        require(existing.end > ts, 'Lock expired. Withdraw')
+        require(
+            rounded_unlock_time > existing.end,
+            'Can only increase lock duration'
+        )
+        require(
+            rounded_unlock_time <= ts + MAX_TIME,
+            'Voting lock can be 4 years max'
+        )
+        return self._deposit_for(
+            addr, existing.autoCooldown, existing.cooldownInitiated,
+            0, rounded_unlock_time, existing, ts, blk
+        )
+
+    def initiateCooldown(self, addr, ts, blk):
+        existing = replace(self.lockedBalances[addr])
+        require(existing.amount > 0, 'No existing lock found')
+        require(
+            not existing.cooldownInitiated,
+            'Cooldown already initiated'
+        )
+        require(
+            ts >= existing.end - MIN_TIME,
+            'Can not initiate cool down'
+        )
+        rounded_unlock_time = ((ts + MIN_TIME) // WEEK) * WEEK
+        return self._deposit_for(
+            addr, existing.autoCooldown, True, 0, rounded_unlock_time,
+            existing, ts, blk
+        )
+
+    def withdraw(self, addr, ts, blk):
+        existing = replace(self.lockedBalances[addr])
+        require(existing.amount > 0, 'No existing lock found')
+        require(existing.cooldownInitiated, 'No cooldown initiated')
+        require(ts >= existing.end, 'Lock not expired.')
+        self._advance(ts, blk)
+        value = existing.amount
+        self.lockedBalances[addr] = LockedBalance()
+        self.totalSPALocked -= value
+        self._checkpoint(addr, existing, LockedBalance(), ts, blk)
+        return value
+
+    # ------------------------ Event replay --------------------------
+
+    def apply_event(self, name, args, ts, blk):
+        """
+        Applies a veSPA_v1 event emitted in a block with timestamp `ts`
+        and number `blk`. Events must be applied in log order.
+        """
+        if name == 'UserCheckpoint':
+            addr = args['provider']
+            existing = replace(self.lockedBalances[addr])
+            locked = locked_after_event(existing, args)
+            self._deposit_for(
+                addr, locked.autoCooldown, locked.cooldownInitiated,
+                args['value'], locked.end, existing, ts, blk
+            )
+        elif name == 'Withdraw':
+            addr = args['provider']
+            existing = replace(self.lockedBalances[addr])
+            self._advance(ts, blk)
+            self.lockedBalances[addr] = LockedBalance()
+            self.totalSPALocked -= args['value']
+            self._checkpoint(addr, existing, LockedBalance(), ts, blk)
+        elif name == 'GlobalCheckpoint':
+            self.checkpoint(ts, blk)
+
+    # ------------------------ View functions ------------------------
+
+    def _find_user_timestamp_epoch(self, addr, ts):
+        return max(bisect_right(self._user_ts[addr], ts) - 1, 0)
+
+    def _find_global_timestamp_epoch(self, ts):
+        return max(bisect_right(self._global_ts, ts, 1) - 1, 0)
+
+    def _find_block_epoch(self, block_number, max_epoch):
+        return max(
+            bisect_right(self._global_blk, block_number, 1, max_epoch + 1)
+            - 1,
+            0
+        )
+
+    def balanceOf(self, addr, ts=None):
+        if ts is None:
+            ts = self.head_ts
+        _epoch = self._find_user_timestamp_epoch(addr, ts)
+        if _epoch == 0:
+            return 0
+        return decay(self.userPointHistory[addr][_epoch], ts)
+
+    def _block_time(self, block_number, now_ts, now_blk):
+        max_epoch = self.epoch
+        _epoch = self._find_block_epoch(block_number, max_epoch)
+        point0 = self.pointHistory[_epoch]
+        if _epoch < max_epoch:
+            point1 = self.pointHistory[_epoch + 1]
+            d_block = point1.blk - point0.blk
+            dt = point1.ts - point0.ts
+        else:
+            require(block_number >= point0.blk)
+            d_block = block_number - point0.blk
+            dt = now_ts - point0.ts
+        block_time = point0.ts
+        if d_block != 0:
+            block_time += (dt * (block_number - point0.blk)) // d_block
+        return block_time
+
+    def balanceOfAt(self, addr, block_number, now_ts=None, now_blk=None):
+        """
+        `now_ts` / `now_blk` stand for block.timestamp / block.number of
+        the contract call and default to the last applied block.
+        """
+        if now_ts is None:
+            now_ts, now_blk = self.head_ts, self.head_blk
+        blocks = [p.blk for p in self.userPointHistory[addr]]
+        user_epoch = max(bisect_right(blocks, block_number, 1) - 1, 0)
+        u_point = self.userPointHistory[addr][user_epoch]
+        block_time = self._block_time(block_number, now_ts, now_blk)
+        return decay(u_point, block_time)
+
+    def supplyAt(self, point, ts):
+        last_point = replace(point)
+        ti = (last_point.ts // WEEK) * WEEK
+        for i in range(255):
+            ti += WEEK
+            d_slope = 0
+            if ti > ts:
+                ti = ts
+            else:
+                d_slope = self.slopeChanges.get(ti, 0)
+            last_point.bias -= (
+                last_point.slope * int128(ti - last_point.ts)
+            )
+            if ti == ts:
+                break
+            last_point.slope += d_slope
+            last_point.ts = ti
+        if last_point.bias < 0:
+            last_point.bias = 0
+        return last_point.bias + last_point.residue
+
+    def global_point(self, ts):
+        """Last global point at or before `ts`"""
+        return self.pointHistory[self._find_global_timestamp_epoch(ts)]
+
+    def totalSupply(self, ts=None):
+        if ts is None:
+            ts = self.head_ts
+        return self.supplyAt(self.global_point(ts), ts)
+
+    def totalSupplyAt(self, block_number, now_ts=None, now_blk=None):
+        if now_ts is None:
+            now_ts, now_blk = self.head_ts, self.head_blk
+        require(block_number <= now_blk)
+        _epoch = self.epoch
+        target_epoch = self._find_block_epoch(block_number, _epoch)
+        point0 = self.pointHistory[target_epoch]
+        dt = 0
+        if target_epoch < _epoch:
+            point1 = self.pointHistory[target_epoch + 1]
+            dt = (
+                ((block_number - point0.blk) * (point1.ts - point0.ts)) //
+                (point1.blk - point0.blk)
+            )
+        elif point0.blk != now_blk:
+            dt = (
+                ((block_number - point0.blk) * (now_ts - point0.ts)) //
+                (now_blk - point0.blk)
+            )
+        return self.supplyAt(point0, point0.ts + dt)
@@ -0,0 +1,101 @@
+import numpy as np
+
+# Exact non-negative big integer arithmetic on numpy arrays.
+# A wide array is a list of int64 arrays (limbs) holding base 2**32
+# digits, least significant first. Keeping every limb below 2**32 leaves
+# room in int64 for limb * (factor < 2**31) products, carries and borrows.
+LIMB_BITS = 32
+LIMB_MASK = (1 << LIMB_BITS) - 1
+MAX_FACTOR = 1 << 31
+
+
+def n_limbs_for(values):
+    """Number of limbs needed to hold every int of `values`"""
+    max_bits = max((int(v).bit_length() for v in values), default=0)
+    return max(1, -(-max_bits // LIMB_BITS))
+
+
+def from_ints(values, n_limbs):
+    """Splits a sequence of non-negative Python ints into limbs"""
+    values = [int(v) for v in values]
+    if any(v < 0 for v in values):
+        raise ValueError('wide arrays only hold non-negative integers')
+    if any(v >> (LIMB_BITS * n_limbs) for v in values):
+        raise OverflowError(f'values do not fit in {n_limbs} limbs')
+    return [
+        np.fromiter(
+            ((v >> (LIMB_BITS * i)) & LIMB_MASK for v in values),
+            dtype=np.int64,
+            count=len(values)
+        )
+        for i in range(n_limbs)
+    ]
+
+
+def to_ints(limbs):
+    """Joins limbs back into a numpy object array of Python ints"""
+    result = np.zeros(limbs[0].shape, dtype=object)
+    for i, limb in enumerate(limbs):
+        result += limb.astype(object) << (LIMB_BITS * i)
+    return result
+
+
+def zeros(shape, n_limbs):
+    return [np.zeros(shape, dtype=np.int64) for _ in range(n_limbs)]
+
+
+def take(limbs, index):
+    return [limb[index] for limb in limbs]
+
+
+def _pad(limbs, n):
+    return limbs + [np.zeros_like(limbs[0])] * (n - len(limbs))
+
+
+def normalize(limbs):
+    """Propagates carries so that every limb is back below 2**32"""
+    out = []
+    carry = 0
+    for limb in limbs:
+        total = limb + carry
+        out.append(total & LIMB_MASK)
+        carry = total >> LIMB_BITS
+    if np.any(carry):
+        out.append(carry)
+    return out
+
+
+def mul_small(limbs, factor):
+    """limbs * factor, with 0 <= factor < 2**31 (array or scalar)"""
+    out = []
+    carry = 0
+    for limb in limbs:
+        total = limb * factor + carry
+        out.append(total & LIMB_MASK)
+        carry = total >> LIMB_BITS
+    out.append(carry + np.zeros_like(out[0]))
+    return out
+
+
+def add(a, b):
+    n = max(len(a), len(b))
+    return normalize([x + y for x, y in zip(_pad(a, n), _pad(b, n))])
+
+
+def sub_clamp(a, b):
+    """max(a - b, 0)"""
+    n = max(len(a), len(b))
+    out = []
+    borrow = 0
+    for x, y in zip(_pad(a, n), _pad(b, n)):
+        diff = x - y - borrow
+        borrow = diff >> 63  # -1 if negative else 0, arithmetic shift
+        borrow = -borrow
+        out.append(diff + (borrow << LIMB_BITS))
+    positive = borrow == 0
+    return [limb * positive for limb in out]
+
+
+def sum_axis(limbs, axis):
+    """Exact sum along `axis`, for up to 2**31 terms"""
+    return normalize([limb.sum(axis=axis) for limb in limbs])
@@ -8,6 +8,7 @@ from brownie import (
     MockToken,
     ProxyAdmin,
     accounts,
+    chain,
     TransparentUpgradeableProxy,
     Contract,
 )
@@ -16,11 +17,20 @@ import eth_utils
 
 MIN_BALANCE = 1000000000000000000
 GAS_LIMIT = 10000000
+WEEK = 604800
+MAX_TIME = 4 * 365 * 86400
+AMOUNT = 1000000000000000000000
+# Number of users holding a lock in `populated_vespa`
+POPULATED_USERS = 8
 
 load_dotenv()
 
+# Contracts are deployed once per session. Every test runs from a chain
+# snapshot taken after the session fixtures it uses, and reverts to it
+# when done, so tests never see each other's transactions.
 
-@pytest.fixture(scope='module', autouse=True)
+
+@pytest.fixture(scope='session', autouse=True)
 def owner():
     if brownie.network.show_active() == 'arbitrum-rinkeby':
         owner = accounts.add(os.getenv('LOCAL_ACCOUNT_PRIVATE_KEY'))
@@ -32,7 +42,7 @@ def owner():
     return accounts[0]
 
 
-@pytest.fixture(scope='module', autouse=True)
+@pytest.fixture(scope='session', autouse=True)
 def spa(owner):
     if brownie.network.show_active() == 'arbitrum-rinkeby':
         return brownie.Contract.from_abi(
@@ -55,11 +65,7 @@ def mint_and_approve(spa, vespa, account):
     spa.approve(vespa, int(100000 * 10 ** 18), {'from': account})
 
 
-@pytest.fixture(scope='module', autouse=True)
-def vespa(
-    spa,
-    owner
-):
+def deploy_vespa(spa, owner):
     # Deploy the proxy admin contract
     proxy_admin = ProxyAdmin.deploy(
         {'from': owner, 'gas': GAS_LIMIT}
@@ -91,5 +97,95 @@ def vespa(
         {'from': owner, 'gas': GAS_LIMIT}
     )
     mint_and_approve(spa, vespa, owner)
+    return proxy_admin, vespa
+
+
+@pytest.fixture(scope='session')
+def vespa_deployment(spa, owner):
+    return deploy_vespa(spa, owner)
+
+
+@pytest.fixture(scope='session', autouse=True)
+def vespa(vespa_deployment):
+    return vespa_deployment[1]
+
+
+@pytest.fixture(scope='session')
+def proxy_admin(vespa_deployment):
+    return vespa_deployment[0]
 
+
+@pytest.fixture(scope='session')
+def multicall(owner):
+    # Multicall2 used by the batched readers in scripts/
+    return brownie.multicall.deploy({'from': owner})
+
+
+@pytest.fixture(autouse=True)
+def isolation(owner, spa, vespa):
+    if brownie.network.show_active() == 'arbitrum-rinkeby':
+        # No snapshots on live networks
+        yield
+        return
+    chain.snapshot()
+    yield
+    chain.revert()
+
+
+# ------------------------ State factories ------------------------
+
+
+def create_users(spa, vespa, owner, n):
+    """
+    Returns `n` accounts holding SPA approved for `vespa`, starting at
+    accounts[1]. Local accounts are added when the node has too few.
+    """
+    while len(accounts) < n + 1:
+        owner.transfer(accounts.add(), MIN_BALANCE * 10)
+    users = list(accounts[1:n + 1])
+    for user in users:
+        mint_and_approve(spa, vespa, user)
+    return users
+
+
+def create_staggered_locks(vespa, users, step=WEEK * 13, amount=AMOUNT):
+    """
+    User i locks amount * (i + 1) until (i + 1) steps from now (capped at
+    MAX_TIME), with autoCooldown on for even i.
+    """
+    txs = []
+    for i, user in enumerate(users):
+        txs.append(vespa.createLock(
+            amount * (i + 1),
+            chain.time() + min(step * (i + 1), MAX_TIME),
+            i % 2 == 0,
+            {'from': user}
+        ))
+    return txs
+
+
+@pytest.fixture(scope='session')
+def users_factory(spa, owner):
+    """Factory (vespa, n) -> users, see create_users"""
+    def factory(vespa, n):
+        return create_users(spa, vespa, owner, n)
+    return factory
+
+
+@pytest.fixture(scope='session')
+def populated_vespa(spa, owner):
+    """
+    A second veSPA_v1 deployment where POPULATED_USERS users
+    (accounts[1:]) hold staggered locks. Built once per session, tests
+    reuse it without replaying the setup transactions.
+    """
+    vespa = deploy_vespa(spa, owner)[1]
+    create_staggered_locks(
+        vespa, create_users(spa, vespa, owner, POPULATED_USERS)
+    )
     return vespa
+
+
+@pytest.fixture(scope='session')
+def populated_users(populated_vespa):
+    return list(accounts[1:POPULATED_USERS + 1])
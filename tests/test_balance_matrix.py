@@ -0,0 +1,61 @@
+import pytest
+import brownie
+from brownie import chain
+
+from scripts.balance_matrix import UserPoints, balance_matrix, supply_matrix
+from scripts.vespa_engine import VeSPAEngine
+from scripts import wide_int
+
+WEEK = 604800
+AMOUNT = 1000000000000000000000
+
+
+def replay(engine, vespa, tx):
+    for event in tx.events:
+        if event.address != vespa.address:
+            continue
+        args = {key: event[key] for key in event.keys()}
+        engine.apply_event(event.name, args, tx.timestamp, tx.block_number)
+
+
+@pytest.mark.parametrize('split', [True, False])
+def test_matrix_matches_balance_of(spa, vespa, monkeypatch, split):
+    if not split:
+        # force the generic limb path
+        monkeypatch.setattr(
+            'scripts.balance_matrix._fits_split', lambda points: False
+        )
+    engine = VeSPAEngine(*vespa.pointHistory(0)[3:5])
+    users = brownie.accounts[1:5]
+    for i, user in enumerate(users):
+        spa.mint(100000000000000000000000, {'from': user})
+        spa.approve(vespa, int(100000 * 10 ** 18), {'from': user})
+        replay(engine, vespa, vespa.createLock(
+            AMOUNT * (i + 1),
+            chain.time() + WEEK * (3 + 5 * i),
+            i % 2 == 0,
+            {'from': user}
+        ))
+        chain.sleep(WEEK)
+    replay(engine, vespa, vespa.increaseAmount(AMOUNT, {'from': users[3]}))
+    chain.sleep(WEEK * 4)
+    replay(engine, vespa, vespa.withdraw({'from': users[0]}))
+    chain.mine()
+
+    start = (vespa.pointHistory(0)[3] // WEEK) * WEEK
+    weeks = list(range(start, chain.time() + WEEK * 30, WEEK))
+    points = UserPoints.from_engine(engine, list(users))
+    balances = balance_matrix(points, weeks)
+    values = wide_int.to_ints(balances)
+    for i, user in enumerate(users):
+        for j, week in enumerate(weeks):
+            assert values[i, j] == vespa.balanceOf(user, week)
+    supplies = supply_matrix(balances)
+    for j, week in enumerate(weeks):
+        assert supplies[j] == sum(
+            vespa.balanceOf(user, week) for user in users
+        )
+
+    # a subset of the holders, reordered, evaluates the same rows
+    subset = wide_int.to_ints(balance_matrix(points.take([3, 1]), weeks))
+    assert (subset == values[[3, 1]]).all()
@@ -0,0 +1,56 @@
+import numpy as np
+from brownie import chain, web3
+
+from scripts.balance_matrix import UserPoints
+from scripts.batch_reader import BatchReader, BoundContract
+from scripts.block_index import BlockIndex
+
+WEEK = 604800
+AMOUNT = 1000000000000000000000
+
+
+def test_index_matches_contract(vespa, multicall, owner, users_factory):
+    users = users_factory(vespa, 4)
+    start = web3.eth.block_number
+    for i, user in enumerate(users):
+        vespa.createLock(
+            AMOUNT * (i + 1), chain.time() + WEEK * (3 + 5 * i), i % 2 == 0,
+            {'from': user}
+        )
+        chain.sleep(WEEK // 3)
+        chain.mine(5)
+    reader = BatchReader(web3, multicall.address)
+    bound = BoundContract(vespa.address, vespa.abi)
+    index = BlockIndex.from_chain(reader, bound)
+
+    vespa.increaseAmount(AMOUNT, {'from': users[3]})
+    chain.sleep(WEEK * 3)
+    vespa.checkpoint({'from': owner})
+    chain.sleep(WEEK * 2)
+    chain.mine()
+    assert index.update(reader, bound) > 0
+
+    points = UserPoints.from_chain(reader, bound, users)
+    head = web3.eth.block_number
+    blocks = list(range(start, index.blk[-1] + 1))
+    supplies = index.total_supply_at(blocks)
+    balances = index.balances_at(points, blocks)
+    for j, block in enumerate(blocks):
+        assert supplies[j] == vespa.totalSupplyAt(block)
+        for i, user in enumerate(users):
+            assert balances[i, j] == vespa.balanceOfAt(user, block)
+
+    # after the last point the contract extrapolates up to the block of
+    # the call, executed as a transaction to know it
+    tx = vespa.totalSupplyAt.transact(head, {'from': owner})
+    index.now_ts, index.now_blk = tx.timestamp, tx.block_number
+    assert index.total_supply_at([head])[0] == tx.return_value
+    tx = vespa.balanceOfAt.transact(users[1], head, {'from': owner})
+    index.now_ts, index.now_blk = tx.timestamp, tx.block_number
+    assert index.balances_at(points, [head])[1, 0] == tx.return_value
+
+    # supplyAt walking the weekly slope changes after the last point, up
+    # to the head the index was updated at
+    times = [index.ts[-1] + dt for dt in (0, 1, WEEK + 7, 2 * WEEK)]
+    supplies = index.supply_at(np.full(len(times), index.epoch), times)
+    assert list(supplies) == [vespa.totalSupply(t) for t in times]
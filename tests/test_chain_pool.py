@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+from web3 import Web3
+from web3.providers import BaseProvider
+
+from scripts.chain_pool import (
+    ChainPool,
+    get_network_config,
+    get_network_hosts,
+)
+
+MULTICALL = '0x842eC2c7D803033Edf55E478F461FC547Bc54EB2'
+
+NETWORK_CONFIG = f"""
+development:
+  - name: Ganache-CLI
+    id: development
+    cmd: ganache-cli
+    host: http://127.0.0.1
+live:
+  - name: Arbitrum
+    networks:
+      - name: Mainnet
+        id: arbitrum-one
+        chainid: 42161
+        host: https://arb1.example.org/$ARBITRUM_KEY
+        multicall2: '{MULTICALL}'
+  - name: Ethereum
+    networks:
+      - name: Mainnet
+        id: mainnet
+        chainid: 1
+        host: https://mainnet.example.org
+        multicall2: '{MULTICALL}'
+"""
+
+
+class StubProvider(BaseProvider):
+    """Answers eth_chainId with `chain_id`, after `barrier` if given"""
+
+    def __init__(self, chain_id, barrier=None):
+        super().__init__()
+        self.chain_id = chain_id
+        self.barrier = barrier
+
+    def make_request(self, method, params):
+        if self.barrier is not None:
+            self.barrier.wait(timeout=5)
+        return {'jsonrpc': '2.0', 'id': 1, 'result': hex(self.chain_id)}
+
+
+@pytest.fixture
+def config_path(tmp_path, monkeypatch):
+    monkeypatch.setenv('ARBITRUM_KEY', 'key')
+    path = tmp_path / 'network-config.yaml'
+    path.write_text(NETWORK_CONFIG)
+    return str(path)
+
+
+def test_network_config(config_path):
+    assert get_network_config('arbitrum-one', config_path)['chainid'] == (
+        42161
+    )
+    assert get_network_config('development', config_path)['cmd'] == (
+        'ganache-cli'
+    )
+    with pytest.raises(ValueError):
+        get_network_config('rinkeby', config_path)
+    assert get_network_hosts(config_path) == {
+        'http://127.0.0.1': 'development',
+        'https://arb1.example.org/key': 'arbitrum-one',
+        'https://mainnet.example.org': 'mainnet',
+    }
+
+
+def test_map(config_path):
+    pool = ChainPool(['arbitrum-one', 'mainnet'], path=config_path)
+    assert pool['mainnet'].multicall_address == MULTICALL
+    # both chains are in flight at once, or the barrier times out
+    barrier = threading.Barrier(2)
+    for name, chain_id in (('arbitrum-one', 42161), ('mainnet', 1)):
+        pool[name].w3 = Web3(StubProvider(chain_id, barrier))
+    assert pool.map(
+        lambda connection, offset: connection.w3.eth.chain_id + offset, 1
+    ) == {'arbitrum-one': 42162, 'mainnet': 2}
+
+    def fail(connection):
+        if connection.network_name == 'mainnet':
+            raise KeyError(connection.network_name)
+        return connection.w3.eth.chain_id
+
+    pool['arbitrum-one'].w3 = Web3(StubProvider(42161))
+    pool['mainnet'].w3 = Web3(StubProvider(1))
+    with pytest.raises(KeyError, match='mainnet'):
+        pool.map(fail)
+
+
+def test_missing_multicall(config_path):
+    with pytest.raises(ValueError, match='multicall2'):
+        ChainPool(['arbitrum-one', 'development'], path=config_path)
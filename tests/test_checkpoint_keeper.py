@@ -0,0 +1,71 @@
+import brownie
+
+from scripts.checkpoint_keeper import (
+    MAX_BACKFILL_WEEKS,
+    WEEK_GAS,
+    BackfillModel,
+    assess,
+)
+from scripts.gas_benchmark import fund, measure, populate
+
+WEEK = 604800
+
+
+def test_model_predicts_checkpoint_gas(spa, vespa):
+    user = brownie.accounts[6]
+    populate(spa, vespa, brownie.accounts[1:6])
+    fund(spa, vespa, user)
+    model = BackfillModel({
+        weeks: measure(vespa, 'checkpoint', user, weeks)
+        for weeks in (0, 10, 52)
+    })
+    for weeks in (26, 80):
+        predicted = int(model.gas(weeks))
+        assert abs(measure(vespa, 'checkpoint', user, weeks) - predicted) < (
+            predicted * 0.05
+        )
+
+
+def test_assess():
+    model = BackfillModel({0: 50000, 10: 350000, 52: 1610000})
+    assert model.backfill(0) == 0
+    assert model.backfill(5) == 150000
+    # extrapolated past the baseline, flat past the backfill limit
+    assert model.gas(100) == 1610000 + 48 * 30000
+    assert model.gas(MAX_BACKFILL_WEEKS + 10) == model.gas(MAX_BACKFILL_WEEKS)
+
+    ts = 2700 * WEEK
+    status = {
+        'epoch': 7, 'last_checkpoint': ts + 3600,
+        'timestamp': ts + 12 * WEEK, 'gas_price': 10 ** 9,
+    }
+    result = assess(status, model, threshold=500000, horizon=[0, 4])
+    assert result['idle_weeks'] == 12
+    assert result['backfill_gas'] == 360000
+    assert result['curve'] == {
+        0: (12, 360000, 360000 * 10 ** 9),
+        4: (16, 480000, 480000 * 10 ** 9),
+    }
+    # 17 weeks cross 500000 gas
+    assert result['weeks_to_threshold'] == 5
+    assert not result['checkpoint']
+    assert assess(status, model, threshold=300000)['checkpoint']
+
+    # close to the limit whatever the threshold
+    status['last_checkpoint'] = ts - (MAX_BACKFILL_WEEKS - 12) * WEEK
+    assert assess(status, model, threshold=10 ** 9)['checkpoint']
+
+
+def test_model_from_estimate():
+    # through the node's estimate, WEEK_GAS per week without a baseline
+    model = BackfillModel.from_estimate(12, 1100000)
+    assert model.gas(12) == 1100000
+    assert model.backfill(12) == 12 * WEEK_GAS
+    # shaped like the calibration otherwise
+    calibration = BackfillModel({0: 50000, 10: 350000, 52: 1610000})
+    model = BackfillModel.from_estimate(10, 400000, calibration)
+    assert model.gas(10) == 400000
+    assert model.backfill(52) == calibration.backfill(52)
+    assert model.gas(100) - model.gas(52) == (
+        calibration.gas(100) - calibration.gas(52)
+    )
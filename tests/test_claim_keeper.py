@@ -0,0 +1,82 @@
+from scripts.balance_matrix import UserPoints
+from scripts.claim_keeper import (
+    claim_gas,
+    find_backlogs,
+    plan_claims,
+)
+from scripts.claim_simulator import RewardSimulator
+from scripts.vespa_engine import MAX_TIME, VeSPAEngine
+
+WEEK = 604800
+AMOUNT = 1000000000000000000000
+
+
+def build(n_weeks=70):
+    ts = WEEK * 2700
+    engine = VeSPAEngine(ts, 1)
+    users = ['early', 'late', 'claimed', 'small']
+    for i, user in enumerate(users):
+        engine.createLock(
+            user, AMOUNT * (i + 1), ts + MAX_TIME, True, ts + 3600, 2 + i
+        )
+    simulator = RewardSimulator(ts, maxIterations=50)
+    balance = 0
+    for week in range(1, n_weeks + 1):
+        balance += AMOUNT
+        simulator.checkpointReward(
+            balance, ts + week * WEEK + 1, engine.totalSupply
+        )
+    last = (simulator.lastRewardCheckpointTime // WEEK) * WEEK
+    # `late` claimed up to 30 weeks ago, `claimed` up to last week
+    simulator.timeCursorOf['late'] = last - 30 * WEEK
+    simulator.timeCursorOf['claimed'] = last - WEEK
+    simulator.timeCursorOf['small'] = last - 47 * WEEK
+    return simulator, UserPoints.from_engine(engine, users)
+
+
+def test_find_backlogs():
+    simulator, points = build()
+    backlogs = find_backlogs(simulator, points, min_weeks=26, cap_margin=4)
+    by_addr = {backlog.addr: backlog for backlog in backlogs}
+    # `claimed` is up to date; the others are large or close to the cap
+    assert [backlog.addr for backlog in backlogs] == [
+        'early', 'small', 'late'
+    ]
+    early = by_addr['early']
+    # the first deposit is inside week 0, the last checkpoint in week 70
+    assert early.pending == 69
+    # beyond maxIterations: two claims, the first one initializes
+    assert early.claims == [
+        (50, claim_gas(50, False)), (19, claim_gas(19, True))
+    ]
+    assert by_addr['late'].claims == [(30, claim_gas(30, True))]
+    # within cap_margin of maxIterations even above min_weeks
+    assert [
+        backlog.addr for backlog in find_backlogs(
+            simulator, points, min_weeks=60, cap_margin=4
+        )
+    ] == ['early', 'small']
+
+    # the pending amount is what repeated claims pay out
+    claims = simulator.claim(points)
+    claims_again = simulator.claim(points)
+    assert early.amount == (
+        claims['early'].amount + claims_again['early'].amount
+    )
+    assert by_addr['small'].amount == claims['small'].amount
+
+
+def test_plan_claims_budget():
+    simulator, points = build()
+    backlogs = find_backlogs(simulator, points)
+    budget = sum(gas for _, gas in backlogs[0].claims[:1]) + 100000
+    planned, spent = plan_claims(backlogs, budget, checkpoint=50000)
+    assert spent <= budget
+    # the largest backlog first, the rest of the budget to the next ones
+    assert planned[0] == (backlogs[0], 0)
+    assert all(backlog is not backlogs[0] or i == 0
+               for backlog, i in planned)
+
+    planned, spent = plan_claims(backlogs, 10 ** 9)
+    assert len(planned) == sum(len(backlog.claims) for backlog in backlogs)
+    assert spent == sum(backlog.gas for backlog in backlogs)
@@ -0,0 +1,136 @@
+import random
+
+import pytest
+
+from scripts.balance_matrix import UserPoints
+from scripts.claim_simulator import RewardSimulator
+from scripts.vespa_engine import MAX_TIME, Revert, VeSPAEngine
+
+WEEK = 604800
+
+
+def claim_reference(engine, simulator, addr, max_iterations):
+    # Straight port of _computeRewards / _initializeUser, one user at a time
+    week_cursor = simulator.timeCursorOf.get(addr, 0)
+    if week_cursor == 0:
+        points = engine.userPointHistory[addr]
+        if len(points) == 1:
+            return 'User has no deposit'
+        user_epoch = 1
+        for epoch in range(1, len(points)):
+            if points[epoch].ts <= simulator.startTime:
+                user_epoch = epoch
+        week_cursor = ((points[user_epoch].ts + WEEK - 1) // WEEK) * WEEK
+        week_cursor = max(week_cursor, simulator.startTime)
+    last = (simulator.lastRewardCheckpointTime // WEEK) * WEEK
+    amount = 0
+    for _ in range(max_iterations):
+        if week_cursor >= last:
+            break
+        balance = engine.balanceOf(addr, week_cursor)
+        if balance > 0:
+            supply = simulator.veSPASupply.get(week_cursor, 0)
+            if supply == 0:
+                return 'division by zero'
+            amount += (
+                balance * simulator.rewardsPerWeek.get(week_cursor, 0)
+            ) // supply
+        week_cursor += WEEK
+    return week_cursor, amount
+
+
+@pytest.fixture(scope='module')
+def history():
+    random.seed(6)
+    ts = WEEK * 2700 + 1234
+    blk = 1
+    engine = VeSPAEngine(ts, blk)
+    users = [f'user{i}' for i in range(40)]
+    simulator = RewardSimulator(ts + 5 * WEEK)
+    balance = 0
+    for _ in range(1000):
+        ts += random.randint(0, WEEK // 4)
+        blk += 1
+        user = random.choice(users)
+        action = random.randint(0, 4)
+        try:
+            if action == 0:
+                engine.createLock(
+                    user, random.randint(10 ** 18, 10 ** 24),
+                    ts + random.randint(WEEK, MAX_TIME),
+                    random.random() < 0.5, ts, blk
+                )
+            elif action == 1:
+                engine.increaseAmount(
+                    user, random.randint(1, 10 ** 23), ts, blk
+                )
+            elif action == 2:
+                engine.initiateCooldown(user, ts, blk)
+            elif action == 3:
+                engine.withdraw(user, ts, blk)
+            elif ts > simulator.startTime and random.random() < 0.5:
+                engine.checkpoint(ts, blk)
+                balance += random.randint(1, 10 ** 22)
+                simulator.checkpointReward(balance, ts, engine.totalSupply)
+        except Revert:
+            pass
+    return engine, simulator, users + ['no_deposit']
+
+
+@pytest.mark.parametrize('max_iterations', [1, 7, 50, 1000])
+def test_compute_rewards_matches_reference(history, max_iterations):
+    engine, simulator, users = history
+    simulator = RewardSimulator(
+        simulator.startTime,
+        simulator.lastRewardCheckpointTime,
+        maxIterations=max_iterations,
+        rewardsPerWeek=simulator.rewardsPerWeek,
+        veSPASupply=simulator.veSPASupply,
+    )
+    # some users already claimed a few weeks
+    for user in users[:10:3]:
+        claimed = claim_reference(engine, simulator, user, 3)
+        if not isinstance(claimed, str):
+            simulator.timeCursorOf[user] = claimed[0]
+
+    points = UserPoints.from_engine(engine, users)
+    cursors, amounts, backlogs, errors = simulator.computeRewards(points)
+    last = (simulator.lastRewardCheckpointTime // WEEK) * WEEK
+    for i, user in enumerate(users):
+        expected = claim_reference(engine, simulator, user, max_iterations)
+        if isinstance(expected, str):
+            assert errors[i] == expected
+            continue
+        assert errors[i] is None
+        assert (cursors[i], amounts[i]) == expected
+        assert backlogs[i] == max(0, (last - cursors[i]) // WEEK)
+
+
+def test_claim_updates_cursors(history):
+    engine, simulator, users = history
+    simulator = RewardSimulator(
+        simulator.startTime,
+        simulator.lastRewardCheckpointTime,
+        lastRewardBalance=simulator.lastRewardBalance,
+        maxIterations=10,
+        rewardsPerWeek=simulator.rewardsPerWeek,
+        veSPASupply=simulator.veSPASupply,
+    )
+    points = UserPoints.from_engine(engine, users)
+    paid = 0
+    while True:
+        claims = simulator.claim(points)
+        paid += sum(claim.amount for claim in claims.values())
+        if not any(
+            claim.backlog for claim in claims.values() if claim.error is None
+        ):
+            break
+    _, amounts, _, _ = RewardSimulator(
+        simulator.startTime,
+        simulator.lastRewardCheckpointTime,
+        maxIterations=10 ** 6,
+        rewardsPerWeek=simulator.rewardsPerWeek,
+        veSPASupply=simulator.veSPASupply,
+    ).computeRewards(points)
+    assert paid == sum(amounts)
+    assert claims['no_deposit'].error == 'User has no deposit'
@@ -0,0 +1,147 @@
+import eth_utils
+import pytest
+from brownie import (
+    Contract,
+    ProxyAdmin,
+    RewardDistributor_v1,
+    TransparentUpgradeableProxy,
+    accounts,
+    chain,
+    veSPA_v1,
+)
+
+from scripts.deploy_pipeline import DeploymentPipeline, call, create
+
+
+def deployment_steps(spa, owner, admin, fail=None):
+    def args(addresses):
+        # simulates a node error while sending `vespa_initialize`
+        if fail:
+            fail.pop()
+            raise ConnectionError('node unavailable')
+        return (spa, 'v0')
+
+    return [
+        create('proxy_admin', admin, ProxyAdmin),
+        create('vespa_base', owner, veSPA_v1),
+        call(
+            'vespa_base_initialize', owner, 'vespa_base', veSPA_v1.abi,
+            'initialize', lambda addresses: (spa, 'v0')
+        ),
+        create(
+            'vespa_proxy', admin, TransparentUpgradeableProxy,
+            lambda addresses: (
+                addresses['vespa_base'],
+                addresses['proxy_admin'],
+                eth_utils.to_bytes(hexstr='0x'),
+            ),
+            deps=['proxy_admin', 'vespa_base']
+        ),
+        call(
+            'vespa_initialize', owner, 'vespa_proxy', veSPA_v1.abi,
+            'initialize', args
+        ),
+        create(
+            'reward_distributor', owner, RewardDistributor_v1,
+            lambda addresses: (chain.time(),)
+        ),
+    ]
+
+
+def check_deployment(addresses, spa):
+    vespa = Contract.from_abi('veSPA', addresses['vespa_proxy'], veSPA_v1.abi)
+    proxy_admin = ProxyAdmin.at(addresses['proxy_admin'])
+    assert vespa.SPA() == spa
+    assert (
+        proxy_admin.getProxyImplementation(vespa) == addresses['vespa_base']
+    )
+    assert RewardDistributor_v1.at(
+        addresses['reward_distributor']
+    ).startTime() > 0
+
+
+def test_pipelined_deployment(spa, tmp_path):
+    owner, admin = accounts[0], accounts[1]
+    journal = str(tmp_path / 'journal.json')
+    pipeline = DeploymentPipeline(
+        deployment_steps(spa, owner, admin), journal, 10000000
+    )
+    waves = pipeline.plan()
+    # the proxy waits for the logic contract of the other account,
+    # the proxy initialize for the proxy
+    assert [[name for name, _, _ in wave] for wave in waves] == [
+        ['proxy_admin', 'vespa_base', 'vespa_base_initialize',
+         'reward_distributor'],
+        ['vespa_proxy'],
+        ['vespa_initialize'],
+    ]
+    predicted = {
+        name: address for wave in waves for name, _, address in wave
+        if address is not None
+    }
+    addresses = pipeline.run()
+    assert addresses == predicted
+    check_deployment(addresses, spa)
+
+
+def test_estimated_steps_wait_for_dependencies(spa, tmp_path):
+    owner, admin = accounts[0], accounts[1]
+    pipeline = DeploymentPipeline(
+        deployment_steps(spa, owner, admin), str(tmp_path / 'journal.json')
+    )
+    # without a gas limit the initialize is estimated once the logic
+    # contract exists
+    assert [[name for name, _, _ in wave] for wave in pipeline.plan()] == [
+        ['proxy_admin', 'vespa_base', 'reward_distributor'],
+        ['vespa_base_initialize', 'vespa_proxy'],
+        ['vespa_initialize'],
+    ]
+    check_deployment(pipeline.run(), spa)
+
+
+def test_resume_after_failure(spa, tmp_path):
+    owner, admin = accounts[0], accounts[1]
+    journal = str(tmp_path / 'journal.json')
+    pipeline = DeploymentPipeline(
+        deployment_steps(spa, owner, admin, fail=[True]), journal, 10000000
+    )
+    with pytest.raises(ConnectionError):
+        pipeline.run()
+    nonce = owner.nonce
+    deployed = pipeline.addresses()
+    assert set(deployed) == {
+        'proxy_admin', 'vespa_base', 'reward_distributor', 'vespa_proxy'
+    }
+
+    # confirmed steps are not sent again
+    pipeline = DeploymentPipeline(
+        deployment_steps(spa, owner, admin), journal, 10000000
+    )
+    assert [[name for name, _, _ in wave] for wave in pipeline.plan()] == [
+        ['vespa_initialize']
+    ]
+    addresses = pipeline.run()
+    assert owner.nonce == nonce + 1
+    assert addresses == deployed
+    check_deployment(addresses, spa)
+
+
+def test_calls_on_existing_contract(spa, vespa, tmp_path):
+    owner = accounts[0]
+    steps = [
+        call(
+            f'approve {i}', owner, 'spa', spa.abi, 'approve',
+            lambda addresses, i=i: (addresses['vespa'], i + 1), gas=100000
+        )
+        for i in range(3)
+    ]
+    pipeline = DeploymentPipeline(
+        steps, str(tmp_path / 'journal.json'),
+        contracts={'spa': spa.address, 'vespa': vespa.address}
+    )
+    # nothing to wait for, every call is sent in one wave
+    assert [[name for name, _, _ in wave] for wave in pipeline.plan()] == [
+        ['approve 0', 'approve 1', 'approve 2']
+    ]
+    pipeline.run()
+    assert spa.allowance(owner, vespa) == 3
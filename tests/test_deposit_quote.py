@@ -0,0 +1,59 @@
+import brownie
+import pytest
+from brownie import chain
+
+from scripts.deposit_quote import estimateDeposit, quote_grid
+from scripts.vespa_engine import MAX_TIME, Revert
+
+WEEK = 604800
+AMOUNTS = [1, 10 ** 18, 123456789 * 10 ** 18 + 7, 2 ** 127 // WEEK]
+
+
+def unlock_offsets():
+    # past, inside the current week, the last week of a lock without
+    # cooldown, a few years, the maximum and beyond it
+    return [-5, 10, WEEK + 3, 3 * WEEK, 150 * WEEK + 1234,
+            MAX_TIME, MAX_TIME + 2 * WEEK]
+
+
+@pytest.mark.parametrize('auto_cooldown', [True, False])
+def test_matches_contract(vespa, owner, auto_cooldown):
+    ts = chain.time()
+    for amount in AMOUNTS:
+        for offset in unlock_offsets():
+            # executed as a transaction to know its block.timestamp
+            try:
+                tx = vespa.estimateDeposit.transact(
+                    auto_cooldown, amount, ts + offset, {'from': owner}
+                )
+            except brownie.exceptions.VirtualMachineError as e:
+                with pytest.raises(Revert, match=e.revert_msg):
+                    estimateDeposit(
+                        auto_cooldown, amount, ts + offset,
+                        chain[-1].timestamp
+                    )
+                continue
+            assert estimateDeposit(
+                auto_cooldown, amount, ts + offset, tx.timestamp
+            ) == tuple(tx.return_value)
+
+    # the grid at a fixed timestamp agrees with the scalar version
+    grid = quote_grid(
+        AMOUNTS, [ts + o for o in unlock_offsets()], auto_cooldown, ts
+    )
+    for i, amount in enumerate(AMOUNTS):
+        for j, offset in enumerate(unlock_offsets()):
+            try:
+                quote = estimateDeposit(auto_cooldown, amount, ts + offset, ts)
+            except Revert:
+                assert not grid['valid'][j]
+                continue
+            assert grid['valid'][j]
+            assert quote[1:6] == (
+                grid['initial_balance'][i, j],
+                grid['slope'][i],
+                grid['bias'][i, j],
+                grid['residue'][i],
+                grid['unlock_time'][j],
+            )
+            assert quote[7] == grid['residue_period_start'][j]
@@ -0,0 +1,83 @@
+from brownie import chain, web3
+
+from scripts.event_indexer import EventIndexer, EventStore, build_engine
+
+WEEK = 604800
+AMOUNT = 1000000000000000000000
+
+
+def workload(vespa, users):
+    for i, user in enumerate(users):
+        vespa.createLock(
+            AMOUNT * (i + 1), chain.time() + WEEK * (3 + 4 * i), i % 2 == 0,
+            {'from': user}
+        )
+        chain.sleep(WEEK // 2)
+    vespa.increaseAmount(AMOUNT, {'from': users[1]})
+    vespa.depositFor(users[2], AMOUNT, {'from': users[0]})
+    chain.sleep(WEEK * 4)
+    vespa.initiateCooldown({'from': users[1]})
+    vespa.withdraw({'from': users[0]})
+    vespa.checkpoint({'from': users[3]})
+
+
+def assert_engine_matches(store, vespa, users):
+    chain.mine()
+    engine = build_engine(
+        store, 'development', vespa.address, *vespa.pointHistory(0)[3:5]
+    )
+    assert engine.epoch == vespa.epoch()
+    assert engine.totalSPALocked == vespa.totalSPALocked()
+    assert engine.totalSupply(chain.time()) == vespa.totalSupply(chain.time())
+    for user in users:
+        assert engine.userPointEpoch(user) == vespa.userPointEpoch(user)
+        assert (
+            engine.balanceOf(user, chain.time()) ==
+            vespa.balanceOf(user, chain.time())
+        )
+
+
+def test_index_and_resume(vespa, users_factory, tmp_path):
+    users = users_factory(vespa, 4)
+    start = web3.eth.block_number + 1
+    workload(vespa, users)
+    store = EventStore(str(tmp_path / 'events.sqlite'))
+    contracts = {vespa.address: ('veSPA', vespa.abi)}
+    # tiny ranges force many chunks
+    indexer = EventIndexer(web3, store, 'development', contracts, start,
+                           chunk=1)
+    first = indexer.sync()
+    assert first > 0
+    assert store.accounts('development', vespa.address) == sorted(
+        str(user) for user in users
+    )
+    assert_engine_matches(store, vespa, users)
+
+    # a new indexer resumes from the stored progress
+    vespa.increaseUnlockTime(chain.time() + WEEK * 30, {'from': users[3]})
+    indexer = EventIndexer(web3, store, 'development', contracts, start)
+    assert indexer.sync() == 2  # UserCheckpoint + Supply
+    assert indexer.sync() == 0
+    assert_engine_matches(store, vespa, users)
+
+
+def test_reorg_rolls_back(vespa, users_factory, tmp_path):
+    users = users_factory(vespa, 4)
+    start = web3.eth.block_number + 1
+    workload(vespa, users)
+    store = EventStore(str(tmp_path / 'events.sqlite'))
+    indexer = EventIndexer(
+        web3, store, 'development', {vespa.address: ('veSPA', vespa.abi)},
+        start
+    )
+    indexer.sync()
+
+    # replace the last block (the checkpoint) with a different history
+    chain.undo()
+    vespa.increaseAmount(AMOUNT, {'from': users[3]})
+    indexer.sync()
+    assert indexer.reorgs == 1
+    names = [e[0] for e in store.events('development', vespa.address)]
+    assert 'GlobalCheckpoint' not in names
+    assert names[-4:] == ['Withdraw', 'Supply', 'UserCheckpoint', 'Supply']
+    assert_engine_matches(store, vespa, users)
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+import brownie
+
+from scripts.gas_benchmark import (
+    IDLE_WEEKS,
+    REGRESSION_THRESHOLD,
+    find_regressions,
+    format_table,
+    fund,
+    load_baseline,
+    populate,
+    run_benchmark,
+    save_baseline,
+)
+
+
+def test_gas_scaling(spa, vespa):
+    user = brownie.accounts[6]
+
+    def setup():
+        populate(spa, vespa, brownie.accounts[1:6])
+        fund(spa, vespa, user)
+
+    results = run_benchmark(vespa, user, setup)
+    baseline = load_baseline()
+    print(format_table(results, baseline))
+
+    # Every entry point pays for the weeks backfilled by _updateGlobalPoint
+    for gas in results.values():
+        assert gas[IDLE_WEEKS[-1]] > gas[IDLE_WEEKS[0]]
+
+    if os.getenv('UPDATE_GAS_BASELINE'):
+        save_baseline(results)
+        pytest.skip('gas baseline recorded')
+    if baseline is None:
+        pytest.fail(
+            'No gas baseline, record it with UPDATE_GAS_BASELINE=1 and '
+            'commit it'
+        )
+    threshold = float(
+        os.getenv('GAS_REGRESSION_THRESHOLD', REGRESSION_THRESHOLD)
+    )
+    assert find_regressions(baseline, results, threshold) == []
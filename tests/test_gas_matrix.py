@@ -0,0 +1,18 @@
+import brownie
+
+from scripts.gas_matrix import VERSIONS, run_matrix, summarize
+
+
+def test_gas_matrix(owner):
+    matrix = run_matrix(owner, brownie.accounts[1:5])
+    assert list(matrix) == list(VERSIONS)
+    labels = set(matrix['veSPA_v1'])
+    # the distributor runs against every implementation
+    assert {'claim', 'checkpointReward'} <= labels
+    for gas in matrix.values():
+        assert set(gas) == labels
+
+    summary = summarize(matrix)
+    # Same logic without the proxy delegatecall is cheaper
+    for label in ('createLock', 'increaseAmount', 'withdraw'):
+        assert summary[label]['veSPA_v1_Non_Upgradeable'][1] < 0
@@ -0,0 +1,35 @@
+from brownie import chain
+
+from scripts.gas_profiler import GasProfile
+
+WEEK = 604800
+AMOUNT = 1000000000000000000000
+
+
+def test_profile_attributes_all_gas(vespa, owner, users_factory):
+    user = users_factory(vespa, 1)[0]
+    vespa.createLock(AMOUNT, chain.time() + WEEK * 30, False, {'from': user})
+    chain.sleep(WEEK * 10)
+    tx = vespa.checkpoint({'from': owner})
+    profile = GasProfile(tx)
+
+    trace = tx.trace
+    assert profile.total == (
+        trace[0]['gas'] - trace[-1]['gas'] + trace[-1]['gasCost']
+    )
+    assert sum(profile.functions.values()) == profile.total
+    assert sum(profile.lines.values()) == profile.total
+    assert sum(profile.stacks.values()) == profile.total
+
+    # the proxy delegates the whole call to the implementation
+    (caller, callee, op), gas = profile.calls.most_common(1)[0]
+    assert op == 'DELEGATECALL'
+    assert callee.startswith('veSPA_v1.')
+    assert gas > profile.total * 0.9
+    assert profile.functions['veSPA_v1._updateGlobalPoint'] > 0
+    # one point per backfilled week
+    assert profile.storage()['SSTORE'][0] >= 10
+    assert any(
+        filename and filename.endswith('veSPA_v1.sol')
+        for _, filename, _ in profile.lines
+    )
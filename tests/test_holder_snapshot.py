@@ -0,0 +1,68 @@
+import csv
+
+from brownie import chain, web3
+
+from scripts.batch_reader import BatchReader, BoundContract
+from scripts.event_indexer import EventIndexer, EventStore
+from scripts.holder_snapshot import block_time, export_snapshot, iter_snapshot
+
+WEEK = 604800
+AMOUNT = 1000000000000000000000
+
+
+def test_snapshot_matches_contract(vespa, multicall, users_factory,
+                                   tmp_path):
+    users = users_factory(vespa, 5)
+    start = web3.eth.block_number + 1
+    for i, user in enumerate(users):
+        vespa.createLock(
+            AMOUNT * (i + 1), chain.time() + WEEK * (3 + 5 * i), i % 2 == 0,
+            {'from': user}
+        )
+        chain.sleep(WEEK)
+    past_block = web3.eth.block_number
+    past_ts = chain.time()
+    vespa.increaseAmount(AMOUNT, {'from': users[3]})
+    chain.sleep(WEEK * 4)
+    vespa.initiateCooldown({'from': users[1]})
+    vespa.withdraw({'from': users[0]})
+    chain.mine()
+
+    store = EventStore(str(tmp_path / 'events.sqlite'))
+    EventIndexer(
+        web3, store, 'development', {vespa.address: ('veSPA', vespa.abi)},
+        start
+    ).sync()
+
+    # past timestamp, batches smaller than the number of holders
+    path = tmp_path / 'snapshot.csv'
+    count = export_snapshot(
+        iter_snapshot(store, 'development', vespa.address, ts=past_ts),
+        str(path), batch_size=2
+    )
+    with open(path) as f:
+        rows = list(csv.DictReader(f))
+    assert count == len(rows) == 5
+    for row in rows:
+        assert int(row['balance']) == vespa.balanceOf(row['address'], past_ts)
+
+    # past block, as balanceOfAt sees it
+    reader = BatchReader(web3, multicall.address)
+    time = block_time(
+        reader, BoundContract(vespa.address, vespa.abi), past_block
+    )
+    rows = iter_snapshot(
+        store, 'development', vespa.address, block=past_block, time=time
+    )
+    for address, balance, *_ in rows:
+        assert balance == vespa.balanceOfAt(address, past_block)
+
+    # now, with the lock state; users[0] withdrew
+    now = chain.time()
+    rows = list(iter_snapshot(store, 'development', vespa.address, ts=now))
+    assert [row[0] for row in rows] == sorted(str(u) for u in users[1:])
+    for address, balance, amount, end, auto_cooldown, cooldown in rows:
+        assert balance == vespa.balanceOf(address, now)
+        assert (auto_cooldown, cooldown, amount, end) == tuple(
+            vespa.lockedBalances(address)
+        )
@@ -0,0 +1,35 @@
+import subprocess
+import sys
+
+from brownie import chain, web3
+
+from scripts.read_client import ReadClient
+
+WEEK = 604800
+
+
+def test_reports_do_not_load_brownie():
+    code = (
+        'import sys, scripts.reward_calculator; '
+        'print("brownie" in sys.modules)'
+    )
+    output = subprocess.check_output([sys.executable, '-c', code])
+    assert output.strip() == b'False'
+
+
+def test_reads_match_contracts(populated_vespa, multicall):
+    vespa = populated_vespa
+    client = ReadClient(
+        'development', web3, multicall.address,
+        addresses={'vespa': vespa.address}
+    )
+    week = (chain.time() // WEEK) * WEEK
+    epoch, supply, point = client.call([
+        (client.vespa, 'epoch', ()),
+        (client.vespa, 'totalSupply', (week,)),
+        (client.vespa, 'pointHistory', (1,)),
+    ])
+    assert epoch == vespa.epoch()
+    assert supply == vespa.totalSupply(week)
+    assert point == tuple(vespa.pointHistory(1))
+    assert client.contract('vespa').epoch() == epoch
@@ -0,0 +1,106 @@
+import json
+import os
+
+import pytest
+
+from scripts.registry import Registry
+
+VESPA_OLD = '0x2e2071180682Ce6C247B1eF93d382D509F5F6A17'
+VESPA_NEW = '0xbF82a3212e13b2d407D10f5107b5C8404dE7F403'
+SPA = '0x5575552988A3A80504bBaeB1311674fCFd40aD4B'
+RD = '0x2c07bc934974BbF413a4a4CeDA98713DCb8d9e16'
+
+
+def write_artifact(path, network_name, name, data):
+    dirname = os.path.join(path, network_name)
+    os.makedirs(dirname, exist_ok=True)
+    with open(os.path.join(dirname, name), 'w') as f:
+        json.dump(data, f)
+
+
+def test_latest_and_pinned(tmp_path):
+    path = str(tmp_path)
+    # artifacts are ordered by the time in their name, not listing order
+    write_artifact(path, 'arbitrum-one', '12-01-2022_10:00:00.json', {
+        'type': 'deployment_reward_distributor', 'vespa': VESPA_NEW,
+        'reward_distributor': RD,
+    })
+    write_artifact(path, 'arbitrum-one', '03-01-2022_10:00:00.json', {
+        'type': 'deployment', 'spa': SPA, 'vespa_proxy': VESPA_OLD,
+    })
+    registry = Registry(path)
+    assert registry.address('vespa_proxy', 'arbitrum-one') == VESPA_NEW
+    # forks resolve to the forked network
+    assert registry.address('spa', 'arbitrum-main-fork') == SPA
+    assert registry.addresses('reward_distributor') == {'arbitrum-one': RD}
+    with pytest.raises(KeyError):
+        registry.address('spa', 'mainnet')
+    # local networks use their own deployments, then arbitrum-one's
+    write_artifact(path, 'development', '12-02-2022_10:00:00.json', {
+        'vespa_proxy': VESPA_OLD,
+    })
+    assert registry.address('spa', 'development') == SPA
+    assert registry.address('vespa', 'development') == VESPA_OLD
+
+    registry.pin('vespa', VESPA_OLD, 'arbitrum-one')
+    assert Registry(path).address('vespa_proxy', 'arbitrum-one') == VESPA_OLD
+    registry.pin('vespa', None, 'arbitrum-one')
+    assert Registry(path).address('vespa_proxy', 'arbitrum-one') == VESPA_NEW
+
+
+def test_new_artifacts_are_indexed(tmp_path):
+    path = str(tmp_path)
+    write_artifact(path, 'mainnet', '03-01-2022_10:00:00.json', {
+        'vespa_proxy': VESPA_OLD,
+    })
+    assert Registry(path).address('vespa_proxy', 'mainnet') == VESPA_OLD
+    # lookups never write the index
+    assert not os.path.exists(os.path.join(path, 'mainnet', 'index.json'))
+
+    # written by another process after the index was built
+    write_artifact(path, 'mainnet', '04-01-2022_10:00:00.json', {
+        'vespa_proxy': VESPA_NEW,
+    })
+    assert Registry(path).address('vespa_proxy', 'mainnet') == VESPA_NEW
+
+    # journals are not artifacts
+    write_artifact(path, 'mainnet', 'deploy_journal.json', {
+        'vespa_proxy': {'address': RD, 'status': 'submitted'},
+    })
+    assert 'deploy_journal.json' not in Registry(path).index('mainnet')[
+        'artifacts'
+    ]
+
+    registry = Registry(path)
+    artifact = registry.record({'vespa_proxy': VESPA_OLD}, 'mainnet')
+    assert os.path.exists(artifact)
+    assert registry.address('vespa_proxy', 'mainnet') == VESPA_OLD
+    with open(os.path.join(path, 'mainnet', 'index.json')) as f:
+        index = json.load(f)
+    assert index['artifacts'][:2] == [
+        '03-01-2022_10:00:00.json', '04-01-2022_10:00:00.json'
+    ]
+    assert index['contracts']['vespa_proxy'] == [VESPA_NEW, VESPA_OLD]
+
+    # the seed is older than any artifact, a rebuild keeps the pins
+    write_artifact(path, 'mainnet', 'seed.json', {'spa': SPA})
+    registry.pin('vespa', VESPA_NEW, 'mainnet')
+    index = Registry(path).rebuild('mainnet')
+    assert index['artifacts'][0] == 'seed.json'
+    assert index['pinned'] == {'vespa_proxy': VESPA_NEW}
+    assert Registry(path).address('spa', 'mainnet') == SPA
+
+
+def test_abi_cache(tmp_path):
+    build_path = tmp_path / 'build'
+    build_path.mkdir()
+    abi = [{'type': 'function', 'name': 'epoch', 'inputs': []}]
+    with open(build_path / 'veSPA_v1.json', 'w') as f:
+        json.dump({'abi': abi, 'bytecode': '0x00'}, f)
+
+    registry = Registry(str(tmp_path / 'deployed'))
+    registry.export_abis(['veSPA_v1'], str(build_path))
+    os.remove(build_path / 'veSPA_v1.json')
+    assert registry.abi('veSPA_v1') == abi
+    with pytest.raises(FileNotFoundError):
+        registry.abi('NotCompiled')
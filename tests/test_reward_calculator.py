@@ -0,0 +1,105 @@
+import brownie
+from brownie import chain, web3
+
+from scripts.batch_reader import BatchReader, BoundContract
+from scripts.history_cache import CachedReader, HistoryCache
+from scripts.reward_calculator import (
+    get_week_data,
+    get_week_epoch,
+    get_weeks_data,
+)
+
+WEEK = 604800
+
+
+def sequential_week_epoch(vespa, time):
+    # Reference: one eth_call per binary search step
+    min_epoch = 0
+    max_epoch = vespa.epoch()
+    for i in range(0, 128):
+        if (min_epoch >= max_epoch):
+            break
+        mid = (min_epoch + max_epoch + 1) // 2
+        if (vespa.pointHistory(mid)[3] <= time):
+            min_epoch = mid
+        else:
+            max_epoch = mid - 1
+    return min_epoch
+
+
+def setup_locks(spa, vespa, n_weeks):
+    for i in range(1, 4):
+        account = brownie.accounts[i]
+        spa.mint(100000000000000000000000, {'from': account})
+        spa.approve(vespa, int(100000 * 10 ** 18), {'from': account})
+        vespa.createLock(
+            1000000000000000000000 * i,
+            int(chain.time() + vespa.MAX_TIME() // 2),
+            i % 2 == 0,
+            {'from': account}
+        )
+    for _ in range(n_weeks):
+        chain.sleep(WEEK // 3)
+        vespa.checkpoint()
+
+
+def test_batched_week_epoch(spa, vespa, multicall, monkeypatch):
+    setup_locks(spa, vespa, 9)
+    reader = BatchReader(web3, multicall.address)
+    bound = BoundContract(vespa.address, vespa.abi)
+    # Force the multi-round path of the search
+    monkeypatch.setattr('scripts.batch_reader.SEARCH_WINDOW', 4)
+    start = vespa.pointHistory(0)[3]
+    for time in range(start - WEEK, chain.time() + WEEK, WEEK // 5):
+        assert (
+            get_week_epoch(reader, bound, time, vespa.epoch()) ==
+            sequential_week_epoch(vespa, time)
+        )
+
+
+def test_batched_week_data(spa, vespa, multicall):
+    setup_locks(spa, vespa, 4)
+    reader = BatchReader(web3, multicall.address)
+    bound = BoundContract(vespa.address, vespa.abi)
+    time = (chain.time() // WEEK) * WEEK
+    spa_locked, supply = get_week_data(reader, bound, time)
+
+    epoch = sequential_week_epoch(vespa, time)
+    assert spa_locked == vespa.pointHistory(epoch)[1] * 365 * 86400
+    assert supply == vespa.totalSupply(time)
+    # epoch(), the search and the final point/supply reads
+    assert reader.round_trips <= 3
+
+
+def test_cached_week_data(spa, vespa, multicall, tmp_path):
+    setup_locks(spa, vespa, 6)
+    chain.sleep(WEEK)
+    chain.mine()
+    cache = HistoryCache(str(tmp_path / 'history.sqlite'))
+    bound = BoundContract(vespa.address, vespa.abi)
+    time = (chain.time() // WEEK) * WEEK - 2 * WEEK
+
+    reader = CachedReader(BatchReader(web3, multicall.address), cache, 'dev')
+    expected = get_week_data(reader, bound, time)
+    assert reader.round_trips > 0
+    assert expected[1] == vespa.totalSupply(time)
+
+    # A settled week is served from the cache without any eth_call
+    chain.sleep(WEEK)
+    chain.mine()
+    reader = CachedReader(BatchReader(web3, multicall.address), cache, 'dev')
+    assert get_week_data(reader, bound, time) == expected
+    assert reader.round_trips == 0
+
+
+def test_weeks_data_matches_week_data(spa, vespa, multicall):
+    setup_locks(spa, vespa, 12)
+    reader = BatchReader(web3, multicall.address)
+    bound = BoundContract(vespa.address, vespa.abi)
+    start = (vespa.pointHistory(0)[3] // WEEK) * WEEK
+    # past weeks, the current one and future ones
+    weeks = list(range(start, chain.time() + WEEK * 8, WEEK))
+    data = get_weeks_data(reader, bound, weeks)
+    for week in weeks:
+        assert data[week] == get_week_data(reader, bound, week)
+        assert data[week][1] == vespa.totalSupply(week)
@@ -0,0 +1,159 @@
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from email.utils import formatdate
+import json
+import threading
+import time
+
+import pytest
+from web3 import Web3
+
+from scripts.rpc_provider import (
+    PooledHTTPProvider,
+    TokenBucket,
+    parse_retry_after,
+)
+
+
+class StubNode(ThreadingHTTPServer):
+    """
+    JSON-RPC server answering every method with its request count, after
+    `latency` seconds. `failures` is a list of responses to send first:
+    an HTTP status or a JSON-RPC error dict.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.lock = threading.Lock()
+        self.latency = 0
+        self.failures = []
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    @property
+    def uri(self):
+        return f'http://127.0.0.1:{self.server_port}'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        node = self.server
+        request = json.loads(
+            self.rfile.read(int(self.headers['Content-Length']))
+        )
+        with node.lock:
+            node.calls.append((time.monotonic(), request['method']))
+            node.active += 1
+            node.max_active = max(node.max_active, node.active)
+            failure = node.failures.pop(0) if node.failures else None
+        time.sleep(node.latency)
+        with node.lock:
+            node.active -= 1
+        if isinstance(failure, int):
+            self.send_response(failure)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        response = {'jsonrpc': '2.0', 'id': request['id']}
+        if failure:
+            response['error'] = failure
+        else:
+            response['result'] = hex(len(node.calls))
+        body = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def node():
+    server = StubNode()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_retries_rate_limit_errors(node):
+    node.failures = [
+        429, 503, {'code': -32005, 'message': 'daily request count exceeded'}
+    ]
+    provider = PooledHTTPProvider(node.uri, backoff=0.01)
+    assert Web3(provider).eth.block_number == 4
+    assert provider.endpoint.retries == 3
+
+    node.failures = [429] * 3
+    provider = PooledHTTPProvider(node.uri, retries=2, backoff=0.01)
+    with pytest.raises(Exception):
+        provider.make_request('eth_blockNumber', [])
+
+
+def test_send_retried_only_when_rejected(node):
+    provider = PooledHTTPProvider(node.uri + '/send', backoff=0.01)
+    node.failures = [429]
+    assert provider.make_request('eth_sendRawTransaction', ['0x01'])[
+        'result'
+    ] == '0x2'
+    # the node may have accepted the transaction before failing
+    node.failures = [503]
+    with pytest.raises(Exception):
+        provider.make_request('eth_sendRawTransaction', ['0x01'])
+    assert len(node.calls) == 3
+    assert provider.endpoint.retries == 1
+
+
+def test_concurrency_and_dedup(node):
+    node.latency = 0.2
+    provider = PooledHTTPProvider(
+        node.uri + '/dedup', rate=1000, burst=1000, max_concurrency=3
+    )
+    with ThreadPoolExecutor(12) as executor:
+        responses = list(executor.map(
+            lambda i: provider.make_request('eth_getBalance', [hex(i % 6)]),
+            range(12)
+        ))
+    # identical requests in flight share the response
+    assert len(node.calls) + provider.endpoint.deduplicated == 12
+    assert len(node.calls) < 12
+    assert responses[0]['result'] == responses[6]['result']
+    assert node.max_active <= 3
+
+
+def test_rate_limit(node):
+    provider = PooledHTTPProvider(node.uri + '/rate', rate=20, burst=5)
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(
+            lambda i: provider.make_request('eth_getBalance', [hex(i)]),
+            range(25)
+        ))
+    times = [t for t, _ in node.calls]
+    # the burst is free, the 20 other requests take a second
+    assert times[-1] - times[0] >= 0.9
+
+
+def test_token_bucket():
+    bucket = TokenBucket(100, 10)
+    start = time.monotonic()
+    for _ in range(30):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.18
+
+
+def test_retry_after():
+    assert parse_retry_after('2') == 2
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+    # HTTP-dates are relative to now, and every value is capped
+    date = formatdate(time.time() + 10, usegmt=True)
+    assert 5 < parse_retry_after(date) <= 10
+    assert parse_retry_after(formatdate(time.time() - 10)) == 0
+    assert parse_retry_after('3600', 30) == 30
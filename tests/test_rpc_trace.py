@@ -0,0 +1,48 @@
+from brownie import web3
+
+from scripts import rpc_trace
+from scripts.batch_reader import BatchReader, BoundContract
+from scripts.history_cache import CachedReader, HistoryCache
+
+
+def test_trace_counts_calls(vespa, multicall, owner, tmp_path):
+    tracer = rpc_trace.enable(at_exit=False)
+    try:
+        tracer.register_abi(vespa.abi)
+        network_name = tracer.network_name(web3.provider.endpoint_uri)
+        for name in (network_name, 'development'):
+            tracer.register_contract(name, vespa.address, 'vespa')
+
+        vespa.epoch()
+        vespa.checkpoint({'from': owner})
+        bound = BoundContract(vespa.address, vespa.abi)
+        reader = CachedReader(
+            BatchReader(web3, multicall.address),
+            HistoryCache(str(tmp_path / 'history.sqlite')),
+            'development'
+        )
+        calls = [(bound, 'pointHistory', (0,)), (bound, 'epoch', ())]
+        for _ in range(2):
+            reader.call(calls, immutable=True)
+
+        stats = tracer.stats
+        assert stats[(network_name, 'vespa', 'epoch', 'eth_call')].calls == 2
+        batched = stats[(network_name, 'vespa', 'pointHistory', 'eth_call')]
+        assert batched.calls == batched.batched == 1
+        assert batched.response_bytes > 0
+        assert stats[
+            ('development', 'vespa', 'pointHistory', 'cache')
+        ].cache_hits == 1
+        assert stats[
+            (network_name, 'vespa', 'checkpoint', 'eth_sendTransaction')
+        ].calls == 1
+
+        rows = tracer.summary()
+        assert sum(sum(row['histogram'].values()) for row in rows) == sum(
+            row['calls'] for row in rows
+        )
+        path = tmp_path / 'trace.json'
+        tracer.export(str(path))
+        assert path.exists()
+    finally:
+        rpc_trace.disable()
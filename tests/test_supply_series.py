@@ -0,0 +1,90 @@
+from brownie import chain, web3
+
+from scripts.read_client import ReadClient
+from scripts.reward_calculator import vespa_address_dict
+from scripts.supply_series import (
+    SupplySeries,
+    WeekSupply,
+    get_history,
+    update_chain,
+)
+
+WEEK = 604800
+YEAR = 365 * 86400
+
+
+def check_rows(vespa, rows):
+    for week, row in rows.items():
+        point = vespa.pointHistory(
+            max(e for e in range(vespa.epoch() + 1)
+                if vespa.pointHistory(e)[3] <= week)
+        )
+        assert row.vespa == vespa.totalSupply(week)
+        assert row.spa_locked == point[1] * YEAR
+        assert row.residue == point[2]
+
+
+def test_incremental_updates(populated_vespa, multicall, tmp_path,
+                             monkeypatch):
+    vespa = populated_vespa
+    series = SupplySeries(str(tmp_path / 'series.sqlite'))
+
+    def client():
+        return ReadClient(
+            'development', web3, multicall.address,
+            addresses={'vespa': vespa.address}
+        )
+
+    for _ in range(10):
+        chain.sleep(WEEK // 2)
+        vespa.checkpoint()
+    # a first update reads the whole global history
+    monkeypatch.setattr('scripts.supply_series.FULL_HISTORY_WEEKS', 1)
+    weeks = update_chain(client(), series)
+    rows = series.range('development', vespa.address)
+    assert len(rows) == weeks > 0
+    assert max(rows) == (chain.time() // WEEK) * WEEK
+    # the weeks of the last FINALITY are provisional
+    assert not rows[max(rows)].final and rows[min(rows)].final
+    check_rows(vespa, rows)
+
+    # only the new weeks and the provisional ones are read again, one by
+    # one this time
+    monkeypatch.setattr('scripts.supply_series.FULL_HISTORY_WEEKS', 100)
+    last_final = series.last_final_week('development', vespa.address)
+    chain.sleep(2 * WEEK)
+    vespa.checkpoint()
+    assert update_chain(client(), series) == (
+        ((chain.time() // WEEK) * WEEK - last_final) // WEEK
+    )
+    updated = series.range('development', vespa.address)
+    assert min(updated) == min(rows)
+    assert max(updated) == (chain.time() // WEEK) * WEEK
+    assert len(updated) == (max(updated) - min(updated)) // WEEK + 1
+    check_rows(vespa, updated)
+    assert update_chain(client(), series) == (
+        ((chain.time() // WEEK) * WEEK
+         - series.last_final_week('development', vespa.address)) // WEEK
+    )
+
+
+def test_history_queries(tmp_path):
+    series = SupplySeries(str(tmp_path / 'series.sqlite'))
+    network_name, contract = next(iter(vespa_address_dict.items()))
+    start = 2700 * WEEK
+    series.put(network_name, contract, {
+        start + i * WEEK: WeekSupply(10 * i, 20 * i, i, i < 3)
+        for i in range(5)
+    })
+    assert series.first_week(network_name, contract) == start
+    assert series.last_final_week(network_name, contract) == start + 2 * WEEK
+    assert list(series.range(
+        network_name, contract, start + WEEK, start + 2 * WEEK
+    )) == [start + WEEK, start + 2 * WEEK]
+    assert series.get(network_name, contract.upper(), start + 4 * WEEK) == (
+        WeekSupply(40, 80, 4, False)
+    )
+    weeks = [start - WEEK, start + WEEK, start + 9 * WEEK]
+    history = get_history(series, weeks, [network_name])[network_name]
+    # zero before the first week, nothing past the last one
+    assert history == {start - WEEK: (0, 0), start + WEEK: (20, 10)}
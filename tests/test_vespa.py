@@ -123,3 +123,13 @@ def test_withdraw(vespa, owner):
         vespa.increaseAmount(1, {'from': owner})
     vespa.withdraw({'from': owner})
     assert vespa.balanceOf(owner) == 0
+
+
+def test_populated_supply(populated_vespa, populated_users):
+    # Global point accounting matches the sum of the user points
+    assert populated_vespa.totalSupply() == sum(
+        populated_vespa.balanceOf(user) for user in populated_users
+    )
+    assert populated_vespa.totalSPALocked() == sum(
+        populated_vespa.lockedBalances(user)[2] for user in populated_users
+    )
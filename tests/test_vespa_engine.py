@@ -0,0 +1,76 @@
+import brownie
+from brownie import chain
+
+from scripts.vespa_engine import VeSPAEngine
+
+WEEK = 604800
+AMOUNT = 1000000000000000000000
+
+
+def replay(engine, vespa, tx):
+    for event in tx.events:
+        if event.address != vespa.address:
+            continue
+        args = {key: event[key] for key in event.keys()}
+        engine.apply_event(event.name, args, tx.timestamp, tx.block_number)
+
+
+def test_replay_matches_contract(spa, vespa):
+    engine = VeSPAEngine(*vespa.pointHistory(0)[3:5])
+    users = brownie.accounts[1:5]
+    for i, user in enumerate(users):
+        spa.mint(100000000000000000000000, {'from': user})
+        spa.approve(vespa, int(100000 * 10 ** 18), {'from': user})
+        tx = vespa.createLock(
+            AMOUNT * (i + 1),
+            chain.time() + WEEK * (3 + 5 * i),
+            i % 2 == 0,
+            {'from': user}
+        )
+        replay(engine, vespa, tx)
+        chain.sleep(WEEK // 2)
+
+    replay(engine, vespa, vespa.increaseAmount(AMOUNT, {'from': users[1]}))
+    replay(engine, vespa, vespa.increaseUnlockTime(
+        chain.time() + WEEK * 30, {'from': users[2]}
+    ))
+    replay(engine, vespa, vespa.depositFor(
+        users[3], AMOUNT, {'from': users[3]}
+    ))
+    chain.sleep(WEEK * 3)
+    replay(engine, vespa, vespa.checkpoint())
+
+    # users[0] (auto cooldown) expires, users[1] goes through cooldown
+    chain.sleep(WEEK * 2)
+    replay(engine, vespa, vespa.withdraw({'from': users[0]}))
+    chain.sleep(vespa.lockedEnd(users[1]) - chain.time())
+    replay(engine, vespa, vespa.initiateCooldown({'from': users[1]}))
+    chain.sleep(WEEK * 2)
+    replay(engine, vespa, vespa.withdraw({'from': users[1]}))
+    chain.mine()
+
+    assert engine.epoch == vespa.epoch()
+    for epoch in range(engine.epoch + 1):
+        assert tuple(vars(engine.pointHistory[epoch]).values()) == \
+            vespa.pointHistory(epoch)
+    for user in users:
+        assert engine.userPointEpoch(user) == vespa.userPointEpoch(user)
+        assert engine.lockedEnd(user) == vespa.lockedEnd(user)
+
+    start = vespa.pointHistory(0)[3]
+    for ts in range(start, chain.time(), WEEK // 3):
+        assert engine.totalSupply(ts) == vespa.totalSupply(ts)
+        for user in users:
+            assert engine.balanceOf(user, ts) == vespa.balanceOf(user, ts)
+
+    now = chain[-1]
+    for block in range(vespa.pointHistory(0)[4], now.number + 1):
+        assert engine.totalSupplyAt(
+            block, now.timestamp, now.number
+        ) == vespa.totalSupplyAt(block, block_identifier=now.number)
+        for user in users:
+            assert engine.balanceOfAt(
+                user, block, now.timestamp, now.number
+            ) == vespa.balanceOfAt(
+                user, block, block_identifier=now.number
+            )
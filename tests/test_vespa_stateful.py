@@ -0,0 +1,172 @@
+import random
+
+import pytest
+from brownie import accounts, chain, history, web3
+from brownie.exceptions import VirtualMachineError
+from brownie.test import strategy
+
+from scripts.batch_reader import BatchReader, BoundContract
+from scripts.vespa_engine import Revert, VeSPAEngine
+
+WEEK = 604800
+N_USERS = 6
+# Past blocks and timestamps checked with balanceOfAt / totalSupplyAt
+# and balanceOf(ts) / totalSupply(ts) after every step
+N_SAMPLES = 3
+
+
+class StateMachine:
+    """
+    Differential test of veSPA_v1 against VeSPAEngine. Every rule sends
+    the transaction on chain and applies the same call to the engine at
+    the mined block, expecting the same success or revert reason. After
+    every step all views are compared in a single Multicall2 round-trip.
+    """
+
+    st_user = strategy('uint256', max_value=N_USERS - 1)
+    st_sender = strategy('uint256', max_value=N_USERS - 1)
+    st_amount = strategy('uint256', min_value=0, max_value=10 ** 22)
+    # up to a few weeks beyond MAX_TIME to also hit the reverts
+    st_weeks = strategy('uint256', max_value=212)
+    st_auto_cooldown = strategy('bool')
+    st_sleep = strategy('uint256', max_value=WEEK * 12)
+
+    def __init__(cls, spa, vespa, users, reader):
+        cls.spa = spa
+        cls.vespa = vespa
+        cls.users = users
+        cls.reader = reader
+        cls.bound = BoundContract(vespa.address, vespa.abi)
+
+    def setup(self):
+        # Runs from the same snapshot, where only initialize happened.
+        # Funding the users here keeps it out of that snapshot, which the
+        # isolation fixture reverts to after the test.
+        for user in self.users:
+            self.spa.mint(10 ** 27, {'from': user})
+            self.spa.approve(self.vespa, 2 ** 256 - 1, {'from': user})
+        self.engine = VeSPAEngine(*self.vespa.pointHistory(0)[3:5])
+        self.rng = random.Random(0)
+
+    def _transact(self, fn, args, sender, engine_fn, engine_args):
+        try:
+            tx = fn(*args, {'from': sender})
+        except VirtualMachineError as exc:
+            tx = history[-1]
+            with pytest.raises(Revert) as reverted:
+                engine_fn(*engine_args, tx.timestamp, tx.block_number)
+            assert str(reverted.value) == exc.revert_msg
+            return
+        engine_fn(*engine_args, tx.timestamp, tx.block_number)
+
+    def rule_create_lock(self, st_user, st_amount, st_weeks, st_auto_cooldown):
+        user = self.users[st_user]
+        unlock_time = chain.time() + st_weeks * WEEK
+        self._transact(
+            self.vespa.createLock,
+            (st_amount, unlock_time, st_auto_cooldown),
+            user,
+            self.engine.createLock,
+            (str(user), st_amount, unlock_time, st_auto_cooldown),
+        )
+
+    def rule_increase_amount(self, st_user, st_amount):
+        user = self.users[st_user]
+        self._transact(
+            self.vespa.increaseAmount, (st_amount,), user,
+            self.engine.increaseAmount, (str(user), st_amount),
+        )
+
+    def rule_deposit_for(self, st_user, st_sender, st_amount):
+        user = self.users[st_user]
+        self._transact(
+            self.vespa.depositFor, (user, st_amount), self.users[st_sender],
+            self.engine.depositFor, (str(user), st_amount),
+        )
+
+    def rule_increase_unlock_time(self, st_user, st_weeks):
+        user = self.users[st_user]
+        unlock_time = chain.time() + st_weeks * WEEK
+        self._transact(
+            self.vespa.increaseUnlockTime, (unlock_time,), user,
+            self.engine.increaseUnlockTime, (str(user), unlock_time),
+        )
+
+    def rule_initiate_cooldown(self, st_user):
+        user = self.users[st_user]
+        self._transact(
+            self.vespa.initiateCooldown, (), user,
+            self.engine.initiateCooldown, (str(user),),
+        )
+
+    def rule_withdraw(self, st_user):
+        user = self.users[st_user]
+        self._transact(
+            self.vespa.withdraw, (), user,
+            self.engine.withdraw, (str(user),),
+        )
+
+    def rule_checkpoint(self, st_sender):
+        self._transact(
+            self.vespa.checkpoint, (), self.users[st_sender],
+            self.engine.checkpoint, (),
+        )
+
+    def rule_sleep(self, st_sleep):
+        chain.sleep(st_sleep)
+
+    def invariant_views(self):
+        engine = self.engine
+        now = chain[-1]
+        first_blk = engine.pointHistory[0].blk
+        first_ts = engine.pointHistory[0].ts
+        blocks = [
+            self.rng.randint(first_blk, now.number) for _ in range(N_SAMPLES)
+        ]
+        times = [now.timestamp] + [
+            self.rng.randint(first_ts, now.timestamp)
+            for _ in range(N_SAMPLES)
+        ]
+
+        calls = [
+            ('epoch', ()),
+            ('totalSPALocked', ()),
+        ]
+        expected = [engine.epoch, engine.totalSPALocked]
+        for ts in times:
+            calls.append(('totalSupply', (ts,)))
+            expected.append(engine.totalSupply(ts))
+        for blk in blocks:
+            calls.append(('totalSupplyAt', (blk,)))
+            expected.append(
+                engine.totalSupplyAt(blk, now.timestamp, now.number)
+            )
+        for user in map(str, self.users):
+            calls.append(('userPointEpoch', (user,)))
+            expected.append(engine.userPointEpoch(user))
+            calls.append(('lockedEnd', (user,)))
+            expected.append(engine.lockedEnd(user))
+            for ts in times:
+                calls.append(('balanceOf', (user, ts)))
+                expected.append(engine.balanceOf(user, ts))
+            for blk in blocks:
+                calls.append(('balanceOfAt', (user, blk)))
+                expected.append(
+                    engine.balanceOfAt(user, blk, now.timestamp, now.number)
+                )
+
+        self.reader.block_identifier = now.number
+        results = self.reader.call(
+            [(self.bound, fn_name, args) for fn_name, args in calls]
+        )
+        for call, result, value in zip(calls, results, expected):
+            assert result == value, call
+
+
+def test_stateful_reference(state_machine, spa, vespa, multicall):
+    users = list(accounts[1:N_USERS + 1])
+    reader = BatchReader(web3, multicall.address)
+    state_machine(
+        StateMachine, spa, vespa, users, reader,
+        settings={'max_examples': 40, 'stateful_step_count': 50}
+    )